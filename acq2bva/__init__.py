@@ -1 +1,8 @@
-from acq2bva.writers import acq2bva
+def __getattr__(name):
+    # Imported on first use, so that the daemon client does not load numpy
+    # and bioread just to start
+    if name == "acq2bva":
+        from acq2bva.writers import acq2bva
+
+        return acq2bva
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,8 @@
+from .acq_inflate import inflate_datafile
+from .acq_inventory import (
+    find_acq_files,
+    inventory_channels,
+    load_inventories,
+    read_inventory,
+)
+from .acq_memmap import memmap_datafile
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from bioread.biopac import Datafile
+from bioread.reader import Reader
+
+
+def inflate(compressed: bytes, dtype: np.dtype) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(compressed), dtype=dtype)
+
+
+def inflate_datafile(
+    acq_file: Path, read_indexes: list[int] = None, threads: int = None
+) -> Datafile:
+    """
+    Reads a compressed AcqKnowledge file, inflating its channels in parallel.
+
+    Every channel is a separate zlib stream, and zlib releases the GIL, so the
+    streams of the channels in 'read_indexes' (defaults to all) are inflated
+    in a pool of 'threads' threads (defaults to the CPU count). Channels not
+    read have no data. Returns None for uncompressed files.
+    """
+    reader = Reader.read_headers(str(acq_file))
+    datafile = reader.datafile
+    if not reader.is_compressed:
+        return None
+
+    channels = datafile.channels
+    headers = reader.channel_compression_headers
+    if read_indexes is None:
+        read_indexes = range(len(channels))
+    if threads is None or threads < 1:
+        threads = os.cpu_count() or 1
+
+    with ThreadPoolExecutor(max_workers=threads) as pool, Path(acq_file).open("rb") as f:
+        # Streams are read in file order while earlier ones are inflated
+        inflating = {}
+        for i in sorted(read_indexes, key=lambda i: headers[i].compressed_data_offset):
+            f.seek(headers[i].compressed_data_offset)
+            compressed = f.read(headers[i].compressed_data_len)
+            # Compressed data is always little-endian
+            dtype = channels[i].dtype.newbyteorder("<")
+            inflating[i] = pool.submit(inflate, compressed, dtype)
+
+        for i, future in inflating.items():
+            channels[i].raw_data = future.result()
+
+    return datafile
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+import bioread
+from bioread.biopac import Channel
+
+INVENTORY_VERSION = 1
+INVENTORY_CACHE = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    / "acq2bva"
+    / "inventory.json"
+)
+
+
+def find_acq_files(acq: list[Path]) -> list[Path]:
+    """
+    Returns the AcqKnowledge files in a list of files and folder trees.
+    """
+    acq_files = []
+    for acq_item in acq:
+        if acq_item.is_dir():
+            acq_files += sorted(acq_item.rglob("*.acq"))
+        elif acq_item.is_file() and acq_item.suffix == ".acq":
+            acq_files.append(acq_item)
+    return acq_files
+
+
+def read_inventory(acq_file: Path) -> dict:
+    """
+    Reads the channels of an AcqKnowledge file from its headers only.
+    """
+    datafile = bioread.read_headers(str(acq_file))
+    return {
+        "samples_per_second": datafile.samples_per_second,
+        "compressed": bool(datafile.is_compressed),
+        "channels": [
+            {
+                "name": channel.name,
+                "units": channel.units,
+                "frequency_divider": channel.frequency_divider,
+                "raw_scale_factor": channel.raw_scale_factor,
+                "raw_offset": channel.raw_offset,
+                "fmt_str": channel.dtype.str,
+                "samples_per_second": channel.samples_per_second,
+                "point_count": channel.point_count,
+            }
+            for channel in datafile.channels
+        ],
+    }
+
+
+def inventory_channels(inventory: dict) -> list[Channel]:
+    """
+    Returns the channels of an inventory as bioread channels without data.
+    """
+    return [Channel(**channel) for channel in inventory["channels"]]
+
+
+def load_inventories(acq_files: list[Path], cache_file: Path = INVENTORY_CACHE) -> dict:
+    """
+    Returns the inventory of every file, read from its headers.
+
+    Inventories are cached in 'cache_file' for every file, and reused as long
+    as the size and modification time of the file do not change. The cache is
+    skipped when it cannot be read or written.
+    """
+    cache = {}
+    if cache_file is not None and cache_file.is_file():
+        try:
+            with cache_file.open() as f:
+                cache = json.load(f)
+        except ValueError:
+            pass
+    if cache.get("version") != INVENTORY_VERSION:
+        cache = {"version": INVENTORY_VERSION, "files": {}}
+
+    inventories = {}
+    changed = False
+    for acq_file in acq_files:
+        key = str(acq_file.absolute())
+        stat = acq_file.stat()
+        entry = cache["files"].get(key)
+        if (
+            entry is None
+            or entry["size"] != stat.st_size
+            or entry["mtime_ns"] != stat.st_mtime_ns
+        ):
+            entry = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "inventory": read_inventory(acq_file),
+            }
+            cache["files"][key] = entry
+            changed = True
+        inventories[acq_file] = entry["inventory"]
+
+    if changed and cache_file is not None:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = cache_file.with_suffix(".tmp")
+            with temp_file.open("w") as f:
+                json.dump(cache, f)
+            os.replace(temp_file, cache_file)
+        except OSError:
+            pass
+
+    return inventories
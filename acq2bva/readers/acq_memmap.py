@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+from bioread.biopac import Datafile
+from bioread.reader import Reader
+
+
+def memmap_datafile(acq_file: Path) -> Datafile:
+    """
+    Reads the headers of an AcqKnowledge file and maps its samples without loading them.
+
+    The raw data of every channel is a lazy view over a memory map of the file,
+    so samples are only read from disk when used. Returns None for files that
+    cannot be mapped: compressed files and files with mixed sample rates.
+    """
+    reader = Reader.read_headers(str(acq_file))
+    datafile = reader.datafile
+    channels = datafile.channels
+
+    if reader.is_compressed or not channels:
+        return None
+    if any(channel.frequency_divider != 1 for channel in channels):
+        return None
+    if len(set(channel.point_count for channel in channels)) > 1:
+        return None
+
+    # Uncompressed samples are interleaved, one record per time point
+    record = np.dtype([(f"c{i}", channel.dtype) for i, channel in enumerate(channels)])
+    try:
+        samples = np.memmap(
+            acq_file,
+            dtype=record,
+            mode="r",
+            offset=reader.data_start_offset,
+            shape=(channels[0].point_count,),
+        )
+    except ValueError:
+        # File is shorter than its headers claim
+        return None
+
+    for i, channel in enumerate(channels):
+        channel.raw_data = samples[f"c{i}"]
+
+    return datafile
@@ -5,6 +5,16 @@ from pathlib import Path
 from acq2bva.__version__ import __version__
 from acq2bva.runners.acq2bva_text import ACQ2BVA_USAGE
 
+def parse_indexes(text: str) -> list[int]:
+    """
+    Parses comma-separated channel indexes, such as '3,4,5'.
+    """
+    try:
+        return [int(index) for index in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid channel indexes: '{text}'")
+
+
 def create_parser():
     parser = argparse.ArgumentParser(
         prog="acq2bva", usage=ACQ2BVA_USAGE, add_help=False
@@ -14,6 +24,10 @@ def create_parser():
         "-v", "--version", action="version", version="%(prog)s version " + __version__
     )
     parser.add_argument("-p", "--pc", "--print-channels", action="store_true", dest="print_channels")
+    parser.add_argument("--plan", action="store_true", dest="plan")
+    parser.add_argument("--verify", action="store", type=Path, dest="verify")
+    parser.add_argument("--merge", action="store", type=Path, dest="merge")
+    parser.add_argument("--serve", action="store_true", dest="serve")
     parser.add_argument("rest", nargs=argparse.REMAINDER)
 
     # Channels
@@ -50,6 +64,29 @@ def create_parser():
         dest="channel_units",
     )
 
+    # Raw data
+    parser.add_argument(
+        "--bf",
+        "--binary-format",
+        action="store",
+        choices=["IEEE_FLOAT_32", "INT_16"],
+        dest="binary_format",
+    )
+    parser.add_argument(
+        "--do",
+        "--data-orientation",
+        action="store",
+        choices=["VECTORIZED", "MULTIPLEXED"],
+        dest="data_orientation",
+    )
+    parser.add_argument(
+        "--rs",
+        "--resample",
+        nargs="+",
+        choices=["hold", "linear"],
+        dest="resample",
+    )
+
     # Markers
     parser.add_argument(
         "-m",
@@ -64,6 +101,69 @@ def create_parser():
         type=int,
         dest="marker_channel_index",
     )
+    parser.add_argument(
+        "--mb",
+        "--marker-bits",
+        action="store",
+        type=parse_indexes,
+        dest="marker_bits",
+    )
+    parser.add_argument(
+        "--mt",
+        "--marker-threshold",
+        action="store",
+        type=float,
+        dest="marker_threshold",
+    )
+    parser.add_argument(
+        "--mo",
+        "--marker-bit-order",
+        action="store",
+        choices=["lsb", "msb"],
+        dest="marker_bit_order",
+    )
+    parser.add_argument(
+        "--tt",
+        "--trigger-threshold",
+        action="store",
+        type=float,
+        dest="trigger_threshold",
+    )
+    parser.add_argument(
+        "--th",
+        "--trigger-hysteresis",
+        action="store",
+        type=float,
+        dest="trigger_hysteresis",
+    )
+    parser.add_argument(
+        "--tw",
+        "--trigger-min-width",
+        action="store",
+        type=float,
+        dest="trigger_min_width",
+    )
+    parser.add_argument(
+        "--tr",
+        "--trigger-refractory",
+        action="store",
+        type=float,
+        dest="trigger_refractory",
+    )
+    parser.add_argument(
+        "--ty",
+        "--trigger-type",
+        action="store",
+        type=str,
+        dest="trigger_type",
+    )
+    parser.add_argument(
+        "--td",
+        "--trigger-description",
+        action="store",
+        type=str,
+        dest="trigger_description",
+    )
     parser.add_argument(
         "--mf",
         "--marker-map-file",
@@ -79,6 +179,63 @@ def create_parser():
         dest="expected_nr_markers"
     )
 
+    # Window
+    parser.add_argument(
+        "-w",
+        "--window",
+        nargs=2,
+        type=float,
+        metavar=("START", "END"),
+        dest="window",
+    )
+    parser.add_argument(
+        "--sw",
+        "--sample-window",
+        nargs=2,
+        type=int,
+        metavar=("START", "END"),
+        dest="sample_window",
+    )
+    parser.add_argument(
+        "--mw",
+        "--marker-window",
+        nargs=2,
+        type=str,
+        metavar=("START", "END"),
+        dest="marker_window",
+    )
+
+    # Split
+    parser.add_argument(
+        "--sd",
+        "--split-duration",
+        action="store",
+        type=float,
+        dest="split_duration",
+    )
+    parser.add_argument(
+        "--ss",
+        "--split-size",
+        action="store",
+        type=float,
+        dest="split_size",
+    )
+
+    # Quality control
+    parser.add_argument(
+        "--qc",
+        action="store_true",
+        default=None,
+        dest="qc",
+    )
+    parser.add_argument(
+        "--fd",
+        "--flatline-duration",
+        action="store",
+        type=float,
+        dest="flatline_duration",
+    )
+
     # Other settings
     parser.add_argument(
         "--hs",
@@ -88,6 +245,81 @@ def create_parser():
         dest="header_settings",
     )
 
+    # Batch settings
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        type=int,
+        dest="jobs",
+    )
+    parser.add_argument(
+        "--ml",
+        "--memory-limit",
+        action="store",
+        type=int,
+        dest="memory_limit",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store",
+        type=int,
+        dest="prefetch",
+    )
+    parser.add_argument(
+        "--mm",
+        "--memory-map",
+        action="store_true",
+        default=None,
+        dest="memory_map",
+    )
+    parser.add_argument(
+        "--dt",
+        "--decode-threads",
+        action="store",
+        type=int,
+        dest="decode_threads",
+    )
+
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        default=None,
+        dest="force",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=None,
+        dest="resume",
+    )
+    parser.add_argument(
+        "--shard",
+        action="store",
+        type=str,
+        dest="shard",
+    )
+    parser.add_argument(
+        "--sb",
+        "--shard-balance",
+        action="store_true",
+        default=None,
+        dest="shard_balance",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store",
+        type=str,
+        dest="checksum",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store",
+        type=Path,
+        dest="profile",
+    )
+
     # Other settings
     parser.add_argument(
         "-s",
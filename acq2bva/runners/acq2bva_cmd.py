@@ -2,21 +2,61 @@
 # """
 from __future__ import annotations
 
+import copy
 import sys
 from pathlib import Path
-import bioread
 
 import tomli as toml
 
-from acq2bva.writers.acq2bva import acq2bva
+from acq2bva.readers import find_acq_files, load_inventories
 from acq2bva.runners.acq2bva_args import create_parser
-from acq2bva.runners.acq2bva_text import ACQ2BVA_DESCRIPTION, ACQ2BVA_ARGUMENTS
+from acq2bva.runners.acq2bva_daemon import serve
+from acq2bva.runners.acq2bva_text import ACQ2BVA_ARGUMENTS, ACQ2BVA_DESCRIPTION
+from acq2bva.util.manifest import verify_folder
+from acq2bva.util.marker_map import MarkerMap
+from acq2bva.util.qc import FLATLINE_DURATION
+from acq2bva.util.shard import merge_shards, parse_shard
+from acq2bva.writers.acq2bva import acq2bva, format_size, plan_conversion
 
 TOML_POSSIBILITES = ["settings.toml", "acq2bva.toml", "acq.toml", "bva.tpml"]
 
-def main():
+# Parsed toml files and compiled marker maps. They live as long as the process,
+# so a daemon parses and compiles each of them once
+TOML_CACHE = {}
+MARKER_MAP_CACHE = {}
+MAX_CACHED = 64
+
+
+def load_toml(toml_file: Path) -> dict:
+    """
+    Returns the contents of a toml file, parsed again only once it changes.
+    """
+    toml_file = Path(toml_file).absolute()
+    stat = toml_file.stat()
+    key = (str(toml_file), stat.st_mtime_ns, stat.st_size)
+    if key not in TOML_CACHE:
+        if len(TOML_CACHE) >= MAX_CACHED:
+            TOML_CACHE.clear()
+        with toml_file.open("rb") as f:
+            TOML_CACHE[key] = toml.load(f)
+    return copy.deepcopy(TOML_CACHE[key])
+
+
+def compile_marker_map(marker_map: dict) -> MarkerMap:
+    """
+    Returns the compiled marker map of a parsed marker map, compiled once.
+    """
+    key = tuple(marker_map.items())
+    if key not in MARKER_MAP_CACHE:
+        if len(MARKER_MAP_CACHE) >= MAX_CACHED:
+            MARKER_MAP_CACHE.clear()
+        MARKER_MAP_CACHE[key] = MarkerMap(marker_map)
+    return MARKER_MAP_CACHE[key]
+
+
+def main(argv: list[str] = None, pool_options: dict = None):
     parser = create_parser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # -------------------------------------
     # Functions
@@ -34,37 +74,94 @@ def main():
         sys.exit(0)
 
     def print_channels(acq: list[Path]):
-        def get_acq_files(acq_item: Path, acq_files: list = []) -> list:
-            if acq_item.is_dir():
-                for acq_file in acq_item.iterdir():
-                    get_acq_files(acq_file, acq_files)
-            elif acq_item.is_file() and acq_item.suffix == ".acq":
-                acq_files.append(acq_item)
-            return acq_files
-        
-        acq_files = [
-            acq_file
-            for acq_item in acq
-            for acq_file in get_acq_files(acq_item)
-        ]
-        
-        for acq_file in acq_files:
+        inventories = load_inventories(find_acq_files(acq))
+        for acq_file, inventory in inventories.items():
             print(f"{acq_file}:")
-            acq_data = bioread.read(str(acq_file))
-            for i, channel in enumerate(acq_data.channels):
-                print(f"{i}: {channel.name}")
+            for i, channel in enumerate(inventory["channels"]):
+                print(f"{i}: {channel['name']}")
         sys.exit(0)
-        
+
+    def print_plan(acq: list[Path], settings):
+        plans = plan_conversion(
+            find_acq_files(acq),
+            # Channels
+            channel_indexes=settings["channel_indexes"],
+            channel_names=settings["channel_names"],
+            channel_scales=settings["channel_scales"],
+            channel_units=settings["channel_units"],
+            # Raw data
+            binary_format=settings["binary_format"] or "IEEE_FLOAT_32",
+            data_orientation=settings["data_orientation"] or "VECTORIZED",
+            resample=settings["resample"] or "hold",
+            # Markers
+            write_markers=settings["write_markers"],
+            marker_channel_index=settings["marker_channel_index"],
+            marker_map=settings["marker_map"],
+            expected_nr_markers=settings["expected_nr_markers"],
+            # Other
+            header_settings=settings["header_settings"],
+        )
+
+        total_size = 0
+        total_seconds = 0
+        for plan in plans:
+            kind = "compressed" if plan["compressed"] else "uncompressed"
+            print(f"{plan['acq_file']}: {plan['samples_per_second']:g} Hz, {kind}")
+            for i, channel in enumerate(plan["channels"]):
+                print(
+                    f"  {i}: {channel['name']}, {channel['samples_per_second']:g} Hz, "
+                    f"{channel['point_count']} samples"
+                )
+            for output, size in plan["outputs"].items():
+                size = "unknown (set expected_nr_markers)" if size is None else format_size(size)
+                print(f"  -> {output}: {size}")
+            print(f"  {plan['binary_format']}, estimated {plan['seconds']:.1f} s")
+            total_size += sum(size or 0 for size in plan["outputs"].values())
+            total_seconds += plan["seconds"]
+
+        print(
+            f"\n{len(plans)} files, {format_size(total_size)}, "
+            f"estimated {total_seconds:.1f} s"
+        )
+        sys.exit(0)
+
+    def verify(output_folder: Path):
+        if not output_folder.is_dir():
+            fatal_exit(f"\nError: {output_folder} is not a folder")
+
+        checks = verify_folder(
+            output_folder, find_acq_files(list(map(Path, args.rest))), args.jobs or None
+        )
+        failed = [check for check in checks if not check["ok"]]
+        for check in failed:
+            if check["expected"] is None:
+                problem = "no checksum in the manifest, convert it again to add one"
+            elif check["actual"] is None:
+                problem = "missing"
+            else:
+                problem = "checksum mismatch"
+            print(f"{check['file']}: {problem}")
+
+        print(f"\nVerified {len(checks) - len(failed)} of {len(checks)} files")
+        sys.exit(1 if failed else 0)
+
+    def merge(output_folder: Path):
+        if not output_folder.is_dir():
+            fatal_exit(f"\nError: {output_folder} is not a folder")
+
+        merged = merge_shards(output_folder)
+        print(f"Merged {merged['shards']} shards, {merged['files']} files in the manifest")
+        sys.exit(0)
+
     def load_settings():
         settings = {}
 
         for toml_file in [args.settings, *TOML_POSSIBILITES]:
             if toml_file is not None and Path(toml_file).is_file():
-                with Path(toml_file).open() as f:
-                    settings = {
-                        "write_markers": False,
-                        **toml.load(f)
-                    }
+                settings = {
+                    "write_markers": False,
+                    **load_toml(toml_file)
+                }
                 break
         
         for key, val in vars(args).items():
@@ -98,7 +195,7 @@ def main():
 
         if acq is None:
             fatal_exit("\nError: Missing acq_file or acq_folder")
-        if output_folder is None:
+        if output_folder is None and not (args.print_channels or args.plan):
             fatal_exit("\nError: Missing output_folder")
 
         if len(acq) > 1:
@@ -113,35 +210,59 @@ def main():
         if isinstance(settings["channel_indexes"], int):
             settings["channel_indexes"] = [settings["channel_indexes"]]
 
+        # Digital bit channels are given as a list of marker channels
+        if settings["marker_bits"] is not None:
+            if args.marker_channel_index is not None:
+                fatal_exit("\nError: Give either a marker channel or marker bits.")
+            settings["marker_channel_index"] = settings["marker_bits"]
+
+        # One marker channel is a code channel, more are digital bit channels
+        if isinstance(settings["marker_channel_index"], list):
+            if len(settings["marker_channel_index"]) == 1:
+                settings["marker_channel_index"] = settings["marker_channel_index"][0]
+        if settings["marker_threshold"] is None:
+            settings["marker_threshold"] = 2.5
+
         # Marker channel must be indicated if write_markers is true
         if settings["write_markers"]:
             if settings["marker_channel_index"] is None:
                 fatal_exit("\nError: Marker channel not specified.")
 
+        # Only one window can be exported
+        windows = ["window", "sample_window", "marker_window"]
+        if sum(settings[window] is not None for window in windows) > 1:
+            fatal_exit("\nError: Only one window can be given.")
+
+        # Marker window needs the marker channel
+        if settings["marker_window"] is not None:
+            if settings["marker_channel_index"] is None:
+                fatal_exit("\nError: Marker channel not specified.")
+
         # If marker map is a path, check if exists and then load it as dictionary
         if isinstance(settings["marker_map"], Path):
             if not settings["marker_map"].exists():
                 fatal_exit("\nError: Marker map file does not exist.")
 
-            with settings["marker_map"].open() as f:
-                settings["marker_map"] = toml.load(f)
+            settings["marker_map"] = load_toml(settings["marker_map"])
 
         # If header settings is a path, check if exists and then load it as dictionary
         if isinstance(settings["header_settings"], Path):
             if not settings["header_settings"].exists():
                 fatal_exit("\nError: Header settings file does not exist.")
 
-            with settings["header_settings"].open() as f:
-                settings["header_settings"] = toml.load(f)
+            settings["header_settings"] = load_toml(settings["header_settings"])
     
+    def parse_codes(codes):
+        try:
+            start, end = str(codes).split("-")
+            return range(int(start), int(end) + 1)
+        except:
+            return int(codes)
+
     def parse_marker_map(marker_map: dict):
         new_map = {}
         for marker, desc in marker_map.items():
-            try:
-                start, end = marker.split("-")
-                new_map[range(int(start), int(end) + 1)] = desc
-            except:
-                new_map[int(marker)] = desc
+            new_map[parse_codes(marker)] = desc
         return new_map
 
     # -------------------------------------
@@ -149,6 +270,15 @@ def main():
     if args.help:
         print_help()
 
+    if args.serve:
+        serve()
+
+    if args.verify is not None:
+        verify(args.verify)
+
+    if args.merge is not None:
+        merge(args.merge)
+
     settings = load_settings()
 
     acq, output_folder = determine_input_and_output(settings)
@@ -159,33 +289,97 @@ def main():
     validate_settings(settings)
 
     if isinstance(settings["marker_map"], dict):
-        settings["marker_map"] = parse_marker_map(settings["marker_map"])
+        settings["marker_map"] = compile_marker_map(parse_marker_map(settings["marker_map"]))
+
+    if settings["marker_window"] is not None:
+        settings["marker_window"] = tuple(map(parse_codes, settings["marker_window"]))
+
+    if args.plan:
+        print_plan(acq, settings)
 
     for acq_item in acq:
         if not acq_item.exists():
             fatal_exit(f"\nError: {acq_item} is does not exist")
 
-        acq2bva(
-            # Paths
-            output_folder=output_folder,
-            acq=acq_item,
-
-            # Channels
-            channel_indexes=settings["channel_indexes"],
-            channel_names=settings["channel_names"],
-            channel_scales=settings["channel_scales"],
-            channel_units=settings["channel_units"],
-
-            # Markers
-            write_markers=settings["write_markers"],
-            marker_channel_index=settings["marker_channel_index"],
-            marker_map=settings["marker_map"],
-            expected_nr_markers=settings["expected_nr_markers"],
-
-            # Other
-            header_settings=settings["header_settings"],
-        )
-
+    split_size = settings["split_size"]
+    if split_size is not None:
+        split_size = int(split_size * 1024 * 1024)
+
+    shard = settings["shard"]
+    if shard is not None:
+        shard = parse_shard(shard)
+
+    memory_limit = settings["memory_limit"]
+    if memory_limit is not None:
+        memory_limit *= 1024 * 1024
+
+    results = acq2bva(
+        # Paths
+        output_folder=output_folder,
+        acq=acq,
+
+        # Channels
+        channel_indexes=settings["channel_indexes"],
+        channel_names=settings["channel_names"],
+        channel_scales=settings["channel_scales"],
+        channel_units=settings["channel_units"],
+
+        # Raw data
+        binary_format=settings["binary_format"] or "IEEE_FLOAT_32",
+        data_orientation=settings["data_orientation"] or "VECTORIZED",
+        resample=settings["resample"] or "hold",
+
+        # Markers
+        write_markers=settings["write_markers"],
+        marker_channel_index=settings["marker_channel_index"],
+        marker_map=settings["marker_map"],
+        expected_nr_markers=settings["expected_nr_markers"],
+        marker_threshold=settings["marker_threshold"],
+        marker_bit_order=settings["marker_bit_order"] or "lsb",
+        trigger_threshold=settings["trigger_threshold"],
+        trigger_hysteresis=settings["trigger_hysteresis"] or 0,
+        trigger_min_width=settings["trigger_min_width"] or 0,
+        trigger_refractory=settings["trigger_refractory"] or 0,
+        trigger_type=settings["trigger_type"] or "Stimulus",
+        trigger_description=settings["trigger_description"] or "Trigger",
+
+        # Window
+        window=settings["window"],
+        sample_window=settings["sample_window"],
+        marker_window=settings["marker_window"],
+
+        # Split
+        split_duration=settings["split_duration"],
+        split_size=split_size,
+
+        # Quality control
+        qc=bool(settings["qc"]),
+        flatline_duration=settings["flatline_duration"] or FLATLINE_DURATION,
+
+        # Other
+        header_settings=settings["header_settings"],
+        checksum=settings["checksum"] or "blake2b",
+
+        # Batch
+        jobs=1 if settings["jobs"] is None else settings["jobs"],
+        memory_limit=memory_limit,
+        prefetch=settings["prefetch"] or 0,
+        memory_map=bool(settings["memory_map"]),
+        decode_threads=settings["decode_threads"],
+        force=bool(settings["force"]),
+        resume=bool(settings["resume"]),
+        shard=shard,
+        shard_balance=bool(settings["shard_balance"]),
+        profile=settings["profile"],
+        pool_options=pool_options,
+    )
+
+    failed = [result for result in results if not result["ok"]]
+    if failed:
+        print(f"\nFailed to convert {len(failed)} of {len(results)} files:")
+        for result in failed:
+            print(f"{result['acq_file']}: {result['error']}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import getpass
+import hmac
+import io
+import json
+import multiprocessing
+import os
+import re
+import secrets
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+# Address of the daemon, a socket path or host:port, overrides the default
+DAEMON_ENV = "ACQ2BVA_DAEMON"
+
+# Port on localhost where Unix sockets are not available
+DAEMON_PORT = 47321
+
+# How the daemon starts the workers of a batch
+WORKER_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def daemon_address():
+    """
+    Returns the address of the daemon: a Unix socket path, or a (host, port)
+    pair on localhost where Unix sockets are not available.
+    """
+    address = os.environ.get(DAEMON_ENV)
+    if address:
+        match = re.fullmatch(r"([\w.\-]+):(\d+)", address)
+        if match:
+            return match[1], int(match[2])
+        return address
+
+    if not hasattr(socket, "AF_UNIX"):
+        return "127.0.0.1", DAEMON_PORT
+    return str(runtime_folder() / f"acq2bva-{os.getuid()}.sock")
+
+
+def runtime_folder() -> Path:
+    folder = (
+        os.environ.get("XDG_RUNTIME_DIR")
+        or os.environ.get("LOCALAPPDATA")
+        or tempfile.gettempdir()
+    )
+    return Path(folder)
+
+
+def token_path() -> Path:
+    return runtime_folder() / f"acq2bva-{getpass.getuser()}.token"
+
+
+def create_token() -> str:
+    """
+    Writes a new random token to 'token_path', readable by the user only, and
+    returns it.
+
+    A daemon on TCP accepts only jobs that carry it, as any local user can
+    connect to its port. Fails if the file belongs to another user.
+    """
+    path = token_path()
+    path.unlink(missing_ok=True)
+    token = secrets.token_hex(32)
+    # Never follows a link or opens a file someone else created
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    return token
+
+
+def read_token() -> str:
+    try:
+        return token_path().read_text().strip()
+    except OSError:
+        return None
+
+
+def connect(address) -> socket.socket:
+    if isinstance(address, str):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        client.connect(address)
+    except OSError:
+        client.close()
+        raise
+    return client
+
+
+class StreamWriter(io.TextIOBase):
+    """
+    Text stream that sends every line written to it to the client.
+
+    Lines are sent whole, so the output of the workers of a batch never
+    breaks into another line. Workers must not write to the socket of the
+    client, so theirs put their lines on 'queue' instead, and the daemon
+    sends them on, see 'install_worker_output' and 'forward_output'.
+    """
+
+    def __init__(self, send, stream: str, queue=None) -> None:
+        self.send = send
+        self.stream = stream
+        self.queue = queue
+        self.buffer = ""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.buffer += text
+        if "\n" in self.buffer:
+            lines, _, self.buffer = self.buffer.rpartition("\n")
+            self.emit(lines + "\n")
+        return len(text)
+
+    def flush(self):
+        # Workers only send whole lines, or they could break into another one
+        if self.buffer and self.queue is None:
+            self.emit(self.buffer)
+            self.buffer = ""
+
+    def emit(self, text: str):
+        message = {"stream": self.stream, "text": text}
+        if self.queue is None:
+            self.send(message)
+        else:
+            self.queue.put(message)
+
+
+def install_worker_output(queue, cwd: str):
+    """
+    Sets up a worker of a job: its output goes to 'queue', for the daemon to
+    send on, and it runs in the folder of the job. Workers are started, not
+    forked from the daemon, so they inherit neither.
+    """
+    os.chdir(cwd)
+    sys.stdout = StreamWriter(None, "stdout", queue)
+    sys.stderr = StreamWriter(None, "stderr", queue)
+
+
+def forward_output(queue, send):
+    """
+    Sends the lines that workers put on 'queue' to the client, until None.
+    """
+    for message in iter(queue.get, None):
+        send(message)
+
+
+def run_job(argv: list[str], cwd: str, send) -> int:
+    """
+    Runs the command line 'argv' in the folder 'cwd' and returns its exit
+    code. Everything printed or logged is sent to the client as it happens,
+    by the daemon only, also for the workers of a batch, see 'StreamWriter'.
+    """
+    from acq2bva.runners.acq2bva_cmd import main
+
+    stdout = StreamWriter(send, "stdout")
+    stderr = StreamWriter(send, "stderr")
+    if "--serve" in argv:
+        stderr.write("The daemon cannot start another daemon\n")
+        return 1
+
+    # Forking the threaded daemon is unsafe, workers are started instead
+    context = multiprocessing.get_context(WORKER_START_METHOD)
+    queue = context.SimpleQueue()
+    pool_options = dict(
+        mp_context=context,
+        initializer=install_worker_output,
+        initargs=(queue, cwd),
+    )
+
+    forwarder = threading.Thread(target=forward_output, args=(queue, send))
+    forwarder.start()
+    previous = os.getcwd()
+    try:
+        os.chdir(cwd)
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            main(argv, pool_options)
+        return 0
+    except SystemExit as exit:
+        if exit.code is None or isinstance(exit.code, int):
+            return exit.code or 0
+        stderr.write(f"{exit.code}\n")
+        return 1
+    except Exception:
+        stderr.write(traceback.format_exc())
+        return 1
+    finally:
+        os.chdir(previous)
+        stdout.flush()
+        stderr.flush()
+        # Workers are done once 'main' returns, all their lines are queued
+        queue.put(None)
+        forwarder.join()
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """
+    Handles one request: a job to run, or a request to stop the daemon.
+
+    Requests and replies are lines of JSON. Jobs run one at a time, as they
+    change the working folder and output streams of the daemon, and a job
+    that has to wait is told so. On TCP, requests without the token of the
+    daemon are refused, see 'create_token'.
+    """
+
+    def send(self, message: dict):
+        with self.send_lock:
+            if self.connected:
+                try:
+                    self.wfile.write((json.dumps(message) + "\n").encode())
+                    self.wfile.flush()
+                except OSError:
+                    # The client is gone, the job still runs to the end
+                    self.connected = False
+
+    def handle(self):
+        self.connected = True
+        # Output of the job and of its workers is sent from different threads
+        self.send_lock = threading.Lock()
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+
+        token = self.server.token
+        if token is not None and not hmac.compare_digest(
+            str(request.get("token")), token
+        ):
+            self.send({"stream": "stderr", "text": "Invalid acq2bva daemon token\n"})
+            self.send({"exit": 1})
+            return
+
+        if request.get("stop"):
+            self.send({"exit": 0})
+            threading.Thread(target=self.server.shutdown).start()
+            return
+
+        if self.server.job_lock.locked():
+            self.send({"stream": "stderr", "text": "Waiting for the running job\n"})
+        with self.server.job_lock:
+            code = run_job(request["argv"], request["cwd"], self.send)
+        self.send({"exit": code})
+
+
+def serve(address=None):
+    """
+    Runs the daemon at 'address' (defaults to 'daemon_address') until it is
+    stopped with 'acq2bva-client --stop' or interrupted.
+
+    numpy, bioread and tomli are imported once, and toml files and marker maps
+    stay parsed between jobs, so a job only costs its own reading and writing.
+    """
+    # Import everything a job needs now, not when the first job comes in
+    import acq2bva.runners.acq2bva_cmd  # noqa: F401
+
+    address = address or daemon_address()
+    if isinstance(address, str):
+        if Path(address).exists():
+            try:
+                connect(address).close()
+                print(f"A daemon is already running at {address}")
+                sys.exit(1)
+            except OSError:
+                # Left by a daemon that did not stop cleanly
+                Path(address).unlink()
+        umask = os.umask(0o177)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(address, JobHandler)
+        finally:
+            os.umask(umask)
+        token = None
+    else:
+        try:
+            token = create_token()
+        except OSError as error:
+            print(f"Cannot create the daemon token at {token_path()}: {error}")
+            sys.exit(1)
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer(address, JobHandler)
+
+    server.token = token
+    server.daemon_threads = True
+    server.job_lock = threading.Lock()
+    print(f"acq2bva daemon listening at {address}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(address, str):
+            Path(address).unlink(missing_ok=True)
+        else:
+            token_path().unlink(missing_ok=True)
+    sys.exit(0)
+
+
+def client_main(argv: list[str] = None):
+    """
+    Submits a command line to the daemon and prints its output as it comes.
+
+    Takes the same arguments as 'acq2bva', relative paths are relative to the
+    folder the client runs in. With '--stop', stops the daemon. Without a
+    daemon running, the conversion runs in this process instead. Only the
+    standard library is imported until then, so the client starts quickly.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    stop = argv == ["--stop"]
+
+    address = daemon_address()
+    try:
+        client = connect(address)
+    except OSError:
+        if stop:
+            print("No acq2bva daemon is running")
+            sys.exit(1)
+        from acq2bva.runners.acq2bva_cmd import main
+
+        main(argv)
+        return
+
+    request = {"stop": True} if stop else {"argv": argv, "cwd": os.getcwd()}
+    if not isinstance(address, str):
+        request["token"] = read_token()
+    with client, client.makefile("rwb") as stream:
+        stream.write((json.dumps(request) + "\n").encode())
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "exit" in message:
+                sys.exit(message["exit"])
+            output = sys.stderr if message["stream"] == "stderr" else sys.stdout
+            output.write(message["text"])
+            output.flush()
+
+    print("The acq2bva daemon closed the connection", file=sys.stderr)
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    client_main()
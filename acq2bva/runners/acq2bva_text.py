@@ -18,6 +18,35 @@ ACQ2BVA_USAGE = """
     %(prog)s [-p, --pc, --print_channels]
                                 Print number and name of each channel, and exit
 
+    %(prog)s --plan [optional args]
+                                Print the channels, the size of every output file and the
+                                estimated run time of each file, and exit
+
+    Both read the file headers only, and cache them for each file. Folders are searched
+    recursively.
+
+    %(prog)s --verify output_folder [acq_file ...]
+                                Check the files in output_folder, and the AcqKnowledge files
+                                given, against the checksums in its manifest, and exit
+
+    %(prog)s --merge output_folder
+                                Merge the manifests and QC summaries of the shards of a batch
+                                in output_folder, see --shard, and exit
+
+    %(prog)s --serve            Run a daemon that converts files submitted with acq2bva-client,
+                                until it is stopped with 'acq2bva-client --stop'
+
+    acq2bva-client [args]       Convert files in the daemon, with the same arguments as %(prog)s.
+                                Its output is printed as the conversion runs. Without a daemon
+                                running, files are converted by the client itself
+
+    The daemon loads its libraries once, and keeps toml files and marker maps parsed until they
+    change, so that converting a small file takes about as long as reading and writing it. It
+    listens on a Unix socket in XDG_RUNTIME_DIR, or on localhost port 47321 where there are no
+    Unix sockets. Set ACQ2BVA_DAEMON to a socket path or host:port to choose another address.
+    On a port, the daemon only runs jobs that carry the token it writes to a file readable by its
+    user only, in XDG_RUNTIME_DIR or LOCALAPPDATA, so other users cannot submit jobs to it.
+
 
 Path variables
   Either:
@@ -42,6 +71,16 @@ Channel Variables:
   -u UNIT [UNIT ...], --units UNIT [UNIT ...], --channel-units UNIT [UNIT ...]
         Description: Units for each channel. Defaults to units given by AcqKnowledge. Useful for fixing wrong units in recording.
 
+Raw Data Variables:
+  --bf FORMAT, --binary-format FORMAT
+        Description: Sample format of the raw data file, either IEEE_FLOAT_32 or INT_16. Defaults to IEEE_FLOAT_32. INT_16 writes the 16-bit samples as recorded, with each channel's scale as its resolution in the header, which halves the file size. Files with channels that are not 16-bit or have an offset are written as IEEE_FLOAT_32 instead, with a warning.
+
+  --do ORIENTATION, --data-orientation ORIENTATION
+        Description: Order of the samples in the raw data file, either VECTORIZED (all samples of one channel, then the next channel) or MULTIPLEXED (all channels of one sample, then the next sample). Defaults to VECTORIZED. MULTIPLEXED files are faster to read in time order.
+
+  --rs METHOD [METHOD ...], --resample METHOD [METHOD ...]
+        Description: How channels recorded at a lower sample rate are brought to the rate of the fastest channel written: 'hold' repeats each sample, 'linear' interpolates between samples. Either one method for all channels or one for each. Resampled channels are noted in the comment of the '.vhdr' file. Defaults to 'hold'. Linearly interpolated channels are written as IEEE_FLOAT_32.
+
 Marker Variables:
   -m, --markers
         Description: Flag to write a marker file based on a specific marker channel. If true, then marker channel (--mc) must be specified. Optionally, marker map file (--mf) can be specified to provide a description of each marker value. Please refer to the ReadMe or Github page for explanation of a marker map file. Additionally, expected number of markers (--em) can be specified and a warning will be displayed if number of markers found does not correspond to that value.
@@ -49,12 +88,101 @@ Marker Variables:
   --mc INDEX, --marker-channel INDEX
         Description: A single channel index specifying which channel in the recording to scan for markers.
 
+  --mb INDEXES, --marker-bits INDEXES
+        Description: Comma-separated indexes of digital channels to read markers from instead of --mc, one bit of the marker code each, for example '--mb 8,9,10,11,12,13,14,15' for a parallel port trigger recorded as D0 to D7. In the settings toml, give marker_bits or marker_channel_index as a list.
+
+  --mt VALUE, --marker-threshold VALUE
+        Description: Value in channel units above which a digital marker channel is on. Defaults to 2.5, for 0/5 V channels.
+
+  --mo ORDER, --marker-bit-order ORDER
+        Description: Order of the digital marker channels, either lsb (the first channel is the least significant bit) or msb (the first channel is the most significant bit). Defaults to lsb.
+
   --mf FILE, --marker-map-file FILE
         Description: Path of file specifying a marker mapping from the numerical value the description of that specific marker. For example, 1 -> 'Experiment start'. Please refer to the ReadMe or Github page for explanation of a marker map file.
 
+  --tt VALUE, --trigger-threshold VALUE
+        Description: Read the marker channel as an analog trigger, such as a photodiode, instead of marker codes. Every pulse rising above VALUE, in channel units, becomes a marker.
+
+  --th VALUE, --trigger-hysteresis VALUE
+        Description: A pulse only ends when the channel falls below the trigger threshold minus VALUE, so noise around the threshold does not start new pulses. Defaults to 0.
+
+  --tw SECONDS, --trigger-min-width SECONDS
+        Description: Pulses shorter than SECONDS are ignored. Defaults to 0.
+
+  --tr SECONDS, --trigger-refractory SECONDS
+        Description: Pulses starting less than SECONDS after the start of the previous pulse are ignored. Defaults to 0.
+
+  --ty TYPE, --trigger-type TYPE
+        Description: Type of the trigger markers. Defaults to 'Stimulus'.
+
+  --td DESCRIPTION, --trigger-description DESCRIPTION
+        Description: Description of the trigger markers. Defaults to 'Trigger'.
+
   --em NR, --expected-nr-markers NR
         Description: Expected number of markers from each file. A warning will be displayed if number of markers found does not correspond with this value.
 
+Window Variables:
+  Only one window can be given. Markers are rebased to the start of the window.
+
+  -w START END, --window START END
+        Description: Export only the samples from START to END seconds into the recording.
+
+  --sw START END, --sample-window START END
+        Description: Export only the samples from sample START up to, but not including, sample END.
+
+  --mw CODE CODE, --marker-window CODE CODE
+        Description: Export only the samples from the first marker with the start code up to and including the first marker with the end code after it. Requires a marker channel (--mc). Codes can be ranges, as in the marker map. For example, '--mw 51-58 61-68' exports a block from any block start marker to the next block end marker.
+
+Split Variables:
+  Long recordings can be split into consecutive sets of '.dat', '.vhdr' and '.vmrk' files, numbered '_001', '_002' and so on. The markers of every set are relative to its start and follow a 'New Segment' marker at position 0, positions being 0-based sample indexes like those of every other marker.
+
+  --sd SECONDS, --split-duration SECONDS
+        Description: Maximum duration of each set in seconds.
+
+  --ss MB, --split-size MB
+        Description: Maximum size of each '.dat' file in megabytes.
+
+Quality Control Variables:
+  --qc
+        Description: Compute statistics of every written channel while it is written: minimum, maximum, mean, RMS, number of NaN and Inf samples, fraction of samples at the extremes of the channel (clipping) and flatlines. They are saved next to every '.dat' file as '.qc.json', with the number of markers of every code. A summary of the batch, listing the problems found in every file and comparing the number of markers with --em, is saved as 'acq2bva_qc.json' in the output folder.
+
+  --fd SECONDS, --flatline-duration SECONDS
+        Description: Minimum duration of a run of identical samples to count as a flatline. Defaults to 0.5.
+
+Batch Variables:
+  -j N, --jobs N
+        Description: Number of files to convert at the same time in separate processes. Defaults to 1. Use 0 to use one process per CPU. A file that fails to convert does not stop the others, and failed files are listed at the end.
+
+  --ml MB, --memory-limit MB
+        Description: Memory in megabytes that files converted at the same time may use together, estimated from the channels read from each file. Defaults to the available memory.
+
+  --prefetch N
+        Description: When converting with a single job, decode up to N files ahead on a background thread while the current file is written, so reading and writing overlap. Memory holds up to N + 2 decoded files. Defaults to 0, which decodes each file just before writing it.
+
+  --mm, --memory-map
+        Description: Map uncompressed files into memory instead of decoding them, so that recordings larger than the memory can be converted. Samples are read from disk as they are written. Compressed files and files with channels at different sample rates are decoded as usual. Converting to MULTIPLEXED reads a mapped file only once.
+
+  --dt, --decode-threads N
+        Description: Number of threads inflating the channels of a compressed file in parallel. Only the channels that are written are inflated. Defaults to the number of CPUs divided among the jobs.
+
+  -f, --force
+        Description: Convert every file, even if it is up to date. Converted files are recorded in 'acq2bva_manifest.json' in the output folder, and files whose content and settings have not changed since are skipped by default.
+
+  --resume
+        Description: Continue an interrupted batch after the last file it finished, instead of starting over. Every output is written to a temporary file and only renamed once it is complete and synced to disk, so an interrupted batch never leaves partial outputs behind. Files are recorded in 'acq2bva_journal.jsonl' in the output folder as they finish, and the journal is removed when the batch completes. The settings must be those of the interrupted batch. Files that failed are converted again.
+
+  --shard I/N
+        Description: Convert only the I-th of N shards of the files, counting from 1, so that a batch can be spread over the nodes of an array job. Files are ordered by name and dealt out in turn, so every file is in exactly one shard and every node agrees on them. Shards can write to the same output folder at the same time, as each keeps its own manifest, journal and QC summary, named after the shard. Once all shards are done, run '--merge output_folder' to combine them. For example, 4 processes on one machine: 'acq2bva --shard 1/4 in out' up to 'acq2bva --shard 4/4 in out'.
+
+  --sb, --shard-balance
+        Description: Deal files to shards by size instead, largest first to the shard with the fewest bytes, so shards take about as long when file sizes differ. Every shard must be given this option.
+
+  --checksum ALGORITHM
+        Description: Checksum of every output file, computed while it is written and recorded in 'acq2bva_manifest.json' with the checksum of the AcqKnowledge file. Either blake2b or sha256. Defaults to blake2b. Use --verify to check a folder against it later, with one file hashed per CPU at a time, or per job with -j. Files converted without checksums, or with another algorithm, are converted again, and --verify reports them as unchecked.
+
+  --profile FILE
+        Description: Append a profile of every converted file to FILE as newline-delimited JSON. Each line holds the wall time, CPU time, peak memory and throughput in MB/s of each stage: decode, raw, header, markers and vmrk, and the totals of the whole file, whose input MB/s (the file decoded) and output MB/s (the files written) are each over the wall time of all stages. The peak memory of a stage is what it allocated, traced with tracemalloc, the worker peak is the high-water mark of the process that converted the file, which in a pool includes the files it converted before.
+
 Header Toml Settings:
   --hs FILE, --header-settings FILE
         Description: Toml file to specify settings for the '.vhdr' file. Any setting written in here will override settings configured automatically by this program.
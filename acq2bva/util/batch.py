@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+
+def available_memory() -> int:
+    """
+    Returns the available physical memory in bytes, or None if unknown.
+    """
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def run_batch(
+    func,
+    items: list,
+    jobs: int = 1,
+    memory_of=None,
+    memory_limit: int = None,
+    on_result=None,
+    mp_context=None,
+    initializer=None,
+    initargs: tuple = (),
+) -> list:
+    """
+    Calls 'func' on every item and returns the results in the order of items.
+
+    With more than one job, items are run in a process pool. An item is only
+    started while the estimated memory of all running items, given by
+    'memory_of', stays below 'memory_limit'. One item always runs, no matter
+    its estimate. Items that raise or crash their worker are returned as the
+    exception. A crashed worker takes down the items running next to it, so
+    those are run again one at a time, and only the one that crashes alone
+    fails. The pool is then started anew for the remaining items.
+
+    'on_result' is called with every item and its result as soon as the item
+    is done, in the order items finish.
+
+    'mp_context', 'initializer' and 'initargs' are those of the pool, to set
+    how its workers are started and set up.
+    """
+    if jobs is None or jobs < 1:
+        jobs = os.cpu_count() or 1
+
+    if jobs == 1 or len(items) < 2:
+        results = []
+        for item in items:
+            results.append(func(item))
+            if on_result is not None:
+                on_result(item, results[-1])
+        return results
+
+    if memory_limit is None:
+        memory_limit = available_memory()
+
+    estimates = [memory_of(item) if memory_of else 0 for item in items]
+    results = [None] * len(items)
+    pending = list(range(len(items)))
+    # Items running when a worker died, run again one at a time so that only
+    # the item that crashed its worker fails
+    suspects = []
+    running = {}
+    pool = None
+
+    def finish(index: int, result):
+        results[index] = result
+        if on_result is not None:
+            on_result(items[index], result)
+
+    try:
+        while pending or suspects or running:
+            if pool is None:
+                pool = ProcessPoolExecutor(
+                    max_workers=min(jobs, len(items)),
+                    mp_context=mp_context,
+                    initializer=initializer,
+                    initargs=initargs,
+                )
+
+            try:
+                if suspects:
+                    if not running:
+                        index = suspects[0]
+                        running[pool.submit(func, items[index])] = index
+                        suspects.pop(0)
+                else:
+                    while pending and len(running) < jobs:
+                        in_use = sum(estimates[i] for i in running.values())
+                        index = pending[0]
+                        if running and memory_limit is not None:
+                            if in_use + estimates[index] > memory_limit:
+                                break
+                        running[pool.submit(func, items[index])] = index
+                        pending.pop(0)
+            except BrokenProcessPool:
+                # A running item crashed its worker, its future tells which
+                if not running:
+                    pool.shutdown(wait=True)
+                    pool = None
+                    continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            crashed = []
+            for future in done:
+                index = running.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    crashed.append(index)
+                    continue
+                except BaseException as error:
+                    logging.error(f"Worker failed on {items[index]}: {error!r}")
+                    result = error
+                finish(index, result)
+
+            if not crashed:
+                continue
+
+            # Every item still running went down with the pool
+            pool.shutdown(wait=True)
+            pool = None
+            for future, index in running.items():
+                if future.done() and future.exception() is None:
+                    finish(index, future.result())
+                else:
+                    crashed.append(index)
+            running = {}
+
+            if len(crashed) == 1:
+                item = items[crashed[0]]
+                error = BrokenProcessPool(f"The worker running {item} died")
+                logging.error(f"Worker failed on {item}: {error!r}")
+                finish(crashed[0], error)
+            else:
+                suspects.extend(sorted(crashed))
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    return results
+
+
+def prefetched(func, items: list, depth: int = 1):
+    """
+    Yields every item with the result of 'func' on it, in the order of items.
+
+    Results are computed ahead on a background thread while the caller works
+    on the previous ones. At most 'depth' results wait to be taken, so at most
+    'depth' + 2 results exist at once. Exceptions are yielded as the result.
+    """
+    results = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    done = object()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                results.put(value, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def produce():
+        for item in items:
+            if stop.is_set():
+                return
+            try:
+                result = func(item)
+            except BaseException as error:
+                result = error
+            put((item, result))
+        put(done)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            value = results.get()
+            if value is done:
+                break
+            yield value
+    finally:
+        stop.set()
+        producer.join()
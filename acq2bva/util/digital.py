@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import numpy as np
+from bioread.biopac import Channel
+
+from acq2bva.util.error import true_or_fail
+
+# Number of samples thresholded and packed at a time
+BIT_BLOCK_SIZE = 1 << 18
+
+# Orders of digital channels in a code, least or most significant bit first
+BIT_ORDERS = ["lsb", "msb"]
+
+
+def marker_indexes(marker_channel_index: int | list[int]) -> list[int]:
+    """
+    Returns the indexes of the channels markers are read from.
+    """
+    if isinstance(marker_channel_index, list):
+        return marker_channel_index
+    return [marker_channel_index]
+
+
+def code_dtype(n_bits: int) -> np.dtype:
+    for dtype in ("<u1", "<u2", "<u4", "<u8"):
+        if n_bits <= np.dtype(dtype).itemsize * 8:
+            return np.dtype(dtype)
+    true_or_fail(False, "At most 64 digital channels can be combined")
+
+
+def combine_bit_channels(
+    channels: list[Channel],
+    threshold: float = 2.5,
+    bit_order: str = "lsb",
+    block_size: int = BIT_BLOCK_SIZE,
+) -> Channel:
+    """
+    Combines digital channels, one bit each, into a channel of integer codes.
+
+    A bit is set where its channel is above 'threshold' in its units. With
+    'bit_order' lsb the first channel is the least significant bit, with msb
+    the most significant. Bits are thresholded and packed in blocks with
+    'np.packbits', so no Python loop runs over the samples.
+    """
+    true_or_fail(len(channels) > 0, "No digital channels to combine")
+    true_or_fail(
+        bit_order in BIT_ORDERS, f"Bit order must be one of {', '.join(BIT_ORDERS)}"
+    )
+    true_or_fail(
+        len(set(channel.frequency_divider or 1 for channel in channels)) == 1
+        and len(set(len(channel.raw_data) for channel in channels)) == 1,
+        "Digital channels must have the same sample rate and number of samples",
+    )
+
+    if bit_order == "msb":
+        channels = channels[::-1]
+
+    n_samples = len(channels[0].raw_data)
+    dtype = code_dtype(len(channels))
+    # Bits are packed into bytes, padded up to the size of a code
+    bits = np.zeros((dtype.itemsize * 8, min(block_size, n_samples)), dtype=bool)
+    codes = np.empty(n_samples, dtype=dtype)
+
+    for start in range(0, n_samples, block_size):
+        stop = min(start + block_size, n_samples)
+        block_bits = bits[:, : stop - start]
+        for bit, channel in enumerate(channels):
+            samples = channel.raw_data[start:stop]
+            if samples.dtype.kind != "f":
+                samples = (samples * channel.raw_scale_factor) + channel.raw_offset
+            np.greater(samples, threshold, out=block_bits[bit])
+
+        # One byte per 8 bits, from the least significant byte up
+        packed = np.packbits(block_bits, axis=0, bitorder="little")
+        codes[start:stop] = np.ascontiguousarray(packed.T).view(dtype)[:, 0]
+
+    first = channels[0]
+    code_channel = Channel(
+        frequency_divider=first.frequency_divider,
+        raw_scale_factor=1,
+        raw_offset=0,
+        name="Digital markers",
+        units="",
+        fmt_str=dtype.str,
+        samples_per_second=first.samples_per_second,
+        point_count=n_samples,
+    )
+    code_channel.raw_data = codes
+    return code_channel
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+JOURNAL_NAME = "acq2bva_journal.jsonl"
+
+
+def truncate_torn_line(journal_file: Path):
+    """
+    Cuts a journal back to its last complete line, dropping what an
+    interruption left of the line being written.
+    """
+    with journal_file.open("rb+") as f:
+        data = f.read()
+        f.truncate(data.rfind(b"\n") + 1)
+
+
+def read_journal(output_folder: Path, name: str = JOURNAL_NAME) -> dict:
+    """
+    Reads the journal of an interrupted batch, or returns None if there is
+    none.
+
+    Returns the settings fingerprint of the batch, and the manifest entry of
+    every file it finished and the error of every file that failed, by name.
+    A last line cut off by the interruption is ignored, see 'Journal'.
+    """
+    journal_file = output_folder / name
+    if not journal_file.is_file():
+        return None
+
+    journal = {"settings": None, "done": {}, "failed": {}}
+    with journal_file.open() as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event["event"] == "start":
+                journal["settings"] = event["settings"]
+            elif event["event"] == "done":
+                journal["done"][event["acq_file"]] = event["entry"]
+                journal["failed"].pop(event["acq_file"], None)
+            elif event["event"] == "failed":
+                journal["failed"][event["acq_file"]] = event["error"]
+    return journal
+
+
+class Journal:
+    """
+    Records the progress of a batch in its output folder as it happens.
+
+    Every event is a line of JSON, written and synced to disk before the
+    batch goes on, so the journal holds every file finished before a crash.
+    A journal is started anew, or continued when a batch is resumed, and is
+    removed once its batch is complete. A resumed journal is first cut back
+    to its last complete line, so new events never join a torn one.
+    """
+
+    def __init__(
+        self,
+        output_folder: Path,
+        fingerprint: str,
+        acq_files: list[Path],
+        resume: bool = False,
+        name: str = JOURNAL_NAME,
+    ) -> None:
+        self.journal_file = output_folder / name
+        if resume:
+            truncate_torn_line(self.journal_file)
+        self.journal = self.journal_file.open("a" if resume else "w")
+        if not resume:
+            self.write(
+                {
+                    "event": "start",
+                    "settings": fingerprint,
+                    "acq_files": [acq_file.name for acq_file in acq_files],
+                }
+            )
+
+    def write(self, event: dict):
+        self.journal.write(json.dumps(event) + "\n")
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    def done(self, acq_file: Path, entry: dict):
+        self.write({"event": "done", "acq_file": acq_file.name, "entry": entry})
+
+    def failed(self, acq_file: Path, error: str):
+        self.write({"event": "failed", "acq_file": acq_file.name, "error": error})
+
+    def finish(self):
+        self.journal.close()
+        self.journal_file.unlink(missing_ok=True)
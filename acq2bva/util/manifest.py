@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from acq2bva.__version__ import __version__
+
+MANIFEST_NAME = "acq2bva_manifest.json"
+HASH_CHUNK_SIZE = 1 << 20
+
+# Checksums of the output files recorded in the manifest
+HASH_ALGORITHMS = ["blake2b", "sha256"]
+
+# Outputs are written under this suffix and renamed once complete
+TEMP_SUFFIX = ".acq2bva-tmp"
+
+
+def hash_file(file_path: Path, algorithm: str = "blake2b") -> str:
+    """
+    Returns the hex digest of a file, read in chunks into one buffer.
+    """
+    return hash_file_digests(file_path, [algorithm])[algorithm]
+
+
+def hash_file_digests(file_path: Path, algorithms: list[str]) -> dict[str, str]:
+    """
+    Returns the hex digest of a file with every one of 'algorithms', by name.
+    The file is read once, every chunk is fed to all of them.
+    """
+    digests = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with Path(file_path).open("rb", buffering=0) as f:
+        while n := f.readinto(buffer):
+            for digest in digests.values():
+                digest.update(view[:n])
+    return {algorithm: digest.hexdigest() for algorithm, digest in digests.items()}
+
+
+class HashedWriter(io.RawIOBase):
+    """
+    Writes bytes to a binary file and feeds them to a hash on the way.
+    """
+
+    def __init__(self, raw, digest) -> None:
+        self.raw = raw
+        self.digest = digest
+
+    def writable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        return self.raw.fileno()
+
+    def write(self, data) -> int:
+        n = self.raw.write(data)
+        self.digest.update(memoryview(data).cast("B")[:n])
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+
+def open_hashed(file_path: Path, digest=None, text: bool = False, buffering: int = -1):
+    """
+    Opens a file for writing, with every byte that reaches the file fed to
+    'digest' if given. Text is encoded and its newlines translated as 'open'
+    does, so the digest is that of the file on disk.
+    """
+    if digest is None:
+        return Path(file_path).open("wt" if text else "wb", buffering=buffering)
+
+    hashed = HashedWriter(Path(file_path).open("wb", buffering=0), digest)
+    if buffering < 2:
+        buffering = io.DEFAULT_BUFFER_SIZE
+    buffered = io.BufferedWriter(hashed, buffering)
+    if text:
+        return io.TextIOWrapper(buffered)
+    return buffered
+
+
+def sync_folder(folder: Path):
+    """
+    Flushes the entries of a folder to disk, so renames in it survive a crash.
+    Not every platform can open a folder, those are skipped.
+    """
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def open_output(file_path: Path, digest=None, text: bool = False, buffering: int = -1):
+    """
+    Opens an output file for writing, see 'open_hashed', so that it is either
+    complete or absent.
+
+    The file is written next to its final path with TEMP_SUFFIX, synced to
+    disk and renamed over the final path once the block is done. When the
+    block raises, the temporary file is removed instead.
+    """
+    file_path = Path(file_path)
+    temp_file = file_path.with_name(file_path.name + TEMP_SUFFIX)
+    f = open_hashed(temp_file, digest, text, buffering)
+    try:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+    except BaseException:
+        f.close()
+        temp_file.unlink(missing_ok=True)
+        raise
+    f.close()
+    os.replace(temp_file, file_path)
+    sync_folder(file_path.parent)
+
+
+def remove_temp_files(
+    output_folder: Path, stems: list[str] = None, segmented: bool = False
+) -> int:
+    """
+    Removes the temporary files of outputs left by an interrupted run, and
+    returns how many there were.
+
+    With 'stems', only the temporary files of outputs named after one of them
+    are removed, or with 'segmented', after one of their numbered segments.
+    Other runs writing to the same folder keep theirs.
+    """
+    temp_files = list(output_folder.glob(f"*{TEMP_SUFFIX}"))
+    if stems is not None:
+        segment = r"(_\d{3,})?" if segmented else ""
+        pattern = re.compile(
+            rf"({'|'.join(map(re.escape, stems))}){segment}"
+            rf"(\.qc)?\.[^.]+{re.escape(TEMP_SUFFIX)}"
+        )
+        temp_files = [
+            temp_file
+            for temp_file in temp_files
+            if stems and pattern.fullmatch(temp_file.name)
+        ]
+    for temp_file in temp_files:
+        temp_file.unlink(missing_ok=True)
+    return len(temp_files)
+
+
+def settings_fingerprint(settings: dict) -> str:
+    """
+    Returns a fingerprint of the settings that change the output of a conversion.
+
+    Values are fingerprinted through their 'repr', so the settings must have a
+    stable representation. The program version is included as well.
+    """
+    text = repr(sorted((key, repr(val)) for key, val in settings.items()))
+    return hashlib.blake2b(f"{__version__}:{text}".encode()).hexdigest()
+
+
+def load_manifest(output_folder: Path, name: str = MANIFEST_NAME) -> dict:
+    manifest_file = output_folder / name
+    if manifest_file.is_file():
+        try:
+            with manifest_file.open() as f:
+                return json.load(f)
+        except ValueError:
+            pass
+    return {"version": 1, "files": {}}
+
+
+def save_manifest(output_folder: Path, manifest: dict, name: str = MANIFEST_NAME):
+    with open_output(output_folder / name, text=True) as f:
+        json.dump(manifest, f, indent=2)
+
+
+def file_entry(
+    acq_file: Path,
+    fingerprint: str,
+    outputs: list[Path],
+    digests: dict[str, str] = None,
+    checksum: str = "blake2b",
+) -> dict:
+    """
+    Returns the manifest entry of a converted file, with the 'checksum' digests
+    of its outputs computed while they were written and that of the file. The
+    file is read once for both of its digests.
+    """
+    stat = acq_file.stat()
+    algorithms = ["blake2b"]
+    if digests is not None and checksum not in algorithms:
+        algorithms.append(checksum)
+    acq_digests = hash_file_digests(acq_file, algorithms)
+    entry = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "blake2b": acq_digests["blake2b"],
+        "settings": fingerprint,
+        "outputs": [output.name for output in outputs],
+    }
+    if digests is not None:
+        entry["checksum"] = checksum
+        entry["digests"] = {acq_file.name: acq_digests[checksum], **digests}
+    return entry
+
+
+def is_up_to_date(
+    entry: dict,
+    acq_file: Path,
+    output_folder: Path,
+    fingerprint: str,
+    checksum: str = None,
+) -> bool:
+    """
+    Checks if a manifest entry still matches an AcqKnowledge file and settings.
+
+    With 'checksum', the entry must also hold digests of that algorithm, so
+    files converted without them, or with another one, are converted again.
+    The content hash is only computed when the size matches but the
+    modification time does not, and the entry is refreshed when it matches.
+    """
+    if entry is None or entry.get("settings") != fingerprint:
+        return False
+
+    if checksum is not None:
+        if entry.get("checksum") != checksum or "digests" not in entry:
+            return False
+
+    if not all((output_folder / output).is_file() for output in entry["outputs"]):
+        return False
+
+    stat = acq_file.stat()
+    if stat.st_size != entry["size"]:
+        return False
+
+    if stat.st_mtime_ns != entry["mtime_ns"]:
+        if hash_file(acq_file) != entry["blake2b"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+
+    return True
+
+
+def verify_folder(
+    output_folder: Path, acq_files: list[Path] = None, threads: int = None
+) -> list[dict]:
+    """
+    Checks the outputs in a folder against the digests in its manifest, and
+    the AcqKnowledge files given against those they were converted from.
+
+    Files are hashed in chunks, 'threads' at a time (defaults to the CPU
+    count), as hashing large chunks runs outside the interpreter lock.
+    Returns the check of every file. Converted files without digests in the
+    manifest cannot be checked, and are returned as failed checks with no
+    'checksum' and no 'expected' digest.
+    """
+    manifest = load_manifest(output_folder)
+    acq_paths = {acq_file.name: acq_file for acq_file in acq_files or []}
+
+    checks = []
+    for acq_name, entry in manifest["files"].items():
+        if "digests" not in entry:
+            checks.append(
+                {
+                    "file": Path(acq_name),
+                    "checksum": None,
+                    "expected": None,
+                    "actual": None,
+                    "ok": False,
+                }
+            )
+            continue
+        for name, expected in entry["digests"].items():
+            if name == acq_name:
+                if name not in acq_paths:
+                    continue
+                file_path = acq_paths[name]
+            else:
+                file_path = output_folder / name
+            checks.append(
+                {
+                    "file": file_path,
+                    "checksum": entry["checksum"],
+                    "expected": expected,
+                    "actual": None,
+                    "ok": False,
+                }
+            )
+
+    def check(item: dict) -> dict:
+        if item["expected"] is not None and item["file"].is_file():
+            item["actual"] = hash_file(item["file"], item["checksum"])
+            item["ok"] = item["actual"] == item["expected"]
+        return item
+
+    # Largest files first, so one large file does not finish last
+    order = sorted(
+        checks,
+        key=lambda item: item["file"].stat().st_size if item["file"].is_file() else 0,
+        reverse=True,
+    )
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count() or 1) as pool:
+        list(pool.map(check, order))
+
+    return checks
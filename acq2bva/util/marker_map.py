@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import hashlib
+
+import numpy as np
+
+from acq2bva.util.error import true_or_fail
+
+MAX_CODE_SPAN = 1 << 20
+
+
+class MarkerMap:
+    """
+    Marker map compiled into a dense code to description lookup table.
+
+    Keys of the given map can be single integer codes or ranges of codes.
+    When entries overlap, the entry that comes first in the map wins.
+    """
+
+    def __init__(self, marker_map: dict = None) -> None:
+        self.descriptions = [""]
+        self.first_code = 0
+        self.table = np.zeros(0, dtype=np.int32)
+
+        if marker_map:
+            self.compile(marker_map)
+
+    def __repr__(self) -> str:
+        table_digest = hashlib.blake2b(self.table.tobytes(), digest_size=8).hexdigest()
+        return (
+            f"MarkerMap(first_code={self.first_code}, "
+            f"descriptions={self.descriptions!r}, table={table_digest})"
+        )
+
+    @staticmethod
+    def as_codes(key) -> range:
+        if isinstance(key, range):
+            true_or_fail(len(key) > 0, f"Marker map range {key} is empty")
+            return key
+        true_or_fail(
+            isinstance(key, (int, np.integer)) and not isinstance(key, bool),
+            f"Marker map key {key!r} is neither an integer nor a range",
+        )
+        return range(int(key), int(key) + 1)
+
+    def compile(self, marker_map: dict):
+        entries = []
+        for key, description in marker_map.items():
+            true_or_fail(
+                isinstance(description, str),
+                f"Marker map description {description!r} for {key!r} is not text",
+            )
+            entries.append((self.as_codes(key), description))
+
+        self.first_code = min(min(codes) for codes, _ in entries)
+        last_code = max(max(codes) for codes, _ in entries)
+        true_or_fail(
+            last_code - self.first_code < MAX_CODE_SPAN,
+            f"Marker map spans more than {MAX_CODE_SPAN} codes",
+        )
+
+        self.table = np.zeros(last_code - self.first_code + 1, dtype=np.int32)
+
+        # Fill in reverse, so earlier entries overwrite later ones
+        for codes, description in reversed(entries):
+            if description not in self.descriptions:
+                self.descriptions.append(description)
+            index = self.descriptions.index(description)
+            self.table[np.arange(codes.start, codes.stop, codes.step) - self.first_code] = index
+
+    def describe(self, markers) -> list[str]:
+        """
+        Returns the description of every marker code, or "" if not in the map.
+        """
+        return self.describe_array(markers).tolist()
+
+    def describe_array(self, markers) -> np.ndarray:
+        """
+        Returns the descriptions as an object array that shares the strings
+        of the map, so describing many markers takes little memory.
+        """
+        markers = np.asarray(markers, dtype=np.float64)
+        indexes = np.zeros(len(markers), dtype=np.int32)
+
+        offsets = markers - self.first_code
+        valid = (
+            (offsets >= 0)
+            & (offsets < len(self.table))
+            & (np.floor(offsets) == offsets)
+        )
+        indexes[valid] = self.table[offsets[valid].astype(np.int64)]
+
+        return np.array(self.descriptions, dtype=object)[indexes]
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Stages whose bytes are read from the input file and written to the outputs.
+# Other stages work on data already in memory and count towards neither.
+INPUT_STAGES = ("decode",)
+OUTPUT_STAGES = ("raw", "header", "vmrk")
+
+# Stages running at once, as when files are prefetched, share one trace
+TRACING_LOCK = threading.Lock()
+tracing_stages = 0
+started_tracing = False
+
+
+def start_tracing() -> int:
+    """
+    Starts tracing allocations for a stage, unless another stage already
+    does, and returns the memory allocated so far.
+    """
+    global tracing_stages, started_tracing
+    with TRACING_LOCK:
+        if tracing_stages == 0:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+        tracing_stages += 1
+        allocated, _ = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+    return allocated
+
+
+def stop_tracing() -> int:
+    """
+    Returns the peak memory allocated since the stage started tracing, and
+    stops tracing once no stage runs, unless it was tracing before.
+    """
+    global tracing_stages
+    with TRACING_LOCK:
+        _, peak = tracemalloc.get_traced_memory()
+        tracing_stages -= 1
+        if tracing_stages == 0 and started_tracing:
+            tracemalloc.stop()
+    return peak
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident memory of this process in MB, or None if unknown.
+
+    This is the high-water mark over the lifetime of the process, so a worker
+    of a pool reports the largest file it converted so far.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == "darwin":
+        return peak / 2**20
+    return peak / 2**10
+
+
+class Profiler:
+    """
+    Records wall time, CPU time, peak memory and throughput of conversion stages.
+
+    A disabled profiler records nothing, so stages can always be wrapped.
+    CPU time is that of the thread running the stage. The peak memory of a
+    stage is the most memory allocated by Python and numpy during it, traced
+    with tracemalloc, beyond what was allocated when it started. Mapped files
+    are not counted. The worker peak is the high-water mark of the process,
+    see 'peak_rss_mb'.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str, nbytes=None):
+        """
+        Profiles the code inside the block as a stage called 'name'.
+
+        'nbytes' is the number of bytes processed, or a function returning it
+        once the stage is done, and is used for the throughput.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        allocated = start_tracing()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            peak = stop_tracing()
+
+        if callable(nbytes):
+            nbytes = nbytes()
+
+        self.stages.append(
+            {
+                "stage": name,
+                "wall_s": wall,
+                "cpu_s": cpu,
+                "peak_mb": max(peak - allocated, 0) / 2**20,
+                "worker_peak_rss_mb": peak_rss_mb(),
+                "bytes": nbytes,
+                "mb_per_s": nbytes / 2**20 / wall if nbytes and wall else None,
+            }
+        )
+
+    def report(self) -> dict:
+        """
+        Returns the totals of all stages and the stages themselves.
+
+        The input throughput is the bytes of the 'INPUT_STAGES' and the output
+        throughput those of the 'OUTPUT_STAGES', each over the wall time of all
+        stages, so both are rates of the conversion as a whole.
+        """
+        wall = sum(stage["wall_s"] for stage in self.stages)
+        input_bytes = self.total_bytes(INPUT_STAGES)
+        output_bytes = self.total_bytes(OUTPUT_STAGES)
+        return {
+            "wall_s": wall,
+            "cpu_s": sum(stage["cpu_s"] for stage in self.stages),
+            "peak_mb": max((stage["peak_mb"] for stage in self.stages), default=0.0),
+            "worker_peak_rss_mb": peak_rss_mb(),
+            "input_bytes": input_bytes,
+            "input_mb_per_s": input_bytes / 2**20 / wall if wall else None,
+            "output_bytes": output_bytes,
+            "output_mb_per_s": output_bytes / 2**20 / wall if wall else None,
+            "stages": self.stages,
+        }
+
+    def total_bytes(self, names: tuple) -> int:
+        return sum(
+            stage["bytes"] or 0 for stage in self.stages if stage["stage"] in names
+        )
+
+
+def write_report(report_file: Path, records: list[dict]):
+    """
+    Appends records to a newline-delimited JSON report.
+    """
+    with Path(report_file).open("a") as report:
+        for record in records:
+            report.write(json.dumps(record, default=str) + "\n")
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva.util.manifest import open_output
+
+QC_SUMMARY_NAME = "acq2bva_qc.json"
+QC_SUFFIX = ".qc.json"
+
+# Runs of identical samples at least this long, in seconds, are flatlines
+FLATLINE_DURATION = 0.5
+
+# Channels with more of their samples at their extremes than this are clipped
+CLIPPED_FRACTION = 0.001
+
+
+class ChannelStats:
+    """
+    Accumulates statistics of a channel from the blocks of samples written.
+
+    Every statistic is a streaming reduction, so blocks are seen once and in
+    order and no more than a block is ever held. Values are multiplied by
+    'scale' when reported, for raw samples written with a resolution.
+
+    Clipping is counted as the samples at the lowest and highest values of the
+    channel, kept up to date as lower or higher values come in. Flatlines are
+    runs of at least 'flatline_length' identical samples, also across blocks.
+    """
+
+    def __init__(self, flatline_length: int, scale: float = 1) -> None:
+        self.flatline_length = max(int(flatline_length), 2)
+        self.scale = scale
+        self.n_samples = 0
+        self.n_finite = 0
+        self.n_nan = 0
+        self.n_inf = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.low = math.inf
+        self.high = -math.inf
+        self.n_low = 0
+        self.n_high = 0
+        self.flatline_runs = 0
+        self.flatline_samples = 0
+        self.longest_flatline = 0
+        self.last = None
+        self.run = 0
+
+    def update(self, block: np.ndarray):
+        if not len(block):
+            return
+        self.n_samples += len(block)
+        self.update_flatlines(block)
+
+        finite = block
+        if block.dtype.kind == "f":
+            is_finite = np.isfinite(block)
+            if not is_finite.all():
+                nan = int(np.count_nonzero(np.isnan(block)))
+                self.n_nan += nan
+                self.n_inf += int(len(block) - np.count_nonzero(is_finite)) - nan
+                finite = block[is_finite]
+                if not len(finite):
+                    return
+        self.n_finite += len(finite)
+
+        values = finite.astype(np.float64, copy=False)
+        self.total += float(values.sum())
+        self.total_squares += float(np.dot(values, values))
+
+        low, high = float(finite.min()), float(finite.max())
+        if low < self.low:
+            self.low, self.n_low = low, 0
+        if low == self.low:
+            self.n_low += int(np.count_nonzero(finite == low))
+        if high > self.high:
+            self.high, self.n_high = high, 0
+        if high == self.high:
+            self.n_high += int(np.count_nonzero(finite == high))
+
+    def update_flatlines(self, block: np.ndarray):
+        # Runs of identical samples, the first one continues the run of the
+        # last block if it starts with the same value
+        changes = np.flatnonzero(block[1:] != block[:-1]) + 1
+        starts = np.concatenate(([0], changes))
+        lengths = np.diff(np.append(starts, len(block)))
+        if self.last is not None and block[0] == self.last:
+            lengths[0] += self.run
+        else:
+            self.close_run(self.run)
+
+        # The last run is still open
+        self.close_runs(lengths[:-1])
+        self.run = int(lengths[-1])
+        self.last = block[-1]
+
+    def close_runs(self, lengths: np.ndarray):
+        flat = lengths[lengths >= self.flatline_length]
+        if len(flat):
+            self.flatline_runs += len(flat)
+            self.flatline_samples += int(flat.sum())
+            self.longest_flatline = max(self.longest_flatline, int(flat.max()))
+
+    def close_run(self, length: int):
+        self.close_runs(np.array([length]))
+
+    def report(self, samples_per_second: float) -> dict:
+        self.close_run(self.run)
+        self.run = 0
+        self.last = None
+
+        n = self.n_finite
+        mean = self.total / n if n else None
+        rms = math.sqrt(self.total_squares / n) if n else None
+        low, high = (self.low, self.high) if n else (None, None)
+        if n and self.scale != 1:
+            mean, rms = mean * self.scale, rms * abs(self.scale)
+            low, high = sorted((low * self.scale, high * self.scale))
+
+        # A constant channel is flat, not clipped
+        n_extreme = self.n_low + self.n_high if n and self.low != self.high else 0
+
+        return {
+            "samples": self.n_samples,
+            "min": low,
+            "max": high,
+            "mean": mean,
+            "rms": rms,
+            "nan": self.n_nan,
+            "inf": self.n_inf,
+            "clipped_fraction": n_extreme / n if n else 0.0,
+            "flatline_runs": self.flatline_runs,
+            "flatline_samples": self.flatline_samples,
+            "longest_flatline_s": self.longest_flatline / samples_per_second,
+        }
+
+
+def marker_counts(markers: np.ndarray, expected_nr_markers: int = None) -> dict:
+    """
+    Returns the number of markers of every code, and their total next to the
+    number expected.
+    """
+    if markers is None:
+        return None
+    codes, counts = np.unique(markers["type"], return_counts=True)
+    return {
+        "total": len(markers),
+        "expected": expected_nr_markers,
+        "counts": {str(code): int(count) for code, count in zip(codes.tolist(), counts)},
+    }
+
+
+def channel_warnings(report: dict) -> list[str]:
+    """
+    Returns the problems found in the channels of a QC report.
+    """
+    warnings = []
+    for channel in report["channels"]:
+        name = f"{report['data_file']}: {channel['name']}"
+        if channel["nan"] or channel["inf"]:
+            warnings.append(f"{name}: {channel['nan']} NaN and {channel['inf']} Inf samples")
+        if channel["clipped_fraction"] > CLIPPED_FRACTION:
+            warnings.append(
+                f"{name}: {channel['clipped_fraction']:.2%} of samples at its extremes"
+            )
+        if channel["flatline_runs"]:
+            warnings.append(
+                f"{name}: {channel['flatline_runs']} flatlines, "
+                f"longest {channel['longest_flatline_s']:g} s"
+            )
+    return warnings
+
+
+def file_qc(
+    acq_file: Path, ok: bool, reports: list[dict], expected_nr_markers: int = None
+) -> dict:
+    """
+    Returns the QC of a converted file from the reports of its '.dat' files,
+    with the markers of every code counted over all of them.
+    """
+    markers = None
+    if any(report.get("markers") for report in reports):
+        counts = {}
+        for report in reports:
+            for code, count in (report.get("markers") or {}).get("counts", {}).items():
+                counts[code] = counts.get(code, 0) + count
+        markers = {
+            "total": sum(counts.values()),
+            "expected": expected_nr_markers,
+            "counts": counts,
+        }
+
+    warnings = [warning for report in reports for warning in channel_warnings(report)]
+    if markers and expected_nr_markers is not None:
+        if markers["total"] != expected_nr_markers:
+            warnings.append(
+                f"{markers['total']} markers found, {expected_nr_markers} expected"
+            )
+
+    return {
+        "acq_file": acq_file,
+        "ok": ok,
+        "data_files": [report["data_file"] for report in reports],
+        "markers": markers,
+        "warnings": warnings,
+    }
+
+
+def write_qc(qc_file: Path, qc: dict, digest=None):
+    with open_output(qc_file, digest, text=True) as f:
+        json.dump(qc, f, indent=2, default=str)
+
+
+def load_qc(qc_file: Path) -> dict:
+    """
+    Returns a QC report written before, or None if it cannot be read.
+    """
+    try:
+        with Path(qc_file).open() as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_qc_summary(
+    output_folder: Path, files: list[dict], name: str = QC_SUMMARY_NAME
+) -> Path:
+    """
+    Writes the QC of a batch to the output folder, one entry per file with
+    its reports and their warnings.
+    """
+    summary_file = output_folder / name
+    write_qc(
+        summary_file,
+        {
+            "files": files,
+            "warnings": sum(len(entry["warnings"]) for entry in files),
+        },
+    )
+    return summary_file
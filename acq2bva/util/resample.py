@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import numpy as np
+from bioread.biopac import Channel
+
+from acq2bva.util.error import true_or_fail
+
+# Methods of bringing a channel to a higher sample rate
+RESAMPLE_METHODS = {
+    "hold": "sample-and-hold",
+    "linear": "linear interpolation",
+}
+
+
+def divider(channel: Channel) -> int:
+    return channel.frequency_divider or 1
+
+
+def common_divider(channels: list[Channel]) -> int:
+    """
+    Returns the frequency divider of the fastest channel, the rate that all
+    channels are written at.
+    """
+    return min(divider(channel) for channel in channels)
+
+
+def resample_methods(resample: str | list[str], n_channels: int) -> list[str]:
+    """
+    Returns the resampling method of every channel, from one method for all
+    channels or one for each.
+    """
+    methods = [resample] * n_channels if isinstance(resample, str) else list(resample)
+    true_or_fail(
+        len(methods) == n_channels,
+        "One resampling method or one for every channel must be given",
+    )
+    true_or_fail(
+        all(method in RESAMPLE_METHODS for method in methods),
+        f"Resampling method must be one of {', '.join(RESAMPLE_METHODS)}",
+    )
+    return methods
+
+
+def resampled_blocks(
+    data: np.ndarray,
+    ratio: float,
+    n_samples: int,
+    block_size: int,
+    method: str = "hold",
+    scale=None,
+    offset: float = 0,
+):
+    """
+    Yields 'n_samples' samples of 'data' resampled at 'ratio' times its rate,
+    in blocks of at most 'block_size' samples. The first sample is taken
+    'offset' output samples after the start of 'data'.
+
+    Every block is computed from the slice of 'data' it spans, so only that
+    slice is read, and scaled with 'scale' if given. Samples past the end of
+    'data' hold its last value.
+    """
+    last = len(data) - 1
+    for start in range(0, n_samples, block_size):
+        # Position of every output sample in the input samples
+        rows = np.arange(start, min(start + block_size, n_samples))
+        positions = (rows + offset) / ratio
+        first = min(int(positions[0]), last)
+        stop = min(int(positions[-1]) + 2, last + 1)
+
+        source = data[first:stop]
+        if scale is not None:
+            source = scale(source)
+
+        if method == "hold":
+            indexes = np.minimum(positions.astype(np.int64), last) - first
+            yield source[indexes]
+        else:
+            yield np.interp(positions - first, np.arange(len(source)), source)
+
+
+def rescale_markers(markers: np.ndarray, from_divider: int, to_divider: int) -> np.ndarray:
+    """
+    Returns markers with positions and lengths moved from one rate to another,
+    given as frequency dividers of the file's rate.
+    """
+    if from_divider == to_divider:
+        return markers
+    rescaled = markers.copy()
+    rescaled["position"] = markers["position"] * from_divider // to_divider
+    rescaled["points"] = np.maximum(markers["points"] * from_divider // to_divider, 1)
+    return rescaled
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+from acq2bva.util.error import true_or_fail
+from acq2bva.util.journal import JOURNAL_NAME
+from acq2bva.util.manifest import MANIFEST_NAME, load_manifest, save_manifest
+from acq2bva.util.qc import QC_SUMMARY_NAME, load_qc, write_qc_summary
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """
+    Parses a shard given as 'i/N', the i-th of N shards counting from 1.
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", str(text))
+    true_or_fail(match is not None, f"Shard must be given as i/N, not {text}")
+    index, count = int(match[1]), int(match[2])
+    true_or_fail(
+        1 <= index <= count, f"Shard {index}/{count} is not between 1 and {count}"
+    )
+    return index, count
+
+
+def shard_name(name: str, shard: tuple[int, int] = None) -> str:
+    """
+    Returns the name of a batch file of a shard, such as its manifest, so
+    that shards writing to the same output folder do not overwrite each other.
+    """
+    if shard is None:
+        return name
+    stem, dot, suffix = name.partition(".")
+    return f"{stem}.shard-{shard[0]}-of-{shard[1]}{dot}{suffix}"
+
+
+def shard_files(
+    acq_files: list[Path], shard: tuple[int, int], balance: bool = False
+) -> list[Path]:
+    """
+    Returns the files of one shard of a batch, in the order given.
+
+    Files are ordered by name, then by path for files of the same name in
+    different folders, which every node sees the same, and dealt out in turn.
+
+    With 'balance', files are instead given, largest first, to the shard with
+    the fewest bytes so far, so shards take about as long when file sizes
+    differ. Either way every file is in exactly one shard.
+    """
+    index, count = shard
+    keys = sorted(acq_files, key=lambda acq_file: (acq_file.name, acq_file.as_posix()))
+
+    if balance:
+        sizes = {acq_file: acq_file.stat().st_size for acq_file in keys}
+        totals = [0] * count
+        owners = {}
+        for acq_file in sorted(keys, key=lambda acq_file: -sizes[acq_file]):
+            owner = totals.index(min(totals))
+            owners[acq_file] = owner
+            totals[owner] += sizes[acq_file]
+    else:
+        owners = {acq_file: i % count for i, acq_file in enumerate(keys)}
+
+    return [acq_file for acq_file in acq_files if owners[acq_file] == index - 1]
+
+
+def find_shards(output_folder: Path, name: str) -> dict[tuple[int, int], Path]:
+    """
+    Returns the batch files of every shard in an output folder by shard.
+    """
+    stem, dot, suffix = name.partition(".")
+    pattern = re.compile(
+        rf"{re.escape(stem)}\.shard-(\d+)-of-(\d+){re.escape(dot + suffix)}"
+    )
+    shards = {}
+    for file_path in output_folder.iterdir():
+        match = pattern.fullmatch(file_path.name)
+        if match:
+            shards[(int(match[1]), int(match[2]))] = file_path
+    return shards
+
+
+def merge_shards(output_folder: Path) -> dict:
+    """
+    Merges the manifests and QC summaries of the shards of a batch into the
+    manifest and QC summary of the output folder, and removes them.
+
+    Every shard must have finished, so the merged manifest covers the whole
+    batch. Returns the number of shards and the number of files merged.
+    """
+    manifests = find_shards(output_folder, MANIFEST_NAME)
+    true_or_fail(len(manifests) > 0, f"No shards found in {output_folder}")
+
+    counts = {count for _, count in manifests}
+    true_or_fail(
+        len(counts) == 1, f"Shards of different batches found: {sorted(manifests)}"
+    )
+    count = counts.pop()
+    missing = [
+        f"{i}/{count}" for i in range(1, count + 1) if (i, count) not in manifests
+    ]
+    true_or_fail(not missing, f"Shards {', '.join(missing)} have not finished")
+    interrupted = [f"{i}/{n}" for i, n in find_shards(output_folder, JOURNAL_NAME)]
+    true_or_fail(
+        not interrupted,
+        f"Shards {', '.join(interrupted)} were interrupted, resume them before merging",
+    )
+
+    manifest = load_manifest(output_folder)
+    for shard in sorted(manifests):
+        manifest["files"].update(
+            load_manifest(output_folder, manifests[shard].name)["files"]
+        )
+    save_manifest(output_folder, manifest)
+
+    summaries = find_shards(output_folder, QC_SUMMARY_NAME)
+    if summaries:
+        files = {}
+        summary = load_qc(output_folder / QC_SUMMARY_NAME)
+        shard_qcs = [load_qc(summaries[shard]) for shard in sorted(summaries)]
+        for qc in [summary] + shard_qcs:
+            for entry in (qc or {}).get("files", []):
+                files[Path(entry["acq_file"]).name] = entry
+        write_qc_summary(output_folder, [files[name] for name in sorted(files)])
+
+    for file_path in [*manifests.values(), *summaries.values()]:
+        file_path.unlink()
+
+    return {"shards": count, "files": len(manifest["files"])}
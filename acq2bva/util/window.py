@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+from bioread.biopac import Channel
+
+from acq2bva.util.error import true_or_fail
+from acq2bva.util.marker_map import MarkerMap
+from acq2bva.util.resample import common_divider
+
+
+def recording_length(channels: list[Channel]) -> int:
+    """
+    Returns the number of samples of a recording at the rate of the file.
+    """
+    return max(
+        channel.point_count * (channel.frequency_divider or 1) for channel in channels
+    )
+
+
+def find_marker_window(markers: np.ndarray, start_codes, end_codes) -> tuple[int, int]:
+    """
+    Returns the samples spanned by the first marker with one of 'start_codes'
+    up to and including the first marker after it with one of 'end_codes'.
+
+    Codes are given as in a marker map, as an integer or a range.
+    """
+    start_codes = MarkerMap.as_codes(start_codes)
+    end_codes = MarkerMap.as_codes(end_codes)
+
+    starts = np.flatnonzero(np.isin(markers["type"], start_codes))
+    true_or_fail(len(starts) > 0, f"No marker with a code in {start_codes} found")
+    first = starts[0]
+
+    ends = np.flatnonzero(np.isin(markers["type"][first + 1 :], end_codes))
+    true_or_fail(
+        len(ends) > 0, f"No marker with a code in {end_codes} found after the start"
+    )
+    last = first + 1 + ends[0]
+
+    return (
+        int(markers["position"][first]),
+        int(markers["position"][last] + markers["points"][last]),
+    )
+
+
+def resolve_window(
+    n_samples: int,
+    samples_per_second: float,
+    markers: np.ndarray = None,
+    window: tuple[float, float] = None,
+    sample_window: tuple[int, int] = None,
+    marker_window: tuple = None,
+) -> tuple[int, int]:
+    """
+    Returns the samples to export as a half-open range, from a window in
+    seconds, in samples or between markers. Defaults to every sample.
+    """
+    start, end = 0, n_samples
+    if window is not None:
+        start = math.floor(window[0] * samples_per_second)
+        end = math.ceil(window[1] * samples_per_second)
+    elif sample_window is not None:
+        start, end = sample_window
+    elif marker_window is not None:
+        true_or_fail(
+            markers is not None,
+            "To export between markers, please indicate the marker channel index",
+        )
+        start, end = find_marker_window(markers, *marker_window)
+
+    start, end = max(start, 0), min(end, n_samples)
+    true_or_fail(start < end, f"Window {start}-{end} holds no samples")
+    return start, end
+
+
+def window_channel(channel: Channel, start: int, end: int) -> Channel:
+    """
+    Returns a channel holding the samples of 'channel' in a window.
+
+    'start' and 'end' are samples at the rate of the file, and are divided
+    by the frequency divider of the channel. The window starts at the sample
+    that covers 'start' and ends with the one that covers 'end' - 1, and
+    'window_offset' is the number of samples at the rate of the file from the
+    start of the first sample to 'start'. The raw data is a view.
+    """
+    divider = channel.frequency_divider or 1
+    # Windows of a window are taken from where the first one starts
+    start += window_offset(channel)
+    end += window_offset(channel)
+    first = start // divider
+    stop = -(-end // divider)
+
+    windowed = Channel(
+        frequency_divider=channel.frequency_divider,
+        raw_scale_factor=channel.raw_scale_factor,
+        raw_offset=channel.raw_offset,
+        name=channel.name,
+        units=channel.units,
+        fmt_str=channel.fmt_str,
+        samples_per_second=channel.samples_per_second,
+        point_count=max(min(stop, channel.point_count) - first, 0),
+        order_num=channel.order_num,
+    )
+    windowed.window_offset = start - first * divider
+    if channel.raw_data is not None:
+        windowed.raw_data = channel.raw_data[first:stop]
+    return windowed
+
+
+def window_offset(channel: Channel) -> int:
+    return getattr(channel, "window_offset", 0)
+
+
+def window_markers(markers: np.ndarray, start: int, end: int) -> np.ndarray:
+    """
+    Returns the markers starting in a window, with positions relative to it.
+    """
+    inside = (markers["position"] >= start) & (markers["position"] < end)
+    windowed = markers[inside]
+    windowed["position"] -= start
+    return windowed
+
+
+def split_length(
+    channels: list[Channel],
+    samples_per_second: float,
+    sample_size: int,
+    split_duration: float = None,
+    split_size: int = None,
+) -> int:
+    """
+    Returns the number of samples at the rate of the file in a segment of at
+    most 'split_duration' seconds and at most 'split_size' bytes of raw data,
+    with 'sample_size' bytes per written sample of 'channels'. Channels are
+    written at the rate of the fastest one.
+    """
+    lengths = []
+    if split_duration is not None:
+        lengths.append(math.floor(split_duration * samples_per_second))
+    if split_size is not None:
+        bytes_per_sample = len(channels) * sample_size / common_divider(channels)
+        lengths.append(math.floor(split_size / bytes_per_sample))
+
+    length = min(lengths)
+    true_or_fail(length > 0, "Segments must hold at least one sample")
+    return length
+
+
+def segment_bounds(n_samples: int, length: int):
+    """
+    Yields consecutive half-open ranges of 'length' samples covering a
+    recording, the last one may be shorter.
+    """
+    for start in range(0, n_samples, length):
+        yield start, min(start + length, n_samples)
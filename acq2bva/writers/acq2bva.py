@@ -1,129 +1,939 @@
 from __future__ import annotations
 
+import hashlib
+import logging
+import os
+from functools import partial
 from pathlib import Path
 
 import bioread
+import numpy as np
 
+from acq2bva.readers import (
+    inflate_datafile,
+    inventory_channels,
+    load_inventories,
+    memmap_datafile,
+)
+from acq2bva.util.batch import prefetched, run_batch
+from acq2bva.util.digital import combine_bit_channels, marker_indexes
 from acq2bva.util.error import true_or_exit, true_or_fail
-from acq2bva.writers.acq2raw import acq2raw
-from acq2bva.writers.acq2vhdr import acq2vhdr
-from acq2bva.writers.acq2vmrk import acq2vmrk
+from acq2bva.util.journal import JOURNAL_NAME, Journal, read_journal
+from acq2bva.util.manifest import (
+    HASH_ALGORITHMS,
+    MANIFEST_NAME,
+    file_entry,
+    is_up_to_date,
+    load_manifest,
+    remove_temp_files,
+    save_manifest,
+    settings_fingerprint,
+)
+from acq2bva.util.marker_map import MarkerMap
+from acq2bva.util.profiling import Profiler, write_report
+from acq2bva.util.qc import (
+    FLATLINE_DURATION,
+    QC_SUFFIX,
+    QC_SUMMARY_NAME,
+    ChannelStats,
+    file_qc,
+    load_qc,
+    marker_counts,
+    write_qc,
+    write_qc_summary,
+)
+from acq2bva.util.resample import (
+    common_divider,
+    divider,
+    resample_methods,
+    rescale_markers,
+)
+from acq2bva.util.shard import shard_files, shard_name
+from acq2bva.util.window import (
+    recording_length,
+    resolve_window,
+    segment_bounds,
+    split_length,
+    window_channel,
+    window_markers,
+)
+from acq2bva.writers.acq2raw import BINARY_FORMATS, acq2raw, lossy_int16_channels
+from acq2bva.writers.acq2vhdr import acq2vhdr, create_header_infos
+from acq2bva.writers.acq2vmrk import (
+    acq2vmrk,
+    check_nr_markers,
+    create_marker_array,
+    create_trigger_array,
+    generate_text,
+)
+
+
+# Rough throughput of each step in MB per second, as measured by
+# benchmarks/bench_plan.py on synthetic recordings: 'read' and 'inflate' are
+# the decode of uncompressed and compressed files, 'write' the outputs. Used to
+# estimate the run time of a plan, '--profile' measures the real one.
+PLAN_THROUGHPUT = {"read": 35, "inflate": 55, "write": 500}
+
+
+def format_size(file_size: int):
+    display_sizes = ["B", "KB", "MB", "GB"]
+    for size in display_sizes:
+        if file_size <= 1024:
+            return f"{file_size} {size}"
+        else:
+            file_size //= 1024
+    return f"{file_size} TB"
+
+
+def get_file_size(file_path: Path):
+    return format_size(file_path.stat().st_size)
+
+
+def get_path_with_suffix(file_name: Path, suffix: str, directory: Path = None):
+    new_file_name = file_name.with_suffix(suffix)
+    if directory is not None:
+        new_file_name = directory / new_file_name.name
+    return new_file_name
+
+
+def estimate_memory(acq_file: Path, read_indexes: list[int] = None) -> int:
+    """
+    Estimates the memory needed to convert an AcqKnowledge file.
+
+    Every channel read is held as raw samples and as scaled float64 data.
+    """
+    try:
+        channels = bioread.read_headers(str(acq_file)).channels
+    except Exception:
+        return acq_file.stat().st_size * 5
+
+    if read_indexes is not None:
+        channels = [channels[i] for i in read_indexes]
+
+    return sum(channel.point_count * (channel.sample_size + 8) for channel in channels)
+
+
+def plan_conversion(
+    acq_files: list[Path],
+    # Channels
+    channel_indexes: list[int] = None,
+    channel_names: list[str] = None,
+    channel_scales: list[int] = None,
+    channel_units: list[str] = None,
+    # Raw data
+    binary_format: str = "IEEE_FLOAT_32",
+    data_orientation: str = "VECTORIZED",
+    resample: str | list[str] = "hold",
+    # Markers
+    write_markers: bool = False,
+    marker_channel_index: int | list[int] = None,
+    marker_map: dict[int, str] = {},
+    expected_nr_markers: int = None,
+    # Other settings
+    header_settings: dict = {},
+) -> list[dict]:
+    """
+    Plans the conversion of AcqKnowledge files from their headers only.
+
+    Returns, for every file, its channels, the projected size of every output
+    file in bytes and the estimated run time in seconds. The '.vhdr' size is
+    exact, the '.vmrk' size is estimated from 'expected_nr_markers' and is
+    None without it. Headers are cached, see 'load_inventories'.
+    """
+    if write_markers and not isinstance(marker_map, MarkerMap):
+        marker_map = MarkerMap(marker_map)
+
+    plans = []
+    for acq_file, inventory in load_inventories(acq_files).items():
+        channels = inventory_channels(inventory)
+        selected = channels
+        if channel_indexes is not None:
+            selected = [channels[i] for i in channel_indexes]
+
+        to_divider = common_divider(selected)
+        methods = resample_methods(resample, len(selected))
+
+        file_format = binary_format
+        if file_format == "INT_16" and lossy_int16_channels(selected, methods):
+            file_format = "IEEE_FLOAT_32"
+
+        data_file = get_path_with_suffix(acq_file, ".dat").name
+        marker_file = get_path_with_suffix(acq_file, ".vmrk").name
+        sample_size = np.dtype(BINARY_FORMATS[file_format]).itemsize
+        header = create_header_infos(
+            data_file,
+            selected,
+            channel_names,
+            channel_scales,
+            channel_units,
+            None,
+            inventory["samples_per_second"],
+            file_format,
+            data_orientation,
+            resample,
+            marker_file if write_markers else None,
+            header_settings,
+        )
+        # Channels are written at the rate of the fastest one
+        n_samples = max(
+            channel.point_count for channel in selected if divider(channel) == to_divider
+        )
+        outputs = {
+            ".dat": n_samples * len(selected) * sample_size,
+            ".vhdr": len(header.generate_text().encode()),
+        }
+
+        if write_markers:
+            outputs[".vmrk"] = None
+            if expected_nr_markers is not None:
+                marker_channel = channels[marker_indexes(marker_channel_index)[0]]
+                # Every marker is counted as long as the last possible one
+                last_marker = {
+                    "type": max(marker_map.first_code + len(marker_map.table), 255),
+                    "description": max(marker_map.descriptions, key=len),
+                    "position": marker_channel.point_count,
+                    "points": 1,
+                    "channel": 0,
+                }
+                empty = len(generate_text(data_file, []).encode())
+                line = len(generate_text(data_file, [last_marker]).encode()) - empty
+                outputs[".vmrk"] = empty + line * expected_nr_markers
+
+        read_bytes = acq_file.stat().st_size
+        if channel_indexes is not None and channels:
+            read_bytes = read_bytes * len(selected) // len(channels)
+        read_step = "inflate" if inventory["compressed"] else "read"
+        seconds = read_bytes / 2**20 / PLAN_THROUGHPUT[read_step] + sum(
+            size or 0 for size in outputs.values()
+        ) / 2**20 / PLAN_THROUGHPUT["write"]
+
+        plans.append(
+            {
+                "acq_file": acq_file,
+                "samples_per_second": inventory["samples_per_second"],
+                "compressed": inventory["compressed"],
+                "channels": inventory["channels"],
+                "binary_format": file_format,
+                "outputs": {
+                    get_path_with_suffix(acq_file, suffix).name: size
+                    for suffix, size in outputs.items()
+                },
+                "seconds": seconds,
+            }
+        )
+
+    return plans
+
+
+def read_acq_file(
+    acq_file: Path,
+    read_indexes: list[int] = None,
+    profile: bool = False,
+    memory_map: bool = False,
+    decode_threads: int = None,
+) -> tuple:
+    """
+    Decodes an AcqKnowledge file, returns the data and a profiler holding
+    the decode stage.
+
+    Compressed files have their channels inflated by 'decode_threads' threads
+    (defaults to the CPU count). With 'memory_map', uncompressed files are
+    mapped instead of decoded, so samples are only read when they are written.
+    Other files are decoded.
+    """
+    profiler = Profiler(enabled=profile)
+    with profiler.stage("decode", acq_file.stat().st_size):
+        acq_data = memmap_datafile(acq_file) if memory_map else None
+        if acq_data is None:
+            acq_data = inflate_datafile(acq_file, read_indexes, decode_threads)
+        if acq_data is None:
+            acq_data = bioread.read(str(acq_file), channel_indexes=read_indexes)
+    return acq_data, profiler
+
+
+def convert_acq_file(
+    acq_file: Path,
+    # Paths
+    output_folder: Path,
+    # Channels
+    read_indexes: list[int] = None,
+    channel_indexes: list[int] = None,
+    channel_names: list[str] = None,
+    channel_scales: list[int] = None,
+    channel_units: list[str] = None,
+    # Raw data
+    binary_format: str = "IEEE_FLOAT_32",
+    data_orientation: str = "VECTORIZED",
+    resample: str | list[str] = "hold",
+    # Markers
+    write_markers: bool = False,
+    marker_channel_index: int | list[int] = None,
+    marker_map: MarkerMap = None,
+    expected_nr_markers: int = None,
+    marker_threshold: float = 2.5,
+    marker_bit_order: str = "lsb",
+    trigger_threshold: float = None,
+    trigger_hysteresis: float = 0,
+    trigger_min_width: float = 0,
+    trigger_refractory: float = 0,
+    trigger_type: str = "Stimulus",
+    trigger_description: str = "Trigger",
+    # Window
+    window: tuple[float, float] = None,
+    sample_window: tuple[int, int] = None,
+    marker_window: tuple = None,
+    # Split
+    split_duration: float = None,
+    split_size: int = None,
+    # Quality control
+    qc: bool = False,
+    flatline_duration: float = FLATLINE_DURATION,
+    # Other settings
+    header_settings: dict = {},
+    checksum: str = "blake2b",
+    profile: bool = False,
+    memory_map: bool = False,
+    decode_threads: int = None,
+    decoded: tuple = None,
+) -> dict:
+    """
+    Converts a single AcqKnowledge file and returns the result of the conversion.
+
+    Errors are not raised but returned in the result, so that one bad file
+    does not stop a batch. With 'profile', the result holds a profile of
+    every stage of the conversion. 'decoded' is the result of 'read_acq_file'
+    when the file was decoded beforehand.
+
+    Only the samples in 'window' (seconds), 'sample_window' (samples) or
+    'marker_window' (start and end codes) are exported, see 'resolve_window'.
+    Markers are found in the whole marker channel and rebased to the window.
+
+    With 'split_duration' (seconds) or 'split_size' (bytes of raw data), the
+    output is split into numbered segments, see 'acq2bva'.
+
+    With 'qc', the statistics of every channel are gathered while it is
+    written and saved next to every '.dat' file, see 'acq2bva'. The reports
+    are returned in the result.
+
+    Every output is hashed with 'checksum' as it is written, and the digests
+    are returned in the result by file name.
+    """
+    result = {
+        "acq_file": acq_file,
+        "ok": False,
+        "skipped": False,
+        "outputs": [],
+        "error": None,
+    }
+    if qc:
+        result["qc"] = []
+    profiler = Profiler(enabled=profile)
+
+    # Hashes of the outputs, fed as they are written
+    digests = {}
+
+    def new_digest(output: Path):
+        if checksum is None:
+            return None
+        digests[output.name] = hashlib.new(checksum)
+        return digests[output.name]
+
+    try:
+        if decoded is None:
+            decoded = read_acq_file(
+                acq_file, read_indexes, profile, memory_map, decode_threads
+            )
+        elif isinstance(decoded, BaseException):
+            raise decoded
+        acq_data, profiler = decoded
+
+        channels = acq_data.channels
+
+        markers = None
+        if write_markers or marker_window is not None:
+            true_or_fail(
+                marker_channel_index is not None,
+                "To write markers, please indicate the marker channel index",
+            )
+            if isinstance(marker_channel_index, list):
+                bit_channels = [channels[i] for i in marker_channel_index]
+                nbytes = sum(channel.data_length for channel in bit_channels)
+                with profiler.stage("bits", nbytes):
+                    marker_channel = combine_bit_channels(
+                        bit_channels, marker_threshold, marker_bit_order
+                    )
+            else:
+                marker_channel = channels[marker_channel_index]
+
+            with profiler.stage("markers", marker_channel.data_length):
+                if trigger_threshold is not None:
+                    markers = create_trigger_array(
+                        marker_channel,
+                        trigger_threshold,
+                        trigger_hysteresis,
+                        trigger_min_width,
+                        trigger_refractory,
+                        trigger_type,
+                        trigger_description,
+                    )
+                else:
+                    markers = create_marker_array(marker_channel, marker_map)
+
+            # Marker positions are kept at the rate of the file until written
+            markers = rescale_markers(markers, divider(marker_channel), 1)
+
+        if any(w is not None for w in (window, sample_window, marker_window)):
+            start, end = resolve_window(
+                recording_length(channels),
+                acq_data.samples_per_second,
+                markers,
+                window,
+                sample_window,
+                marker_window,
+            )
+            channels = [window_channel(channel, start, end) for channel in channels]
+            if markers is not None:
+                markers = window_markers(markers, start, end)
+
+        selected = channels
+        if channel_indexes is not None:
+            selected = [selected[i] for i in channel_indexes]
+        to_divider = common_divider(selected) if selected else 1
+        written_rate = acq_data.samples_per_second / to_divider
+        methods = resample_methods(resample, len(selected))
+
+        # Fall back to floats when the raw samples cannot be kept losslessly
+        if binary_format == "INT_16":
+            not_compatible = [
+                channel.name for channel in lossy_int16_channels(selected, methods)
+            ]
+            if not_compatible:
+                logging.warning(
+                    f"{acq_file}: Channels {', '.join(not_compatible)} cannot be "
+                    "written as INT_16 losslessly, writing IEEE_FLOAT_32 instead"
+                )
+                binary_format = "IEEE_FLOAT_32"
+
+        # Consecutive segments of at most 'split_samples' samples each
+        parts = [(acq_file, channels, markers)]
+        if split_duration is not None or split_size is not None:
+            split_samples = split_length(
+                selected,
+                acq_data.samples_per_second,
+                np.dtype(BINARY_FORMATS[binary_format]).itemsize,
+                split_duration,
+                split_size,
+            )
+            bounds = list(segment_bounds(recording_length(channels), split_samples))
+            width = max(3, len(str(len(bounds))))
+            parts = [
+                (
+                    acq_file.with_name(f"{acq_file.stem}_{i:0{width}d}{acq_file.suffix}"),
+                    [window_channel(channel, start, end) for channel in channels],
+                    None if markers is None else window_markers(markers, start, end),
+                )
+                for i, (start, end) in enumerate(bounds, start=1)
+            ]
+
+            # The number of markers is checked over all segments
+            if write_markers:
+                check_nr_markers(expected_nr_markers, markers)
+                expected_nr_markers = None
+
+        for part_file, part_channels, part_markers in parts:
+            output_file = get_path_with_suffix(part_file, ".dat", output_folder)
+            output_header = get_path_with_suffix(part_file, ".vhdr", output_folder)
+            if write_markers:
+                output_marker = get_path_with_suffix(part_file, ".vmrk", output_folder)
+
+            statistics = None
+            if qc:
+                written = part_channels
+                if channel_indexes is not None:
+                    written = [written[i] for i in channel_indexes]
+                # Raw INT_16 samples are reported in units through their scale
+                statistics = [
+                    ChannelStats(
+                        flatline_duration * written_rate,
+                        channel.raw_scale_factor if binary_format == "INT_16" else 1,
+                    )
+                    for channel in written
+                ]
+
+            with profiler.stage("raw", lambda: output_file.stat().st_size):
+                writing_ok = acq2raw(
+                    # Paths
+                    output_file=output_file.absolute(),
+                    # Channels
+                    channels=part_channels,
+                    channel_indexes=channel_indexes,
+                    # Raw data
+                    binary_format=binary_format,
+                    data_orientation=data_orientation,
+                    resample=resample,
+                    # Quality control
+                    statistics=statistics,
+                    # Integrity
+                    digest=new_digest(output_file),
+                )
+
+            if writing_ok:
+                with profiler.stage("header", lambda: output_header.stat().st_size):
+                    acq2vhdr(
+                        # Paths
+                        output_file=output_header.absolute(),
+                        data_file=output_file.name,
+                        # Channels
+                        channels=part_channels,
+                        ch_names=channel_names,
+                        ch_scales=channel_scales,
+                        ch_units=channel_units,
+                        channel_indexes=channel_indexes,
+                        # Raw data
+                        samples_per_second=acq_data.samples_per_second,
+                        binary_format=binary_format,
+                        data_orientation=data_orientation,
+                        resample=resample,
+                        # Markers
+                        marker_file=output_marker.name if write_markers else None,
+                        # Other settings
+                        header_settings=header_settings,
+                        # Integrity
+                        digest=new_digest(output_header),
+                    )
+                result["outputs"] += [output_file, output_header]
+
+                print(f"Wrote file {output_file}: {get_file_size(output_file.absolute())}")
+                print(
+                    f"Wrote file {output_header}: {get_file_size(output_header.absolute())}"
+                )
+
+                if write_markers:
+                    with profiler.stage("vmrk", lambda: output_marker.stat().st_size):
+                        acq2vmrk(
+                            # Paths
+                            output_file=output_marker.absolute(),
+                            data_file=output_file.name,
+                            # Markers
+                            marker_channel=marker_channel,
+                            marker_map=marker_map,
+                            expected_nr_markers=expected_nr_markers,
+                            marker_list=rescale_markers(part_markers, 1, to_divider),
+                            new_segment=len(parts) > 1,
+                            # Integrity
+                            digest=new_digest(output_marker),
+                        )
+                    result["outputs"].append(output_marker)
+                    print(
+                        f"Wrote file {output_marker}: {get_file_size(output_marker.absolute())}"
+                    )
+
+                if qc:
+                    output_qc = get_path_with_suffix(part_file, QC_SUFFIX, output_folder)
+                    names = channel_names or [channel.name for channel in written]
+                    report = {
+                        "acq_file": acq_file.name,
+                        "data_file": output_file.name,
+                        "samples_per_second": written_rate,
+                        "channels": [
+                            {
+                                "name": name,
+                                "units": channel.units,
+                                **stats.report(written_rate),
+                            }
+                            for name, channel, stats in zip(names, written, statistics)
+                        ],
+                        "markers": marker_counts(part_markers, expected_nr_markers)
+                        if write_markers
+                        else None,
+                    }
+                    write_qc(output_qc, report, new_digest(output_qc))
+                    result["qc"].append(report)
+                    result["outputs"].append(output_qc)
+                    print(f"Wrote file {output_qc}: {get_file_size(output_qc.absolute())}")
+
+        result["ok"] = True
+    except (Exception, SystemExit) as error:
+        result["error"] = repr(error)
+        logging.error(f"Failed to convert {acq_file}: {error!r}")
+
+    if checksum is not None:
+        result["digests"] = {name: digest.hexdigest() for name, digest in digests.items()}
+
+    if profile:
+        result["profile"] = profiler.report()
+
+    return result
 
 
 def acq2bva(
     # Paths
     output_folder: Path,
-    acq: Path,
+    acq: Path | list[Path],
     # Channels
     channel_indexes: list[int] = None,
     channel_names: list[str] = None,
     channel_scales: list[int] = None,
     channel_units: list[str] = None,
+    # Raw data
+    binary_format: str = "IEEE_FLOAT_32",
+    data_orientation: str = "VECTORIZED",
+    resample: str | list[str] = "hold",
     # Markers
     write_markers: bool = False,
-    marker_channel_index: int = None,
+    marker_channel_index: int | list[int] = None,
     marker_map: dict[int, str] = {},
     expected_nr_markers: int = None,
+    marker_threshold: float = 2.5,
+    marker_bit_order: str = "lsb",
+    trigger_threshold: float = None,
+    trigger_hysteresis: float = 0,
+    trigger_min_width: float = 0,
+    trigger_refractory: float = 0,
+    trigger_type: str = "Stimulus",
+    trigger_description: str = "Trigger",
+    # Window
+    window: tuple[float, float] = None,
+    sample_window: tuple[int, int] = None,
+    marker_window: tuple = None,
+    # Split
+    split_duration: float = None,
+    split_size: int = None,
+    # Quality control
+    qc: bool = False,
+    flatline_duration: float = FLATLINE_DURATION,
     # Other settings
     header_settings: dict = {},
-) -> None:
+    checksum: str = "blake2b",
+    # Batch
+    jobs: int = 1,
+    memory_limit: int = None,
+    force: bool = False,
+    resume: bool = False,
+    shard: tuple[int, int] = None,
+    shard_balance: bool = False,
+    profile: Path = None,
+    prefetch: int = 0,
+    memory_map: bool = False,
+    decode_threads: int = None,
+    pool_options: dict = None,
+) -> list[dict]:
     """
     Writes a raw '.dat' file and corresponding '.vhdr' file based on an AcqKnowledge file.
 
     Optional: Writes '.vmkr' file based on a marker channel
-    """
 
-    def get_file_size(file_path: Path):
-        display_sizes = ["B", "KB", "MB", "GB"]
-        file_size = file_path.stat().st_size
-        for size in display_sizes:
-            if file_size <= 1024:
-                return f"{file_size} {size}"
-            else:
-                file_size //= 1024
-        return f"{file_size} TB"
-
-    def get_path_with_suffix(file_name: Path, suffix: str, directory: Path = None):
-        new_file_name = file_name.with_suffix(suffix)
-        if directory is not None:
-            new_file_name = directory / new_file_name.name
-        return new_file_name
-
-    true_or_exit(
-        acq.exists(),
-        f"Error: {acq} does not exist",
-    )
+    'marker_channel_index' can also be a list of digital channels, one bit of
+    the marker code each, which are set above 'marker_threshold'. With
+    'marker_bit_order' lsb the first channel is the least significant bit,
+    with msb the most significant.
+
+    With 'trigger_threshold', the marker channel is an analog trigger, such
+    as a photodiode, instead of a code channel. Every pulse above the
+    threshold is a marker of 'trigger_type' and 'trigger_description'. A
+    pulse ends below the threshold minus 'trigger_hysteresis', and pulses
+    shorter than 'trigger_min_width' seconds or starting within
+    'trigger_refractory' seconds of the previous pulse are dropped.
+
+    With 'binary_format' INT_16, the raw 16-bit samples are written with each
+    channel's scale as its resolution. Files with channels that cannot be kept
+    losslessly this way are written as IEEE_FLOAT_32, with a warning.
+    'data_orientation' can be VECTORIZED (channel by channel) or MULTIPLEXED
+    (time point by time point).
+
+    'acq' can be a file, a folder of files or a list of either. With 'jobs'
+    above 1, files are converted in a pool of processes, limited so that the
+    estimated memory of the files being converted stays below 'memory_limit'
+    bytes (defaults to the available memory). 'pool_options' are passed on to
+    'run_batch', such as how workers are started. Returns the result of every
+    file.
+
+    Converted files are recorded in a manifest in the output folder. Files
+    whose size, content, settings and checksum match the manifest are
+    skipped, unless 'force' is given.
+
+    Every output is written to a temporary file, synced to disk and renamed
+    once complete, so an interrupted batch leaves no partial outputs. Files
+    are recorded in a journal in the output folder as they finish, and with
+    'resume' an interrupted batch with the same settings continues after the
+    files it finished, even with 'force'. Files that failed are retried.
+
+    With 'shard' (i, N), only the i-th of N disjoint shards of the files is
+    converted, see 'shard_files', balanced by file size with 'shard_balance'.
+    Shards can run at the same time on different machines into the same
+    output folder, as each keeps its own manifest, journal and QC summary.
+    Once all shards are done, 'merge_shards' combines them.
+
+    With 'profile', the wall time, CPU time, peak memory and throughput of
+    every stage of every converted file is appended to that file as
+    newline-delimited JSON.
+
+    With 'prefetch' above 0 and a single job, the next files are decoded on a
+    background thread while the current one is written. At most 'prefetch'
+    decoded files wait to be written.
+
+    With 'memory_map', uncompressed files with a single sample rate are mapped
+    into memory instead of decoded, so recordings larger than the memory can
+    be converted. Their samples are read from disk as they are written.
+
+    Compressed files have the streams of their channels inflated in parallel
+    by 'decode_threads' threads. Defaults to the CPU count divided among the
+    jobs.
+
+    At most one window can be exported instead of the whole recording: a
+    'window' of (start, end) seconds, a 'sample_window' of (start, end)
+    samples, or a 'marker_window' of (start codes, end codes), spanning the
+    first marker with a start code up to the first following marker with an
+    end code. Codes are an integer or a range, as in the marker map. Windows
+    are read from mapped files where possible, so only their samples are read.
+
+    With 'split_duration' or 'split_size', the output is split into
+    consecutive sets of files numbered '_001', '_002' and so on, each holding
+    at most 'split_duration' seconds and 'split_size' bytes of raw data. The
+    markers of every set are rebased to its start, after a 'New Segment'
+    marker. Segments are written one after another from mapped files where
+    possible, so memory stays bounded.
 
-    output_file: Path = None
-    output_header: Path = None
-    output_marker: Path = None
+    With 'qc', the minimum, maximum, mean, RMS, NaN and Inf counts, fraction
+    of samples at the extremes and flatlines (runs of identical samples of at
+    least 'flatline_duration' seconds) of every written channel are computed
+    while it is written, and saved as JSON next to every '.dat' file with the
+    number of markers of every code. A summary of the batch, with the problems
+    found in every file, is written to 'acq2bva_qc.json' in the output folder.
+
+    Every output is hashed with 'checksum' (blake2b or sha256) while it is
+    written, so it is never read back. The digests are recorded in the
+    manifest with that of the AcqKnowledge file, see 'verify_folder'.
+    """
+    acq_items = acq if isinstance(acq, list) else [acq]
     acq_files: list[Path] = []
 
-    if acq.is_dir():
-        for acq_file in acq.iterdir():
-            if acq_file.suffix == ".acq":
-                acq_files.append(acq_file)
-    elif acq.is_file():
-        acq_files.append(acq)
+    for acq_item in acq_items:
+        true_or_exit(
+            acq_item.exists(),
+            f"Error: {acq_item} does not exist",
+        )
+
+        if acq_item.is_dir():
+            for acq_file in acq_item.iterdir():
+                if acq_file.suffix == ".acq":
+                    acq_files.append(acq_file)
+        elif acq_item.is_file():
+            acq_files.append(acq_item)
 
     true_or_exit(len(acq_files), "No AcqKnowledge file found")
 
+    if shard is not None:
+        acq_files = shard_files(acq_files, shard, shard_balance)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(acq_files)} files")
+    manifest_name = shard_name(MANIFEST_NAME, shard)
+    journal_name = shard_name(JOURNAL_NAME, shard)
+
+    windows = [w for w in (window, sample_window, marker_window) if w is not None]
+    true_or_fail(len(windows) < 2, "Only one window can be exported at a time")
+    if windows or split_duration is not None or split_size is not None:
+        memory_map = True
+
+    true_or_fail(
+        checksum is None or checksum in HASH_ALGORITHMS,
+        f"Checksum must be one of {', '.join(HASH_ALGORITHMS)}",
+    )
+
     output_folder.mkdir(exist_ok=True)
 
-    for acq_file in acq_files:
-        acq_data = bioread.read(str(acq_file))
+    if write_markers and not isinstance(marker_map, MarkerMap):
+        marker_map = MarkerMap(marker_map)
 
-        output_file = get_path_with_suffix(acq_file, ".dat", output_folder)
-        output_header = get_path_with_suffix(acq_file, ".vhdr", output_folder)
-        if write_markers:
-            output_marker = get_path_with_suffix(acq_file, ".vmrk", output_folder)
-
-        writing_ok = acq2raw(
-            # Paths
-            output_file=output_file.absolute(),
-            # Channels
-            channels=acq_data.channels,
-            channel_indexes=channel_indexes,
+    # Only decode the channels that are written
+    read_indexes = None
+    if channel_indexes is not None:
+        read_indexes = set(channel_indexes)
+        if write_markers or marker_window is not None:
+            if marker_channel_index is not None:
+                read_indexes.update(marker_indexes(marker_channel_index))
+        read_indexes = sorted(read_indexes)
+
+    settings = dict(
+        # Channels
+        channel_indexes=channel_indexes,
+        channel_names=channel_names,
+        channel_scales=channel_scales,
+        channel_units=channel_units,
+        # Raw data
+        binary_format=binary_format,
+        data_orientation=data_orientation,
+        resample=resample,
+        # Markers
+        write_markers=write_markers,
+        marker_channel_index=marker_channel_index,
+        marker_map=marker_map if write_markers else None,
+        expected_nr_markers=expected_nr_markers,
+        marker_threshold=marker_threshold,
+        marker_bit_order=marker_bit_order,
+        trigger_threshold=trigger_threshold,
+        trigger_hysteresis=trigger_hysteresis,
+        trigger_min_width=trigger_min_width,
+        trigger_refractory=trigger_refractory,
+        trigger_type=trigger_type,
+        trigger_description=trigger_description,
+        # Window
+        window=window,
+        sample_window=sample_window,
+        marker_window=marker_window,
+        # Split
+        split_duration=split_duration,
+        split_size=split_size,
+        # Quality control
+        qc=qc,
+        flatline_duration=flatline_duration,
+        # Other settings
+        header_settings=header_settings,
+    )
+
+    if decode_threads is None:
+        workers = jobs if jobs is not None and jobs >= 1 else os.cpu_count() or 1
+        decode_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    manifest = load_manifest(output_folder)
+    if shard is not None:
+        # Files merged before are in the manifest of the folder
+        manifest["files"].update(load_manifest(output_folder, manifest_name)["files"])
+    fingerprint = settings_fingerprint(settings)
+
+    # Outputs cut off by an interrupted run are incomplete
+    stems = [acq_file.stem for acq_file in acq_files] if shard is not None else None
+    segmented = split_duration is not None or split_size is not None
+    remove_temp_files(output_folder, stems, segmented)
+
+    journaled = read_journal(output_folder, journal_name)
+    if journaled is not None and not resume:
+        logging.warning(
+            f"{output_folder} holds an interrupted batch, starting over. "
+            "Resume (--resume) to continue it instead"
+        )
+        journaled = None
+    if journaled is not None:
+        true_or_fail(
+            journaled["settings"] == fingerprint,
+            "The settings differ from those of the interrupted batch",
         )
+        manifest["files"].update(journaled["done"])
 
-        if writing_ok:
-            acq2vhdr(
-                # Paths
-                output_file=output_header.absolute(),
-                data_file=output_file.name,
-                # Channels
-                channels=acq_data.channels,
-                ch_names=channel_names,
-                ch_scales=channel_scales,
-                ch_units=channel_units,
-                channel_indexes=channel_indexes,
-                # Raw data
-                samples_per_second=acq_data.samples_per_second,
-                # Markers
-                marker_file=output_marker.name if write_markers else None,
-                # Other settings
-                header_settings=header_settings,
-            )
+    results = {}
+    for acq_file in acq_files:
+        entry = manifest["files"].get(acq_file.name)
+        resumed = journaled is not None and acq_file.name in journaled["done"]
+        if (not force or resumed) and is_up_to_date(
+            entry, acq_file, output_folder, fingerprint, checksum
+        ):
+            reason = "converted before the interruption" if resumed else "up to date"
+            print(f"Skipped file {acq_file}: {reason}")
+            results[acq_file] = {
+                "acq_file": acq_file,
+                "ok": True,
+                "skipped": True,
+                "outputs": [output_folder / output for output in entry["outputs"]],
+                "error": None,
+            }
+
+    to_convert = [acq_file for acq_file in acq_files if acq_file not in results]
 
-            print(f"Wrote file {output_file}: {get_file_size(output_file.absolute())}")
-            print(
-                f"Wrote file {output_header}: {get_file_size(output_header.absolute())}"
+    convert = partial(
+        convert_acq_file,
+        output_folder=output_folder,
+        read_indexes=read_indexes,
+        profile=profile is not None,
+        memory_map=memory_map,
+        decode_threads=decode_threads,
+        checksum=checksum,
+        **settings,
+    )
+
+    journal = Journal(
+        output_folder, fingerprint, acq_files, journaled is not None, journal_name
+    )
+
+    def record(acq_file: Path, result):
+        # Workers that crashed return their exception instead of a result
+        if isinstance(result, BaseException):
+            result = {
+                "acq_file": acq_file,
+                "ok": False,
+                "skipped": False,
+                "outputs": [],
+                "error": repr(result),
+            }
+
+        if result["ok"]:
+            entry = file_entry(
+                acq_file, fingerprint, result["outputs"], result.get("digests"), checksum
             )
+            manifest["files"][acq_file.name] = entry
+            journal.done(acq_file, entry)
+        else:
+            manifest["files"].pop(acq_file.name, None)
+            journal.failed(acq_file, result["error"])
 
-            if write_markers:
-                true_or_fail(
-                    marker_channel_index is not None,
-                    "To write markers, please indicate the marker channel index",
-                )
-                acq2vmrk(
-                    # Paths
-                    output_file=output_marker.absolute(),
-                    data_file=output_file.name,
-                    # Markers
-                    marker_channel=acq_data.channels[marker_channel_index],
-                    marker_map=marker_map,
-                    expected_nr_markers=expected_nr_markers,
-                )
-                print(
-                    f"Wrote file {output_marker}: {get_file_size(output_marker.absolute())}"
-                )
+        results[acq_file] = result
+
+    if prefetch and jobs == 1:
+        read = partial(
+            read_acq_file,
+            read_indexes=read_indexes,
+            profile=profile is not None,
+            memory_map=memory_map,
+            decode_threads=decode_threads,
+        )
+        converted = []
+        for acq_file, decoded in prefetched(read, to_convert, prefetch):
+            converted.append(convert(acq_file, decoded=decoded))
+            record(acq_file, converted[-1])
+    else:
+        converted = run_batch(
+            convert,
+            to_convert,
+            jobs=jobs,
+            memory_of=partial(estimate_memory, read_indexes=read_indexes),
+            memory_limit=memory_limit,
+            on_result=record,
+            **(pool_options or {}),
+        )
+
+    if shard is not None:
+        names = {acq_file.name for acq_file in acq_files}
+        manifest["files"] = {
+            name: entry for name, entry in manifest["files"].items() if name in names
+        }
+    save_manifest(output_folder, manifest, manifest_name)
+    journal.finish()
+
+    if qc:
+        qc_files = []
+        for acq_file in acq_files:
+            result = results[acq_file]
+            reports = result.get("qc")
+            if reports is None:
+                # Skipped files keep the reports written when they were converted
+                reports = [
+                    load_qc(output)
+                    for output in result["outputs"]
+                    if output.name.endswith(QC_SUFFIX)
+                ]
+                reports = [report for report in reports if report is not None]
+            qc_files.append(file_qc(acq_file, result["ok"], reports, expected_nr_markers))
+        summary_file = write_qc_summary(
+            output_folder, qc_files, shard_name(QC_SUMMARY_NAME, shard)
+        )
+        print(f"Wrote file {summary_file}: {get_file_size(summary_file)}")
+
+    if profile is not None:
+        write_report(
+            profile,
+            [
+                {"acq_file": result["acq_file"], "ok": result["ok"], **result["profile"]}
+                for result in converted
+                if isinstance(result, dict) and "profile" in result
+            ],
+        )
+
+    return [results[acq_file] for acq_file in acq_files]
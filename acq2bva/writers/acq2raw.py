@@ -8,17 +8,134 @@ import bioread
 import numpy as np
 from bioread.biopac import Channel, Datafile
 
+from acq2bva.util.error import true_or_fail
+from acq2bva.util.manifest import open_output
+from acq2bva.util.qc import ChannelStats
+from acq2bva.util.resample import (
+    common_divider,
+    divider,
+    resample_methods,
+    resampled_blocks,
+)
+from acq2bva.util.window import window_offset
+
+# Number of samples converted and written at a time
+BLOCK_SIZE = 1 << 18
+
+# Bytes of interleaved samples built at a time for MULTIPLEXED files, small
+# enough for the block to stay in cache while it is filled and written
+MULTIPLEXED_BLOCK_BYTES = 1 << 20
+
+# BrainVision data orientations
+DATA_ORIENTATIONS = ["VECTORIZED", "MULTIPLEXED"]
+
+# BrainVision binary formats and their sample types
+BINARY_FORMATS = {
+    "IEEE_FLOAT_32": "<f4",
+    "INT_16": "<i2",
+}
+
 
 def all_same(items):
     return len(set(items)) < 2
 
 
+def channel_length(channel: Channel) -> int:
+    if channel.raw_data is not None:
+        return len(channel.raw_data)
+    return len(channel.data)
+
+
+def int16_compatible(channel: Channel) -> bool:
+    """
+    Checks if a channel can be written losslessly as its raw INT_16 samples.
+
+    BrainVision only multiplies samples by a resolution, so the channel must
+    not have an offset.
+    """
+    return (
+        channel.dtype.kind == "i"
+        and channel.dtype.itemsize == 2
+        and channel.raw_offset == 0
+    )
+
+
+def lossy_int16_channels(channels: list[Channel], methods: list[str]) -> list[Channel]:
+    """
+    Returns the channels that cannot be written as INT_16 losslessly: those
+    that are not 'int16_compatible', and those interpolated with a 'methods'
+    other than 'hold' to the rate of the fastest channel.
+    """
+    to_divider = common_divider(channels) if channels else 1
+    return [
+        channel
+        for channel, method in zip(channels, methods)
+        if not int16_compatible(channel)
+        or (divider(channel) != to_divider and method != "hold")
+    ]
+
+
+def channel_blocks(
+    channel: Channel,
+    block_size: int = BLOCK_SIZE,
+    raw: bool = False,
+    to_divider: int = None,
+    n_samples: int = None,
+    method: str = "hold",
+    offset: float = 0,
+):
+    """
+    Yields the scaled data of a channel in blocks of at most 'block_size' samples.
+
+    Integer data is scaled one block at a time, so the full scaled copy that
+    bioread would keep in 'channel.data' is never built. With 'raw', the
+    unscaled samples are yielded instead.
+
+    A channel slower than 'to_divider' is resampled to that rate with 'method',
+    and yields 'n_samples' samples, starting 'offset' samples at that rate
+    after its first sample.
+    """
+    raw_data = channel.raw_data
+    scaled = raw_data is not None and raw_data.dtype.kind != "f" and not raw
+    data = raw_data if scaled or raw else channel.data
+
+    def scale(block):
+        return (block * channel.raw_scale_factor) + channel.raw_offset
+
+    if to_divider is not None and divider(channel) != to_divider:
+        yield from resampled_blocks(
+            data,
+            divider(channel) / to_divider,
+            n_samples,
+            block_size,
+            method,
+            scale if scaled else None,
+            offset,
+        )
+        return
+
+    for start in range(0, len(data), block_size):
+        block = data[start : start + block_size]
+        if scaled:
+            block = scale(block)
+        yield block
+
+
 def acq2raw(
     # Paths
     output_file: Path,
     # Channels
     channels: list[Channel],
     channel_indexes: list[int] = None,
+    # Writing
+    block_size: int = BLOCK_SIZE,
+    binary_format: str = "IEEE_FLOAT_32",
+    data_orientation: str = "VECTORIZED",
+    resample: str | list[str] = "hold",
+    # Quality control
+    statistics: list[ChannelStats] = None,
+    # Integrity
+    digest=None,
 ) -> bool:
     """
     Writes a raw binary file from AcqKnowledge file
@@ -28,6 +145,25 @@ def acq2raw(
         - A path to '.acq' file
         - An AcqKnowledge Datafile from bioread
         - List of channels from an AcqKnowledge Datafile from bioread
+
+    Data is written channel by channel in blocks of 'block_size' samples,
+    so memory use does not grow with the length of the recording.
+
+    With 'binary_format' INT_16, the raw integer samples are written instead
+    of the scaled data. Every channel must then be 'int16_compatible'.
+
+    With 'data_orientation' MULTIPLEXED, the samples of all channels are
+    interleaved per time point. This is done in small time blocks, so no
+    transposed copy of the recording is built.
+
+    Channels at different sample rates are all written at the rate of the
+    fastest one. Slower channels are resampled block by block with 'resample',
+    one method for all channels or one for each: 'hold' repeats every sample,
+    'linear' interpolates between samples.
+
+    With 'statistics', one per channel written, every block is also passed to
+    the statistics of its channel as written, so they cost no extra read.
+    With 'digest', a hashlib hash, every byte written is also fed to it.
     """
 
     def get_channels(channels) -> Datafile:
@@ -46,16 +182,70 @@ def acq2raw(
         channels = [channels[i] for i in channel_indexes]
 
     if len(channels):
-        output_file.touch(exist_ok=True)
+        methods = resample_methods(resample, len(channels))
+        to_divider = common_divider(channels)
+        fastest = [channel for channel in channels if divider(channel) == to_divider]
+        true_or_fail(
+            all_same([channel_length(channel) for channel in fastest]),
+            "All channels must have the same number of samples",
+        )
+        n_samples = channel_length(fastest[0])
 
-        byte_list = (
-            np.array([channel.data for channel in channels], dtype="<f4")
-            .flatten()
-            .tobytes()
+        true_or_fail(
+            binary_format in BINARY_FORMATS,
+            f"Binary format must be one of {', '.join(BINARY_FORMATS)}",
+        )
+        write_raw = binary_format == "INT_16"
+        if write_raw:
+            true_or_fail(
+                all(int16_compatible(channel) for channel in channels),
+                "INT_16 output needs 16-bit integer channels without an offset",
+            )
+            true_or_fail(
+                all(
+                    divider(channel) == to_divider or method == "hold"
+                    for channel, method in zip(channels, methods)
+                ),
+                "INT_16 output cannot hold linearly interpolated channels",
+            )
+        true_or_fail(
+            data_orientation in DATA_ORIENTATIONS,
+            f"Data orientation must be one of {', '.join(DATA_ORIENTATIONS)}",
         )
+        dtype = np.dtype(BINARY_FORMATS[binary_format])
+
+        def blocks_of(channel, method, size):
+            # Windowed channels are aligned on the first sample of the fastest
+            offset = (window_offset(channel) - window_offset(fastest[0])) / to_divider
+            return channel_blocks(
+                channel, size, write_raw, to_divider, n_samples, method, offset
+            )
+
+        with open_output(output_file, digest) as raw:
+            if data_orientation == "VECTORIZED":
+                for i, (channel, method) in enumerate(zip(channels, methods)):
+                    for block in blocks_of(channel, method, block_size):
+                        block = np.ascontiguousarray(block, dtype=dtype)
+                        raw.write(block.data)
+                        if statistics is not None:
+                            statistics[i].update(block)
+            else:
+                rows = MULTIPLEXED_BLOCK_BYTES // (len(channels) * dtype.itemsize)
+                rows = max(1, min(block_size, rows))
+                buffer = np.empty((rows, len(channels)), dtype=dtype)
 
-        with output_file.open("wb") as raw:
-            raw.write(byte_list)
+                blocks = [
+                    blocks_of(channel, method, rows)
+                    for channel, method in zip(channels, methods)
+                ]
+                for channel_block in zip(*blocks):
+                    out = buffer[: len(channel_block[0])]
+                    for i, block in enumerate(channel_block):
+                        out[:, i] = block
+                    raw.write(out.data)
+                    if statistics is not None:
+                        for i, stats in enumerate(statistics):
+                            stats.update(out[:, i])
 
         # Return writing went okay
         return True
@@ -6,6 +6,13 @@ import bioread
 from bioread.biopac import Channel
 
 from acq2bva.util.error import true_or_fail
+from acq2bva.util.manifest import open_output
+from acq2bva.util.resample import (
+    RESAMPLE_METHODS,
+    common_divider,
+    divider,
+    resample_methods,
+)
 
 
 class VHDRInfos:
@@ -41,6 +48,7 @@ class CommonInfos(VHDRInfos):
         data_file: str,  # Paths
         channels: list[Channel],  # Channels
         samples_per_second: float = 2000.0,  # Raw data
+        data_orientation: str = "VECTORIZED",  # Raw data
         marker_file: str = None,  # Markers
         common_infos: dict = {},  # Other settings
     ) -> None:
@@ -49,7 +57,7 @@ class CommonInfos(VHDRInfos):
         self.DataFile = data_file
         self.MarkerFile = marker_file
         self.DataFormat = "BINARY"
-        self.DataOrientation = "VECTORIZED"
+        self.DataOrientation = data_orientation
         self.DataType = "TIMEDOMAIN"
         self.NumberOfChannels = len(channels)
         self.SamplingInterval = int(1_000_000 // samples_per_second)
@@ -63,10 +71,11 @@ class CommonInfos(VHDRInfos):
 class BinaryInfos(VHDRInfos):
     def __init__(
         self,
+        binary_format: str = "IEEE_FLOAT_32",  # Raw data
         binary_infos: dict = {},  # Other settings
     ) -> None:
         # Binary Infos settings
-        self.BinaryFormat = "IEEE_FLOAT_32"
+        self.BinaryFormat = binary_format
 
         super().__init__(binary_infos)
 
@@ -81,6 +90,7 @@ class ChannelInfos(VHDRInfos):
         names: list = None,
         scales: list = None,
         units: list = None,
+        binary_format: str = "IEEE_FLOAT_32",
     ) -> None:
         if names is None:
             names = [channel.name for channel in channels]
@@ -89,6 +99,13 @@ class ChannelInfos(VHDRInfos):
         if units is None:
             units = [channel.units for channel in channels]
 
+        # Raw integer samples are scaled to units by their resolution
+        if binary_format == "INT_16" and len(scales) == len(channels):
+            scales = [
+                float(scale) * channel.raw_scale_factor
+                for scale, channel in zip(scales, channels)
+            ]
+
         true_or_fail(
             len(names) == len(scales) == len(units) == len(channels),
             "Names, scales and units specified must equal the number of channels being processed",
@@ -114,21 +131,27 @@ class HeaderInfos:
         ch_units: list = None,
         # Raw data
         samples_per_second: float = 2000.0,
+        binary_format: str = "IEEE_FLOAT_32",
+        data_orientation: str = "VECTORIZED",
         # Markers
         marker_file: str = None,
         # Other settings
         header_settings: dict = {},
+        comment: str = None,
     ) -> None:
+        self.comment = comment
 
         # Header file components
         self.common_infos = CommonInfos(
             data_file=data_file,  # Paths
             channels=channels,  # Channels
             samples_per_second=samples_per_second,  # Raw data
+            data_orientation=data_orientation,  # Raw data
             marker_file=marker_file,  # Markers
             common_infos=header_settings,  # Other settings
         )
         self.binary_infos = BinaryInfos(
+            binary_format=binary_format,  # Raw data
             binary_infos=header_settings,  # Other settings
         )
         self.channel_infos = ChannelInfos(
@@ -136,6 +159,7 @@ class HeaderInfos:
             names=ch_names,
             scales=ch_scales,
             units=ch_units,
+            binary_format=binary_format,
         )
 
     def generate_text(self):
@@ -145,12 +169,14 @@ class HeaderInfos:
         return_string += f"\n\n{self.binary_infos.generate_text()}"
         return_string += f"\n\n{self.channel_infos.generate_text()}"
 
+        if self.comment:
+            return_string += f"\n\n[Comment]\n{self.comment}"
+
         return return_string
 
 
-def acq2vhdr(
+def create_header_infos(
     # Paths
-    output_file: Path,
     data_file: str,
     # Channels
     channels: list[Channel],
@@ -160,21 +186,88 @@ def acq2vhdr(
     channel_indexes: list[int] = None,
     # Raw data
     samples_per_second: float = 2000.0,
+    binary_format: str = "IEEE_FLOAT_32",
+    data_orientation: str = "VECTORIZED",
+    resample: str | list[str] = "hold",
     # Markers
     marker_file: str = None,
     # Other settings
     header_settings: dict = {},
-):
+) -> HeaderInfos:
     """
-    Writes a '.vhdr' file for BrainVision Analyzer
+    Creates the '.vhdr' infos of the selected channels
+
+    'samples_per_second' is the rate of the file. Channels are written at the
+    rate of the fastest one, and the resampling of slower channels is noted
+    in the comment.
     """
 
     # Select channels
     if channel_indexes is not None:
         channels = [channels[i] for i in channel_indexes]
 
+    # Channels are written at the rate of the fastest one
+    comment = None
+    if channels:
+        to_divider = common_divider(channels)
+        samples_per_second = samples_per_second / to_divider
+        methods = resample_methods(resample, len(channels))
+        comment = "\n".join(
+            f"Ch{i + 1} was resampled from {channel.samples_per_second:g} Hz "
+            f"to {samples_per_second:g} Hz by {RESAMPLE_METHODS[method]}"
+            for i, (channel, method) in enumerate(zip(channels, methods))
+            if divider(channel) != to_divider
+        )
+
     # Create infos
-    header_infos = HeaderInfos(
+    return HeaderInfos(
+        # Paths
+        data_file,
+        # Channels
+        channels,
+        ch_names,
+        ch_scales,
+        ch_units,
+        # Raw data
+        samples_per_second,
+        binary_format,
+        data_orientation,
+        # Markers
+        marker_file,
+        # Other settings
+        header_settings,
+        comment,
+    )
+
+
+def acq2vhdr(
+    # Paths
+    output_file: Path,
+    data_file: str,
+    # Channels
+    channels: list[Channel],
+    ch_names: list = None,
+    ch_scales: list = None,
+    ch_units: list = None,
+    channel_indexes: list[int] = None,
+    # Raw data
+    samples_per_second: float = 2000.0,
+    binary_format: str = "IEEE_FLOAT_32",
+    data_orientation: str = "VECTORIZED",
+    resample: str | list[str] = "hold",
+    # Markers
+    marker_file: str = None,
+    # Other settings
+    header_settings: dict = {},
+    # Integrity
+    digest=None,
+):
+    """
+    Writes a '.vhdr' file for BrainVision Analyzer
+
+    With 'digest', a hashlib hash, the bytes written are also fed to it.
+    """
+    header_infos = create_header_infos(
         # Paths
         data_file,
         # Channels
@@ -182,8 +275,12 @@ def acq2vhdr(
         ch_names,
         ch_scales,
         ch_units,
+        channel_indexes,
         # Raw data
         samples_per_second,
+        binary_format,
+        data_orientation,
+        resample,
         # Markers
         marker_file,
         # Other settings
@@ -191,5 +288,5 @@ def acq2vhdr(
     )
 
     # Write file
-    with output_file.open("wt") as header:
+    with open_output(output_file, digest, text=True) as header:
         header.write(header_infos.generate_text())
@@ -4,59 +4,269 @@ import logging
 from pathlib import Path
 
 import bioread
+import numpy as np
 from bioread.biopac import Channel
 
-def create_marker_list(marker_channel: Channel, marker_map: dict[int, str], SMUDGE_LIMIT = 2):
+from acq2bva.util.manifest import open_output
+from acq2bva.util.marker_map import MarkerMap
+
+# Compact marker records, the description is shared with the marker map.
+# Positions are 0-based sample indexes, in every marker this module writes.
+MARKER_DTYPE = np.dtype(
+    [
+        ("type", "<i8"),
+        ("description", object),
+        ("position", "<i8"),
+        ("points", "<i8"),
+        ("channel", "<i4"),
+    ]
+)
+
+# Number of markers formatted and written at a time
+MARKER_CHUNK_SIZE = 10_000
+
+# Analog trigger markers have a text type instead of a code
+TRIGGER_DTYPE = np.dtype(
+    [
+        (name, object if name == "type" else MARKER_DTYPE[name])
+        for name in MARKER_DTYPE.names
+    ]
+)
+
+# Number of analog samples thresholded at a time
+TRIGGER_BLOCK_SIZE = 1 << 20
+
+
+def find_marker_runs(
+    data: np.ndarray, SMUDGE_LIMIT=2, scale: float = 1, offset: float = 0
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Finds and returns a list of markers in a marker channel using a marker map.
+    Finds runs of constant, non-zero values in marker data.
+
+    A run only counts as a marker once the value changes again and if it lasts
+    longer than SMUDGE_LIMIT samples. Returns the marker values, their starting
+    positions and their lengths. Raw data can be given with its 'scale' and
+    'offset', then only the values of the runs are scaled.
     """
-    def get_marker_description(marker: int, marker_map: dict[int, str]) -> str:
-        for marker_range, description in marker_map.items():
-            try:
-                if marker in marker_range:
-                    return description
-            except TypeError:
-                if marker == marker_range:
-                    return description
-        return ""
-
-    markers = []
-    marker = 0
-    position = 0
-
-    for pos, data in enumerate(marker_channel.data):
-        if marker != data:
-            if marker != 0:
-                count = pos - position
-                if count > SMUDGE_LIMIT:
-                    markers.append({
-                        "type": int(marker),
-                        "description": get_marker_description(marker, marker_map),
-                        "position": position,
-                        "points": count,
-                        "channel": 0,
-                    })
-            marker = data
-            position = pos
-    
+    data = np.asarray(data)
+
+    # Positions where the value differs from the previous sample
+    changes = np.flatnonzero(data[1:] != data[:-1]) + 1
+
+    if not len(changes):
+        return data[:0], changes, changes
+
+    # Every run closed by a change, the last run is never closed
+    starts = np.concatenate(([0], changes[:-1]))
+    lengths = changes - starts
+    values = data[starts]
+    if scale != 1 or offset != 0:
+        values = (values * scale) + offset
+
+    keep = (values != 0) & (lengths > SMUDGE_LIMIT)
+
+    return values[keep], starts[keep], lengths[keep]
+
+
+def find_analog_triggers(
+    data: np.ndarray,
+    threshold: float,
+    hysteresis: float = 0,
+    min_width: int = 1,
+    refractory: int = 0,
+    scale=None,
+    block_size: int = TRIGGER_BLOCK_SIZE,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds pulses in an analog trigger channel, such as a photodiode.
+
+    A pulse starts when the data rises above 'threshold' and ends when it
+    falls below 'threshold' minus 'hysteresis'. Pulses shorter than
+    'min_width' samples and pulses starting less than 'refractory' samples
+    after the start of the previous pulse are dropped. Data is thresholded in
+    blocks, scaled with 'scale' if given. Returns the pulse starts and lengths.
+    """
+    high, low = threshold, threshold - hysteresis
+    state = 0
+    rises, falls = [], []
+
+    for start in range(0, len(data), block_size):
+        block = data[start : start + block_size]
+        if scale is not None:
+            block = scale(block)
+
+        # Samples above the threshold set the state, samples below clear it
+        # and samples in between keep the state of the last one that did
+        events = np.full(len(block), -1, dtype=np.int8)
+        events[block < low] = 0
+        events[block > high] = 1
+        last = np.where(events >= 0, np.arange(len(block)), -1)
+        np.maximum.accumulate(last, out=last)
+        states = np.where(last >= 0, events[last], state)
+
+        changes = np.flatnonzero(np.diff(states, prepend=state))
+        rising = states[changes] == 1
+        rises.append(changes[rising] + start)
+        falls.append(changes[~rising] + start)
+        state = states[-1]
+
+    starts = np.concatenate(rises) if rises else np.zeros(0, dtype=np.int64)
+    ends = np.concatenate(falls) if falls else np.zeros(0, dtype=np.int64)
+    # A pulse still on at the end lasts until the end
+    ends = np.append(ends, len(data))[: len(starts)]
+    lengths = ends - starts
+
+    keep = lengths >= min_width
+    starts, lengths = starts[keep], lengths[keep]
+
+    if refractory > 0 and len(starts) > 1:
+        # Whether a pulse is kept depends on the pulses kept before it, so
+        # this loops over the pulses, which are few, not over the samples
+        kept = np.zeros(len(starts), dtype=bool)
+        next_allowed = starts[0]
+        for i, pulse_start in enumerate(starts.tolist()):
+            if pulse_start >= next_allowed:
+                kept[i] = True
+                next_allowed = pulse_start + refractory
+        starts, lengths = starts[kept], lengths[kept]
+
+    return starts, lengths
+
+
+def create_trigger_array(
+    trigger_channel: Channel,
+    threshold: float,
+    hysteresis: float = 0,
+    min_width: float = 0,
+    refractory: float = 0,
+    marker_type: str = "Stimulus",
+    description: str = "Trigger",
+) -> np.ndarray:
+    """
+    Finds the pulses in an analog trigger channel and returns their onsets as
+    compact records of 'marker_type' and 'description'.
+
+    Thresholds are in channel units, 'min_width' and 'refractory' in seconds.
+    """
+    to_samples = trigger_channel.samples_per_second
+    raw_data = trigger_channel.raw_data
+    scaled = raw_data is not None and raw_data.dtype.kind != "f"
+
+    def scale(block):
+        return (block * trigger_channel.raw_scale_factor) + trigger_channel.raw_offset
+
+    positions, points = find_analog_triggers(
+        raw_data if scaled else trigger_channel.data,
+        threshold,
+        hysteresis,
+        max(int(round(min_width * to_samples)), 1),
+        int(round(refractory * to_samples)),
+        scale if scaled else None,
+    )
+
+    markers = np.zeros(len(positions), dtype=TRIGGER_DTYPE)
+    markers["type"] = marker_type
+    markers["description"] = description
+    markers["position"] = positions
+    markers["points"] = points
+
     return markers
 
-def generate_text(data_file: str, marker_list: list[dict]) -> str:
+
+def create_marker_array(
+    marker_channel: Channel, marker_map: dict[int, str] | MarkerMap, SMUDGE_LIMIT=2
+) -> np.ndarray:
     """
-    Generates vmrk file text
+    Finds the markers in a marker channel and returns them as compact records.
     """
-    return_string = "BrainVision Data Exchange Marker File Version 1.0"
+    if not isinstance(marker_map, MarkerMap):
+        marker_map = MarkerMap(marker_map)
 
-    return_string += "\n\n[Common Infos]"
-    return_string += f"\nDataFile={data_file}"
+    # Runs of integer codes are found on the raw samples, so the scaled copy
+    # of the whole channel is never built
+    raw_data = marker_channel.raw_data
+    if raw_data is not None and raw_data.dtype.kind in "iu":
+        types, positions, points = find_marker_runs(
+            raw_data,
+            SMUDGE_LIMIT,
+            marker_channel.raw_scale_factor,
+            marker_channel.raw_offset,
+        )
+    else:
+        types, positions, points = find_marker_runs(marker_channel.data, SMUDGE_LIMIT)
 
-    return_string += "\n\n[Marker Infos]"
-    for i, marker in enumerate(marker_list, start=1):
-        return_string += f"\nMk{i}="
-        return_string += f"{marker['type']},{marker['description']},"
-        return_string += f"{marker['position']},{marker['points']},{marker['channel']}"
+    markers = np.zeros(len(types), dtype=MARKER_DTYPE)
+    markers["type"] = types
+    markers["description"] = marker_map.describe_array(types)
+    markers["position"] = positions
+    markers["points"] = points
 
-    return return_string
+    return markers
+
+
+def create_marker_list(
+    marker_channel: Channel, marker_map: dict[int, str] | MarkerMap, SMUDGE_LIMIT=2
+):
+    """
+    Finds and returns a list of markers in a marker channel using a marker map.
+    """
+    markers = create_marker_array(marker_channel, marker_map, SMUDGE_LIMIT)
+    return [dict(zip(MARKER_DTYPE.names, marker)) for marker in markers.tolist()]
+
+
+def generate_lines(
+    data_file: str, marker_list: list[dict] | np.ndarray, new_segment: bool = False
+):
+    """
+    Yields vmrk file text in chunks of up to MARKER_CHUNK_SIZE markers
+
+    Accepts a marker list or a marker array. With 'new_segment', a 'New Segment'
+    marker at the first sample, position 0 like the other 0-based positions,
+    comes before the markers.
+    """
+    yield "BrainVision Data Exchange Marker File Version 1.0"
+
+    yield "\n\n[Common Infos]"
+    yield f"\nDataFile={data_file}"
+
+    yield "\n\n[Marker Infos]"
+    first = 1
+    if new_segment:
+        yield "\nMk1=New Segment,,0,1,0"
+        first = 2
+    for start in range(0, len(marker_list), MARKER_CHUNK_SIZE):
+        chunk = marker_list[start : start + MARKER_CHUNK_SIZE]
+        if isinstance(chunk, np.ndarray):
+            rows = chunk.tolist()
+        else:
+            rows = [[marker[name] for name in MARKER_DTYPE.names] for marker in chunk]
+        yield "".join(
+            f"\nMk{i}={type},{description},{position},{points},{channel}"
+            for i, (type, description, position, points, channel) in enumerate(
+                rows, start=start + first
+            )
+        )
+
+
+def generate_text(
+    data_file: str, marker_list: list[dict] | np.ndarray, new_segment: bool = False
+) -> str:
+    """
+    Generates vmrk file text
+    """
+    return "".join(generate_lines(data_file, marker_list, new_segment))
+
+
+def check_nr_markers(expected_nr_markers: int, marker_list: list[dict] | np.ndarray):
+    """
+    Warns if the number of markers found is not the number expected.
+    """
+    if expected_nr_markers is not None:
+        if expected_nr_markers != len(marker_list):
+            logging.warning(
+                "Expected number of markers not matching up with marker list. "
+                f"{expected_nr_markers} != {len(marker_list)}"
+            )
 
 
 def acq2vmrk(
@@ -65,22 +275,25 @@ def acq2vmrk(
     data_file: str,
     # Markers
     marker_channel: Channel,
-    marker_map: dict = {},
+    marker_map: dict | MarkerMap = {},
     expected_nr_markers: int = None,
+    marker_list: list[dict] | np.ndarray = None,
+    new_segment: bool = False,
+    # Integrity
+    digest=None,
 ) -> None:
     """
     Writes a '.vmrk' file for BrainVision Analyzer
-    """
-    marker_list = create_marker_list(marker_channel, marker_map)
 
-    if expected_nr_markers is not None:
-        if expected_nr_markers != len(marker_list):
-            logging.warning(
-                "Expected number of markers not matching up with marker list. "
-                f"{expected_nr_markers} != {len(marker_list)}"
-            )
+    A 'marker_list' or marker array created beforehand can be given instead
+    of creating it from the marker channel. The file is written in chunks.
+    With 'new_segment', the file starts with a 'New Segment' marker.
+    With 'digest', a hashlib hash, the bytes written are also fed to it.
+    """
+    if marker_list is None:
+        marker_list = create_marker_array(marker_channel, marker_map)
 
-    marker_text = generate_text(data_file, marker_list)
+    check_nr_markers(expected_nr_markers, marker_list)
 
-    with output_file.open("wt") as marker:
-        marker.write(marker_text)
\ No newline at end of file
+    with open_output(output_file, digest, text=True, buffering=1 << 20) as marker:
+        marker.writelines(generate_lines(data_file, marker_list, new_segment))
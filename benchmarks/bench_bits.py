@@ -0,0 +1,57 @@
+"""
+Compares combining 8 digital marker channels into codes with a loop over
+the samples, as a preprocessing script would, to 'combine_bit_channels',
+and checks that both give the same codes.
+
+Usage: python benchmarks/bench_bits.py [minutes]
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+
+from acq2bva.util.digital import combine_bit_channels
+from synthetic import make_channel, make_marker_data
+
+
+def reference_codes(channels, threshold=2.5):
+    codes = np.zeros(len(channels[0].raw_data), dtype=np.uint8)
+    data = [channel.data for channel in channels]
+    for i in range(len(codes)):
+        code = 0
+        for bit, values in enumerate(data):
+            if values[i] > threshold:
+                code |= 1 << bit
+        codes[i] = code
+    return codes
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    codes = make_marker_data(n_samples, int(minutes * 60), max_code=255).astype(int)
+    channels = [
+        make_channel(((codes >> bit) & 1) * 5.0 + rng.normal(0, 0.2, n_samples), f"D{bit}", "V")
+        for bit in range(8)
+    ]
+
+    start = time.perf_counter()
+    expected = reference_codes(channels)
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    combined = combine_bit_channels(channels).raw_data
+    packed_time = time.perf_counter() - start
+
+    assert np.array_equal(combined, expected)
+    print(f"8 digital channels x {n_samples} samples")
+    print(f"reference: {reference_time:.3f} s")
+    print(f"packed:    {packed_time:.3f} s ({reference_time / packed_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
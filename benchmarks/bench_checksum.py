@@ -0,0 +1,58 @@
+"""
+Times writing channels while hashing them, against writing them and hashing
+the written '.dat' file afterwards, and verifies that the digests match.
+
+Usage: python benchmarks/bench_checksum.py [minutes] [channels] [algorithm]
+"""
+from __future__ import annotations
+
+import hashlib
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva.util.manifest import hash_file
+from acq2bva.writers.acq2raw import acq2raw
+from synthetic import make_channel
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    algorithm = sys.argv[3] if len(sys.argv) > 3 else "blake2b"
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    channels = [
+        make_channel(rng.integers(-2000, 2000, n_samples).astype("<i2"), f"CH{i}")
+        for i in range(n_channels)
+    ]
+
+    with tempfile.TemporaryDirectory() as folder:
+        dat_file = Path(folder) / "bench.dat"
+        plain = timed(acq2raw, dat_file, channels)
+        digest = hashlib.new(algorithm)
+        hashed = timed(acq2raw, dat_file, channels, digest=digest)
+        start = time.perf_counter()
+        reread = hash_file(dat_file, algorithm)
+        again = time.perf_counter() - start
+
+    assert digest.hexdigest() == reread, "digests differ"
+    size = n_samples * n_channels * 4 / 2**20
+    print(f"{minutes:g} min, {n_channels} channels, {size:.0f} MB written, {algorithm}")
+    print(f"  write:               {plain:.2f} s")
+    print(f"  write while hashing: {hashed:.2f} s")
+    print(f"  write, then hash:    {plain + again:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
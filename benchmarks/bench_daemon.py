@@ -0,0 +1,93 @@
+"""
+Times converting a small file with a fresh 'acq2bva' process every time,
+against submitting it to a warm daemon with 'acq2bva-client', and against
+the conversion alone. Checks that both write the same files.
+
+Usage: python benchmarks/bench_daemon.py [runs] [seconds of recording]
+"""
+from __future__ import annotations
+
+import filecmp
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva.writers.acq2bva import acq2bva
+from synthetic import make_marker_data, write_acq
+
+MARKER_MAP = """
+1-50 = "Stimulus"
+51-108 = "Response"
+"""
+
+
+def timed_runs(command: list[str], runs: int, env: dict, cwd: Path) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        subprocess.run(command, env=env, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+    n_samples = int(seconds * 2000)
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(sys.path),
+            "ACQ2BVA_DAEMON": str(folder / "daemon.sock"),
+        }
+        rng = np.random.default_rng(0)
+        write_acq(
+            folder / "session.acq",
+            [rng.integers(-2000, 2000, n_samples).astype("<i2"), make_marker_data(n_samples, 40)],
+        )
+        (folder / "markers.toml").write_text(MARKER_MAP)
+        # Every run converts again, as a finished session would be
+        options = ["-f", "-m", "1", "--mc", "1", "--mf", "markers.toml", "session.acq"]
+
+        cli = [sys.executable, "-m", "acq2bva.runners.acq2bva_cmd"]
+        client = [sys.executable, "-m", "acq2bva.runners.acq2bva_daemon"]
+
+        cold = timed_runs(cli + options + ["cold"], runs, env, folder)
+
+        daemon = subprocess.Popen(cli + ["--serve"], env=env, stdout=subprocess.PIPE, text=True)
+        daemon.stdout.readline()
+        try:
+            warm = timed_runs(client + options + ["warm"], runs, env, folder)
+        finally:
+            subprocess.run(client + ["--stop"], env=env, check=True, stdout=subprocess.DEVNULL)
+            daemon.wait()
+
+        os.chdir(folder)
+        start = time.perf_counter()
+        for _ in range(runs):
+            acq2bva(
+                Path("alone"),
+                Path("session.acq"),
+                write_markers=True,
+                marker_channel_index=1,
+                marker_map={1: "Stimulus"},
+                force=True,
+            )
+        alone = (time.perf_counter() - start) / runs
+
+        for name in ("session.dat", "session.vhdr", "session.vmrk"):
+            assert filecmp.cmp(folder / "cold" / name, folder / "warm" / name, shallow=False)
+
+    print(f"{seconds:g} s recording, mean of {runs} runs")
+    print(f"  fresh process:   {cold * 1000:.0f} ms")
+    print(f"  warm daemon:     {warm * 1000:.0f} ms")
+    print(f"  conversion only: {alone * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
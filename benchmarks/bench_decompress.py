@@ -0,0 +1,68 @@
+"""
+Compares decoding a compressed synthetic recording with bioread, which
+inflates one channel after another, to inflating the channels in a pool of
+1 to N threads, and checks that the decoded samples are the same.
+
+Usage: python benchmarks/bench_decompress.py [minutes] [channels]
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import bioread
+import numpy as np
+
+from acq2bva.readers import inflate_datafile
+from synthetic import make_marker_data, write_acq
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    n_samples = int(minutes * 60 * 2000)
+
+    # Smooth signals with noise compress like real recordings
+    rng = np.random.default_rng(0)
+    time_points = np.arange(n_samples) / 2000
+    channels_data = [make_marker_data(n_samples, 1000).astype("<i2")] + [
+        (
+            1000 * np.sin(2 * np.pi * (i + 1) * time_points)
+            + rng.normal(0, 50, n_samples)
+        ).astype("<i2")
+        for i in range(n_channels - 1)
+    ]
+
+    with tempfile.TemporaryDirectory() as folder:
+        acq_file = write_acq(
+            Path(folder) / "compressed.acq", channels_data, compressed=True
+        )
+        mb = acq_file.stat().st_size / 2**20
+        print(f"{n_channels} channels x {n_samples} samples ({mb:.0f} MB compressed)")
+
+        expected, seconds = timed(bioread.read, str(acq_file))
+        print(f"bioread:    {seconds:.3f} s")
+
+        threads = 1
+        while threads <= max(4, os.cpu_count() or 1):
+            datafile, seconds = timed(inflate_datafile, acq_file, threads=threads)
+            for channel, expected_channel in zip(datafile.channels, expected.channels):
+                assert np.array_equal(channel.raw_data, expected_channel.raw_data)
+            print(f"{threads:2d} threads: {seconds:.3f} s")
+            threads *= 2
+
+        _, seconds = timed(inflate_datafile, acq_file, [0, 1])
+        print(f"2 of {n_channels} channels: {seconds:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares listing the channels of a folder of synthetic recordings by
+decoding every file, by reading the headers only and from the header cache.
+
+Usage: python benchmarks/bench_inventory.py [files] [minutes]
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import bioread
+import numpy as np
+
+from acq2bva.readers import find_acq_files, load_inventories
+from synthetic import write_acq
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def decode_all(acq_files: list[Path]) -> dict:
+    return {
+        acq_file: [channel.name for channel in bioread.read(str(acq_file)).channels]
+        for acq_file in acq_files
+    }
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    minutes = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    channels_data = [
+        rng.integers(-2000, 2000, n_samples).astype("<i2") for _ in range(8)
+    ]
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        for i in range(n_files):
+            (folder / f"session{i % 4}").mkdir(exist_ok=True)
+            write_acq(folder / f"session{i % 4}" / f"rec{i}.acq", channels_data)
+        acq_files = find_acq_files([folder])
+        cache_file = folder / "inventory.json"
+
+        decoded, decode_time = timed(decode_all, acq_files)
+        inventories, cold_time = timed(load_inventories, acq_files, cache_file)
+        cached, warm_time = timed(load_inventories, acq_files, cache_file)
+
+        for acq_file, names in decoded.items():
+            assert [channel["name"] for channel in inventories[acq_file]["channels"]] == names
+        assert cached == inventories
+
+        print(f"{n_files} files, 8 channels x {n_samples} samples")
+        print(f"  decoded:      {decode_time:.3f} s")
+        print(f"  headers only: {cold_time:.3f} s")
+        print(f"  cached:       {warm_time:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Compares the vectorized marker extraction and the streaming '.vmrk' writer
+against the original per-sample loop and string building.
+
+Usage: python benchmarks/bench_markers.py [minutes] [markers]
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from acq2bva.writers.acq2vmrk import acq2vmrk, create_marker_list
+from synthetic import make_channel, make_marker_data
+
+MARKER_MAP = {
+    range(1, 9): "Trial Start",
+    range(11, 19): "Trial End",
+    41: "Correct Response",
+    range(51, 59): "Block Start",
+}
+
+
+def reference_marker_list(marker_channel, marker_map, SMUDGE_LIMIT=2):
+    """
+    The original per-sample implementation of create_marker_list
+    """
+    def get_marker_description(marker, marker_map):
+        for marker_range, description in marker_map.items():
+            try:
+                if marker in marker_range:
+                    return description
+            except TypeError:
+                if marker == marker_range:
+                    return description
+        return ""
+
+    markers = []
+    marker = 0
+    position = 0
+
+    for pos, data in enumerate(marker_channel.data):
+        if marker != data:
+            if marker != 0:
+                count = pos - position
+                if count > SMUDGE_LIMIT:
+                    markers.append({
+                        "type": int(marker),
+                        "description": get_marker_description(marker, marker_map),
+                        "position": position,
+                        "points": count,
+                        "channel": 0,
+                    })
+            marker = data
+            position = pos
+
+    return markers
+
+
+def reference_generate_text(data_file, marker_list):
+    """
+    The original implementation of generate_text
+    """
+    return_string = "BrainVision Data Exchange Marker File Version 1.0"
+
+    return_string += "\n\n[Common Infos]"
+    return_string += f"\nDataFile={data_file}"
+
+    return_string += "\n\n[Marker Infos]"
+    for i, marker in enumerate(marker_list, start=1):
+        return_string += f"\nMk{i}="
+        return_string += f"{marker['type']},{marker['description']},"
+        return_string += f"{marker['position']},{marker['points']},{marker['channel']}"
+
+    return return_string
+
+
+def reference_vmrk(output_file, marker_channel, marker_map):
+    marker_list = reference_marker_list(marker_channel, marker_map)
+    with output_file.open("wt") as marker:
+        marker.write(reference_generate_text("data.dat", marker_list))
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    n_markers = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    n_samples = int(minutes * 60 * 2000)
+
+    channel = make_channel(make_marker_data(n_samples, n_markers), "Marker", "Bits")
+
+    expected, loop_time = timed(reference_marker_list, channel, MARKER_MAP)
+    actual, vector_time = timed(create_marker_list, channel, MARKER_MAP)
+
+    assert actual == expected, "Vectorized marker list differs from reference loop"
+
+    print(f"{n_samples} samples, {len(actual)} markers")
+    print(f"loop:       {loop_time:.3f} s")
+    print(f"vectorized: {vector_time:.3f} s ({loop_time / vector_time:.1f}x)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        expected_file = Path(folder) / "reference.vmrk"
+        actual_file = Path(folder) / "streaming.vmrk"
+
+        _, loop_time = timed(reference_vmrk, expected_file, channel, MARKER_MAP)
+        _, stream_time = timed(
+            acq2vmrk, actual_file, "data.dat", channel, MARKER_MAP
+        )
+
+        assert expected_file.read_bytes() == actual_file.read_bytes(), ".vmrk differs"
+
+    print("whole .vmrk file:")
+    print(f"reference:  {loop_time:.3f} s")
+    print(f"streaming:  {stream_time:.3f} s ({loop_time / stream_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compares the peak memory and time of converting a long synthetic recording
+when it is decoded by bioread versus memory-mapped.
+
+Every mode runs in its own process, so peak memory is measured separately.
+Mapped pages count towards the resident memory while they are cached, so
+the gain shows in time and in memory that can be reclaimed.
+
+Usage: python benchmarks/bench_memmap.py [minutes] [channels]
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from synthetic import make_marker_data, write_acq
+
+
+def convert(acq_file: str, output_folder: str, memory_map: str, orientation: str):
+    from acq2bva import acq2bva
+    from acq2bva.util.profiling import peak_rss_mb
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        acq2bva(
+            Path(output_folder),
+            Path(acq_file),
+            write_markers=True,
+            marker_channel_index=0,
+            data_orientation=orientation,
+            memory_map=memory_map == "1",
+        )
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_mb": peak_rss_mb()}))
+
+
+def make_recording(acq_file: str, n_samples: str, n_channels: str):
+    n_samples, n_channels = int(n_samples), int(n_channels)
+    rng = np.random.default_rng(0)
+    channels_data = [make_marker_data(n_samples, 1000).astype("<i2")] + [
+        rng.integers(-2000, 2000, n_samples).astype("<i2") for _ in range(n_channels - 1)
+    ]
+    write_acq(Path(acq_file), channels_data)
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    n_samples = int(minutes * 60 * 2000)
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Child processes start with the peak memory of their parent, so the
+        # recording is made in a process of its own as well
+        acq_file = Path(folder) / "long.acq"
+        subprocess.run(
+            [sys.executable, __file__, "--make", str(acq_file), str(n_samples), str(n_channels)],
+            check=True,
+        )
+        mb = acq_file.stat().st_size / 2**20
+        print(f"{n_channels} channels x {n_samples} samples ({mb:.0f} MB .acq)")
+
+        for orientation in ("VECTORIZED", "MULTIPLEXED"):
+            for memory_map in ("0", "1"):
+                output = subprocess.run(
+                    [
+                        sys.executable,
+                        __file__,
+                        "--convert",
+                        str(acq_file),
+                        str(Path(folder) / f"out{orientation}{memory_map}"),
+                        memory_map,
+                        orientation,
+                    ],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                measured = json.loads(output.stdout.splitlines()[-1])
+                mode = "memory-mapped" if memory_map == "1" else "decoded"
+                print(
+                    f"{orientation}, {mode}: {measured['seconds']:.3f} s, "
+                    f"peak {measured['peak_mb']:.0f} MB"
+                )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--make"]:
+        make_recording(*sys.argv[2:])
+    elif sys.argv[1:2] == ["--convert"]:
+        convert(*sys.argv[2:])
+    else:
+        main()
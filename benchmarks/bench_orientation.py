@@ -0,0 +1,77 @@
+"""
+Compares VECTORIZED and MULTIPLEXED '.dat' files in write throughput and in
+the latency of reading a short time window of every channel.
+
+Usage: python benchmarks/bench_orientation.py [minutes] [channels]
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva.writers.acq2raw import acq2raw
+from synthetic import make_channel
+
+WINDOW = 2000
+N_WINDOWS = 200
+
+
+def read_window(raw_file: Path, orientation: str, start: int, n_samples: int, n_channels: int):
+    itemsize = 4
+    with raw_file.open("rb") as raw:
+        if orientation == "MULTIPLEXED":
+            raw.seek(start * n_channels * itemsize)
+            data = raw.read(WINDOW * n_channels * itemsize)
+            return np.frombuffer(data, "<f4").reshape(WINDOW, n_channels).T
+        window = np.empty((n_channels, WINDOW), "<f4")
+        for i in range(n_channels):
+            raw.seek((i * n_samples + start) * itemsize)
+            window[i] = np.frombuffer(raw.read(WINDOW * itemsize), "<f4")
+        return window
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    channels = [
+        make_channel(rng.standard_normal(n_samples), f"Ch{i}")
+        for i in range(n_channels)
+    ]
+    starts = rng.integers(0, n_samples - WINDOW, N_WINDOWS)
+    mb = n_samples * n_channels * 4 / 2**20
+
+    print(f"{n_channels} channels x {n_samples} samples ({mb:.0f} MB)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        windows = {}
+        for orientation in ("VECTORIZED", "MULTIPLEXED"):
+            raw_file = Path(folder) / f"{orientation}.dat"
+
+            start = time.perf_counter()
+            acq2raw(raw_file, channels, data_orientation=orientation)
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            windows[orientation] = [
+                read_window(raw_file, orientation, s, n_samples, n_channels)
+                for s in starts
+            ]
+            read_time = (time.perf_counter() - start) / N_WINDOWS
+
+            print(f"{orientation}:")
+            print(f"  write: {write_time:.3f} s ({mb / write_time:.0f} MB/s)")
+            print(f"  read {WINDOW}-sample window: {read_time * 1000:.2f} ms")
+
+        for vectorized, multiplexed in zip(*windows.values()):
+            assert np.array_equal(vectorized, multiplexed), "Orientations differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares converting a batch of synthetic recordings one after another with
+decoding the next recordings on a background thread while writing.
+
+Usage: python benchmarks/bench_pipeline.py [files] [minutes] [channels]
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva import acq2bva
+from synthetic import make_marker_data, write_acq
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    minutes = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    n_channels = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    channels_data = [
+        rng.integers(-2000, 2000, n_samples).astype("<i2") for _ in range(n_channels)
+    ]
+    channels_data.append(make_marker_data(n_samples, 500).astype("<i2"))
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        (folder / "acq").mkdir()
+        for i in range(n_files):
+            write_acq(folder / "acq" / f"rec{i}.acq", channels_data, compressed=i % 2 == 1)
+
+        print(f"{n_files} files, {n_channels + 1} channels x {n_samples} samples")
+        for prefetch in (0, 1, 2):
+            output_folder = folder / f"prefetch{prefetch}"
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                acq2bva(
+                    output_folder,
+                    folder / "acq",
+                    write_markers=True,
+                    marker_channel_index=n_channels,
+                    prefetch=prefetch,
+                )
+            print(f"prefetch {prefetch}: {time.perf_counter() - start:.3f} s")
+
+            for output in output_folder.glob("rec*"):
+                expected = folder / "prefetch0" / output.name
+                assert output.read_bytes() == expected.read_bytes(), f"{output.name} differs"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measures the throughput of reading, inflating and writing synthetic
+recordings, which 'PLAN_THROUGHPUT' is set from, and compares the run time
+estimated by 'plan_conversion' with the measured one.
+
+Usage: python benchmarks/bench_plan.py [files] [minutes]
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva.writers.acq2bva import PLAN_THROUGHPUT, convert_acq_file, plan_conversion
+from synthetic import write_acq
+
+OUTPUT_STAGES = ("raw", "header", "vmrk")
+
+
+def throughput(stages: list[dict], names: tuple) -> float:
+    """
+    Returns the MB per second of the stages called one of 'names'
+    """
+    selected = [stage for stage in stages if stage["stage"] in names]
+    nbytes = sum(stage["bytes"] or 0 for stage in selected)
+    wall = sum(stage["wall_s"] for stage in selected)
+    return nbytes / 2**20 / wall
+
+
+def run_case(folder: Path, n_files: int, channels_data: list, compressed: bool) -> dict:
+    acq_files = []
+    for i in range(n_files):
+        acq_files.append(folder / f"rec{i}.acq")
+        write_acq(acq_files[-1], channels_data, compressed=compressed)
+    estimated = sum(plan["seconds"] for plan in plan_conversion(acq_files))
+
+    (folder / "bva").mkdir()
+    stages = []
+    start = time.perf_counter()
+    for acq_file in acq_files:
+        result = convert_acq_file(acq_file, folder / "bva", checksum=None, profile=True)
+        assert result["ok"], result["error"]
+        stages += result["profile"]["stages"]
+    measured = time.perf_counter() - start
+
+    return {
+        "read": throughput(stages, ("decode",)),
+        "write": throughput(stages, OUTPUT_STAGES),
+        "estimated_s": estimated,
+        "measured_s": measured,
+    }
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    minutes = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    channels_data = [
+        rng.integers(-2000, 2000, n_samples).astype("<i2") for _ in range(8)
+    ]
+
+    print(f"{n_files} files, 8 channels x {n_samples} samples")
+    print(f"  assumed: {PLAN_THROUGHPUT}")
+    for compressed in (False, True):
+        with tempfile.TemporaryDirectory() as folder:
+            case = run_case(Path(folder), n_files, channels_data, compressed)
+        read_step = "inflate" if compressed else "read"
+        print(
+            f"  {read_step}: {case['read']:.0f} MB/s, write: {case['write']:.0f} MB/s, "
+            f"estimated {case['estimated_s']:.2f} s, measured {case['measured_s']:.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
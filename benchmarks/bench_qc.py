@@ -0,0 +1,63 @@
+"""
+Times writing channels with and without statistics gathered on the way, and
+a second pass that loads the written '.dat' file to compute them afterwards.
+
+Usage: python benchmarks/bench_qc.py [minutes] [channels]
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva.util.qc import ChannelStats
+from acq2bva.writers.acq2raw import acq2raw
+from synthetic import make_channel
+
+
+def second_pass(dat_file: Path, n_channels: int):
+    data = np.fromfile(dat_file, dtype="<f4").reshape(n_channels, -1)
+    for samples in data:
+        finite = samples[np.isfinite(samples)].astype(np.float64)
+        finite.min(), finite.max(), finite.mean(), np.sqrt(np.mean(finite**2))
+        np.count_nonzero(finite == finite.min()) + np.count_nonzero(finite == finite.max())
+        changes = np.flatnonzero(np.diff(samples))
+        np.diff(np.concatenate(([0], changes + 1, [len(samples)]))).max()
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    channels = [
+        make_channel(rng.integers(-2000, 2000, n_samples).astype("<i2"), f"CH{i}")
+        for i in range(n_channels)
+    ]
+
+    with tempfile.TemporaryDirectory() as folder:
+        dat_file = Path(folder) / "bench.dat"
+        plain = timed(acq2raw, dat_file, channels)
+        statistics = [ChannelStats(1000) for _ in channels]
+        with_qc = timed(acq2raw, dat_file, channels, statistics=statistics)
+        again = timed(second_pass, dat_file, n_channels)
+
+    size = n_samples * n_channels * 4 / 2**20
+    print(f"{minutes:g} min, {n_channels} channels, {size:.0f} MB written")
+    print(f"  write:                 {plain:.2f} s")
+    print(f"  write with statistics: {with_qc:.2f} s")
+    print(f"  write, then reload:    {plain + again:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares the streaming '.dat' writer against the original in-memory writer,
+checking that the output is byte-identical and reporting peak memory.
+
+Usage: python benchmarks/bench_raw.py [minutes] [channels]
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva.writers.acq2raw import acq2raw
+from synthetic import make_channel
+
+
+def reference_raw(output_file: Path, channels):
+    """
+    The original implementation of acq2raw
+    """
+    byte_list = (
+        np.array([channel.data for channel in channels], dtype="<f4")
+        .flatten()
+        .tobytes()
+    )
+    with output_file.open("wb") as raw:
+        raw.write(byte_list)
+
+
+def profiled(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    channels = [
+        make_channel(rng.standard_normal(n_samples), f"Ch{i}")
+        for i in range(n_channels)
+    ]
+
+    with tempfile.TemporaryDirectory() as folder:
+        expected = Path(folder) / "reference.dat"
+        actual = Path(folder) / "streaming.dat"
+
+        ref_time, ref_peak = profiled(reference_raw, expected, channels)
+        new_time, new_peak = profiled(acq2raw, actual, channels)
+
+        assert expected.read_bytes() == actual.read_bytes(), "Output differs"
+
+    mb = n_samples * n_channels * 4 / 2**20
+    print(f"{n_channels} channels x {n_samples} samples ({mb:.0f} MB)")
+    print(f"reference: {ref_time:.3f} s, peak {ref_peak / 2**20:.1f} MB")
+    print(f"streaming: {new_time:.3f} s, peak {new_peak / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares converting one channel and a marker channel out of a wide synthetic
+recording when every channel is decoded versus only the selected channels.
+
+Usage: python benchmarks/bench_read.py [minutes] [channels]
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import bioread
+import numpy as np
+
+from acq2bva import acq2bva
+from synthetic import make_marker_data, write_acq
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def read_all_channels(acq_file, channel_indexes=None):
+    return bioread.reader.Reader.read(acq_file).datafile
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    channels_data = [
+        rng.integers(-2000, 2000, n_samples).astype("<i2") for _ in range(n_channels)
+    ]
+    channels_data[8] = make_marker_data(n_samples, 1000).astype("<i2")
+
+    settings = dict(
+        channel_indexes=[0],
+        write_markers=True,
+        marker_channel_index=8,
+    )
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        for compressed in (False, True):
+            acq_file = write_acq(
+                folder / "wide.acq", channels_data, compressed=compressed
+            )
+
+            with mock.patch("bioread.read", read_all_channels), mock.patch(
+                "acq2bva.writers.acq2bva.inflate_datafile", return_value=None
+            ):
+                all_time = timed(acq2bva, folder / "all", acq_file, **settings)
+            selected_time = timed(acq2bva, folder / "selected", acq_file, **settings)
+
+            for suffix in (".dat", ".vhdr", ".vmrk"):
+                name = acq_file.with_suffix(suffix).name
+                assert (folder / "all" / name).read_bytes() == (
+                    folder / "selected" / name
+                ).read_bytes(), f"{name} differs"
+
+            kind = "compressed" if compressed else "uncompressed"
+            print(f"{kind}, {n_channels} channels x {n_samples} samples")
+            print(f"  all channels:      {all_time:.3f} s")
+            print(f"  selected channels: {selected_time:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Times writing a fast channel with a channel at a quarter of its rate, for
+both resampling methods, against bioread's whole-channel 'upsampled_data'.
+
+Usage: python benchmarks/bench_resample.py [minutes]
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from bioread.biopac import Channel
+
+from acq2bva.writers.acq2raw import acq2raw
+from synthetic import make_channel
+
+
+def profile(func, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2**20
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    fast = make_channel(rng.integers(-2000, 2000, n_samples).astype("<i2"), "Fast")
+    slow_data = rng.integers(-2000, 2000, n_samples // 4).astype("<i2")
+    slow = Channel(
+        frequency_divider=4,
+        raw_scale_factor=1,
+        raw_offset=0,
+        name="Slow",
+        units="mV",
+        fmt_str="<i2",
+        samples_per_second=500,
+        point_count=len(slow_data),
+    )
+    slow.raw_data = slow_data
+
+    with tempfile.TemporaryDirectory() as folder:
+        output_file = Path(folder) / "resampled.dat"
+        print(f"{n_samples} samples at 2000 Hz with one channel at 500 Hz")
+
+        for method in ("hold", "linear"):
+            seconds, peak = profile(acq2raw, output_file, [fast, slow], resample=method)
+            print(f"  {method}: {seconds:.3f} s, peak {peak:.1f} MB")
+
+        def upsampled():
+            held = make_channel(np.repeat(slow_data, 4)[:n_samples], "Held")
+            acq2raw(output_file, [fast, held])
+
+        seconds, peak = profile(upsampled)
+        print(f"  whole-channel hold: {seconds:.3f} s, peak {peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Runs a batch as N shards in parallel processes on one machine, merges them
+and checks the merged manifest against a single run of the whole batch.
+
+Usage: python benchmarks/bench_shard.py [shards] [files]
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva.util.shard import shard_files
+from synthetic import make_marker_data, write_acq
+
+
+def run(*args: str):
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "acq2bva.runners.acq2bva_cmd", *args],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def digests(output_folder: Path) -> dict:
+    with (output_folder / "acq2bva_manifest.json").open() as f:
+        manifest = json.load(f)
+    return {name: entry["digests"] for name, entry in manifest["files"].items()}
+
+
+def main():
+    n_shards = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_files = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    options = ["-m", "1", "--mc", "1", "--qc"]
+
+    with tempfile.TemporaryDirectory() as folder:
+        acq_folder = Path(folder) / "acq"
+        acq_folder.mkdir()
+        rng = np.random.default_rng(0)
+        for i in range(n_files):
+            # Sizes spread over an order of magnitude
+            n_samples = int(rng.integers(1, 10) * 200_000)
+            write_acq(
+                acq_folder / f"rec{i:02d}.acq",
+                [
+                    rng.integers(-2000, 2000, n_samples).astype("<i2"),
+                    make_marker_data(n_samples, 50),
+                ],
+            )
+        acq_files = sorted(acq_folder.iterdir())
+
+        start = time.perf_counter()
+        run(*options, str(acq_folder), str(Path(folder) / "whole")).wait()
+        print(f"1 process: {time.perf_counter() - start:.2f} s")
+
+        for balance in ([], ["--sb"]):
+            output_folder = Path(folder) / f"sharded{''.join(balance)}"
+            start = time.perf_counter()
+            processes = [
+                run(*options, *balance, "--shard", f"{i}/{n_shards}", str(acq_folder), str(output_folder))
+                for i in range(1, n_shards + 1)
+            ]
+            assert all(process.wait() == 0 for process in processes), "a shard failed"
+            seconds = time.perf_counter() - start
+            assert run("--merge", str(output_folder)).wait() == 0, "merge failed"
+
+            sizes = [
+                sum(f.stat().st_size for f in shard_files(acq_files, (i, n_shards), bool(balance)))
+                for i in range(1, n_shards + 1)
+            ]
+            kind = "by size" if balance else "by name"
+            print(
+                f"{n_shards} shards {kind}: {seconds:.2f} s, "
+                f"MB per shard {[round(size / 2**20) for size in sizes]}"
+            )
+            assert digests(output_folder) == digests(Path(folder) / "whole"), "outputs differ"
+            assert not list(output_folder.glob("*.shard-*")), "shard files left after merging"
+            with (output_folder / "acq2bva_qc.json").open() as f:
+                assert len(json.load(f)["files"]) == n_files, "QC summaries not merged"
+
+
+if __name__ == "__main__":
+    main()
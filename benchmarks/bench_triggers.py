@@ -0,0 +1,80 @@
+"""
+Times analog trigger detection on a long synthetic photodiode channel, and
+checks it against a loop over the samples on the first minute.
+
+Usage: python benchmarks/bench_triggers.py [hours] [rate]
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+
+from acq2bva.writers.acq2vmrk import create_trigger_array
+from synthetic import make_channel
+
+
+def reference_triggers(data, threshold, hysteresis, min_width, refractory):
+    state = False
+    starts, ends = [], []
+    for i, value in enumerate(data.tolist()):
+        if not state and value > threshold:
+            state = True
+            starts.append(i)
+        elif state and value < threshold - hysteresis:
+            state = False
+            ends.append(i)
+    ends.append(len(data))
+
+    triggers = []
+    next_allowed = 0
+    for start, end in zip(starts, ends):
+        if end - start >= min_width and start >= next_allowed:
+            triggers.append(start)
+            next_allowed = start + refractory
+    return triggers
+
+
+def make_photodiode(n_samples: int, rate: float, seed: int = 0) -> np.ndarray:
+    """
+    Noisy 100 ms flashes every second, with short glitches in between
+    """
+    rng = np.random.default_rng(seed)
+    data = rng.normal(0, 40, n_samples)
+    onsets = np.arange(int(rate / 2), n_samples - int(rate), int(rate))
+    flash = np.arange(int(rate / 10))
+    data[(onsets[:, None] + flash).ravel()] += 2000
+    glitches = rng.integers(0, n_samples, len(onsets))
+    data[glitches] += 2000
+    return data.astype("<i2")
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    n_samples = int(hours * 3600 * rate)
+
+    channel = make_channel(make_photodiode(n_samples, rate), "Photodiode", samples_per_second=rate)
+    settings = dict(threshold=1000, hysteresis=200, min_width=0.005, refractory=0.5)
+
+    start = time.perf_counter()
+    markers = create_trigger_array(channel, **settings)
+    seconds = time.perf_counter() - start
+    print(f"{hours:g} h at {rate:g} Hz ({n_samples} samples): {len(markers)} triggers")
+    print(f"  {seconds:.3f} s, {n_samples / seconds / 1e6:.0f} M samples/s")
+
+    minute = int(60 * rate)
+    expected = reference_triggers(
+        channel.raw_data[:minute],
+        settings["threshold"],
+        settings["hysteresis"],
+        int(settings["min_width"] * rate),
+        int(settings["refractory"] * rate),
+    )
+    found = markers["position"][markers["position"] < minute - rate].tolist()
+    assert found == expected[: len(found)], "triggers differ from the reference"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compares exporting a whole synthetic recording to exporting windows of a
+tenth and a hundredth of it, in time and in size of the '.dat' file.
+
+Usage: python benchmarks/bench_window.py [minutes] [channels]
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva import acq2bva
+from synthetic import make_marker_data, write_acq
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    n_samples = int(minutes * 60 * 2000)
+
+    rng = np.random.default_rng(0)
+    channels_data = [make_marker_data(n_samples, 1000).astype("<i2")] + [
+        rng.integers(-2000, 2000, n_samples).astype("<i2") for _ in range(n_channels - 1)
+    ]
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        print(f"{n_channels} channels x {n_samples} samples")
+        for compressed in (False, True):
+            acq_file = write_acq(folder / "long.acq", channels_data, compressed=compressed)
+            kind = "compressed" if compressed else "uncompressed"
+            for fraction in (1, 10, 100):
+                # A window in the middle of the recording
+                seconds = minutes * 60
+                start = seconds / 2
+                window = None if fraction == 1 else (start, start + seconds / fraction)
+
+                output_folder = folder / f"out{fraction}"
+                begin = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    acq2bva(
+                        output_folder,
+                        acq_file,
+                        write_markers=True,
+                        marker_channel_index=0,
+                        window=window,
+                        force=True,
+                    )
+                elapsed = time.perf_counter() - begin
+                mb = (output_folder / "long.dat").stat().st_size / 2**20
+                print(f"  {kind}, 1/{fraction} of the recording: {elapsed:.3f} s, {mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark suite for the writers on synthetic recordings.
+
+Times and memory-profiles every stage (raw, header, markers and a whole
+acq2bva batch) for each combination of the given recording parameters, and
+saves the results as JSON. With --compare, results are checked against an
+earlier run and stages that got slower are reported.
+
+Usage: python benchmarks/run_benchmarks.py [-o results.json] [--compare old.json]
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from acq2bva import acq2bva
+from acq2bva.__version__ import __version__
+from acq2bva.writers.acq2raw import acq2raw
+from acq2bva.writers.acq2vhdr import acq2vhdr
+from acq2bva.writers.acq2vmrk import acq2vmrk
+from synthetic import make_channel, make_marker_data, write_acq
+
+BATCH_FILES = 4
+
+
+def profile(func, *args, **kwargs) -> dict:
+    """
+    Returns the wall time and peak traced memory of a call
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak_mb": peak / 2**20}
+
+
+def make_recording(minutes: float, rate: float, n_channels: int, markers_per_minute: float):
+    rng = np.random.default_rng(0)
+    n_samples = int(minutes * 60 * rate)
+    channels_data = [
+        rng.integers(-2000, 2000, n_samples).astype("<i2") for _ in range(n_channels)
+    ]
+    channels_data.append(
+        make_marker_data(n_samples, int(minutes * markers_per_minute)).astype("<i2")
+    )
+    return channels_data
+
+
+def run_case(folder: Path, minutes, rate, n_channels, markers_per_minute) -> list[dict]:
+    channels_data = make_recording(minutes, rate, n_channels, markers_per_minute)
+    channels = [
+        make_channel(data, f"Ch{i}", samples_per_second=rate)
+        for i, data in enumerate(channels_data)
+    ]
+    marker_channel = channels[-1]
+    channel_indexes = list(range(n_channels))
+    data_mb = len(channels_data[0]) * n_channels * 4 / 2**20
+
+    stages = {
+        "raw": profile(
+            acq2raw, folder / "case.dat", channels, channel_indexes=channel_indexes
+        ),
+        "header": profile(
+            acq2vhdr,
+            folder / "case.vhdr",
+            "case.dat",
+            channels,
+            channel_indexes=channel_indexes,
+            samples_per_second=rate,
+            marker_file="case.vmrk",
+        ),
+        "markers": profile(
+            acq2vmrk, folder / "case.vmrk", "case.dat", marker_channel
+        ),
+    }
+
+    acq_folder = folder / "acq"
+    acq_folder.mkdir(exist_ok=True)
+    for i in range(BATCH_FILES):
+        write_acq(acq_folder / f"case{i}.acq", channels_data, samples_per_second=rate)
+    stages["batch"] = profile(
+        acq2bva,
+        folder / "bva",
+        acq_folder,
+        channel_indexes=channel_indexes,
+        write_markers=True,
+        marker_channel_index=n_channels,
+        force=True,
+    )
+
+    results = []
+    for stage, measured in stages.items():
+        mb = data_mb * (BATCH_FILES if stage == "batch" else 1)
+        results.append(
+            {
+                "minutes": minutes,
+                "rate": rate,
+                "channels": n_channels,
+                "markers_per_minute": markers_per_minute,
+                "stage": stage,
+                **measured,
+                "mb_per_s": mb / measured["seconds"] if measured["seconds"] else None,
+            }
+        )
+    return results
+
+
+def case_key(result: dict) -> tuple:
+    return (
+        result["minutes"],
+        result["rate"],
+        result["channels"],
+        result["markers_per_minute"],
+        result["stage"],
+    )
+
+
+def compare(results: list[dict], baseline_file: Path, tolerance: float) -> list[str]:
+    with baseline_file.open() as f:
+        baseline = {case_key(result): result for result in json.load(f)["results"]}
+
+    regressions = []
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            if result[metric] > old[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{case_key(result)} {metric}: {old[metric]:.3f} -> {result[metric]:.3f}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--minutes", nargs="+", type=float, default=[1, 10])
+    parser.add_argument("--rates", nargs="+", type=float, default=[2000])
+    parser.add_argument("--channels", nargs="+", type=int, default=[1, 16])
+    parser.add_argument("--markers-per-minute", nargs="+", type=float, default=[60])
+    parser.add_argument("-o", "--output", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--compare", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = []
+    cases = itertools.product(
+        args.minutes, args.rates, args.channels, args.markers_per_minute
+    )
+    for case in cases:
+        with tempfile.TemporaryDirectory() as folder:
+            case_results = run_case(Path(folder), *case)
+        for result in case_results:
+            print(
+                f"{case_key(result)}: {result['seconds']:.3f} s, "
+                f"peak {result['peak_mb']:.1f} MB"
+            )
+        results += case_results
+
+    with args.output.open("w") as f:
+        json.dump(
+            {
+                "acq2bva": __version__,
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "date": datetime.now(timezone.utc).isoformat(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Saved results to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Synthetic bioread channels for benchmarking without real '.acq' files.
+"""
+from __future__ import annotations
+
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+from bioread import headers
+from bioread.biopac import Channel
+
+
+def make_channel(
+    data: np.ndarray,
+    name: str = "Synthetic",
+    units: str = "mV",
+    samples_per_second: float = 2000.0,
+) -> Channel:
+    """
+    Wraps a data array in a loaded bioread Channel
+    """
+    channel = Channel(
+        frequency_divider=1,
+        raw_scale_factor=1,
+        raw_offset=0,
+        name=name,
+        units=units,
+        fmt_str=data.dtype.str,
+        samples_per_second=samples_per_second,
+        point_count=len(data),
+    )
+    channel.raw_data = data
+    return channel
+
+
+def make_marker_data(
+    n_samples: int,
+    n_markers: int,
+    marker_width: int = 20,
+    max_code: int = 108,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Creates a marker code channel with evenly spread markers of random codes,
+    including some short glitches that should be smudged away
+    """
+    rng = np.random.default_rng(seed)
+    data = np.zeros(n_samples, dtype="<f8")
+
+    if n_markers:
+        starts = np.linspace(0, n_samples - marker_width, n_markers + 1, dtype=int)[:-1]
+        codes = rng.integers(1, max_code + 1, n_markers)
+        for start, code in zip(starts, codes):
+            data[start:start + marker_width] = code
+            # Glitch right after the marker
+            data[start + marker_width:start + marker_width + 1] = code + 1
+
+    return data
+
+
+# File revision of the synthetic '.acq' files, AcqKnowledge 3.9
+ACQ_REVISION = 45
+
+
+def pack_header(header_class, **values) -> bytes:
+    """
+    Packs a bioread header, fields not given are zero
+    """
+    struct_dict = header_class(ACQ_REVISION, "<").struct_dict
+    fields = []
+    for name, fmt, _ in struct_dict.struct_info:
+        count = len(struct.unpack("<" + fmt, bytes(struct.calcsize("<" + fmt))))
+        default = b"" if fmt.endswith("s") else 0
+        value = values.get(name, default if count == 1 else [default] * count)
+        fields.extend(value if count > 1 else [value])
+    return struct.pack(struct_dict.format_string, *fields)
+
+
+def write_acq(
+    acq_file: Path,
+    channels_data: list[np.ndarray],
+    samples_per_second: float = 2000.0,
+    compressed: bool = False,
+    names: list[str] = None,
+    scales: list[float] = None,
+    dividers: list[int] = None,
+) -> Path:
+    """
+    Writes a minimal AcqKnowledge file that bioread can read.
+
+    Channels must be '<i2' or '<f8' arrays of the same length. Uncompressed
+    files are interleaved sample by sample, compressed files store one zlib
+    stream per channel. Compressed files can have channels at lower rates,
+    given by their frequency 'dividers', with as many fewer samples.
+    """
+    n_channels = len(channels_data)
+    names = names or [f"CH{i}" for i in range(n_channels)]
+    scales = scales or [1.0] * n_channels
+    dividers = dividers or [1] * n_channels
+    if not compressed and any(divider != 1 for divider in dividers):
+        raise ValueError("Only compressed files can have channels at lower rates")
+
+    graph = pack_header(
+        headers.GraphHeader,
+        lVersion=ACQ_REVISION,
+        lExtItemHeaderLen=len(pack_header(headers.GraphHeader)),
+        nChannels=n_channels,
+        dSampleTime=1000 / samples_per_second,
+        bCompressed=int(compressed),
+    )
+
+    channel_len = len(pack_header(headers.ChannelHeader))
+    parts = [graph]
+    for i, data in enumerate(channels_data):
+        parts.append(
+            pack_header(
+                headers.ChannelHeader,
+                lChanHeaderLen=channel_len,
+                nNum=i,
+                szCommentText=names[i].encode("latin1"),
+                szUnitsText=b"mV",
+                lBufLength=len(data),
+                dAmplScale=scales[i],
+                nChanOrder=i,
+                nVarSampleDivider=dividers[i],
+            )
+        )
+    parts.append(pack_header(headers.ForeignHeader, nLength=4))
+    for data in channels_data:
+        parts.append(
+            pack_header(
+                headers.ChannelDTypeHeader,
+                nSize=data.dtype.itemsize,
+                nType=2 if data.dtype.kind == "i" else 1,
+            )
+        )
+
+    with Path(acq_file).open("wb") as acq:
+        acq.write(b"".join(parts))
+
+        if not compressed:
+            # Interleave sample by sample
+            record = np.dtype([(f"c{i}", d.dtype) for i, d in enumerate(channels_data)])
+            samples = np.empty(len(channels_data[0]), dtype=record)
+            for i, data in enumerate(channels_data):
+                samples[f"c{i}"] = data
+            acq.write(samples.tobytes())
+            acq.write(pack_header(headers.V2MarkerHeader))
+            return Path(acq_file)
+
+        acq.write(pack_header(headers.V2MarkerHeader))
+        acq.write(pack_header(headers.PostMarkerHeader) + bytes(28))
+        acq.write(pack_header(headers.V2JournalHeader))
+        acq.write(pack_header(headers.MainCompressionHeader))
+        for data in channels_data:
+            stream = zlib.compress(data.astype(data.dtype.newbyteorder("<")).tobytes(), 1)
+            acq.write(
+                pack_header(
+                    headers.ChannelCompressionHeader,
+                    lUncompressedLen=data.nbytes,
+                    lCompressedLen=len(stream),
+                )
+            )
+            acq.write(stream)
+
+    return Path(acq_file)
@@ -0,0 +1,31 @@
+"""
+Small in-memory bioread channels for the tests.
+"""
+from __future__ import annotations
+
+import numpy as np
+from bioread.biopac import Channel
+
+
+def make_channel(
+    data: np.ndarray,
+    divider: int = 1,
+    scale: float = 1,
+    samples_per_second: float = 2000.0,
+) -> Channel:
+    """
+    Wraps a data array in a loaded bioread Channel
+    """
+    data = np.asarray(data)
+    channel = Channel(
+        frequency_divider=divider,
+        raw_scale_factor=scale,
+        raw_offset=0,
+        name="CH",
+        units="mV",
+        fmt_str=data.dtype.str,
+        samples_per_second=samples_per_second / divider,
+        point_count=len(data),
+    )
+    channel.raw_data = data
+    return channel
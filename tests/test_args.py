@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import pytest
+
+from acq2bva.runners.acq2bva_args import create_parser
+
+# Flags that can also be set in the settings toml
+FLAGS = [
+    "shard_balance",
+    "resume",
+    "memory_map",
+    "force",
+    "qc",
+]
+
+
+@pytest.mark.parametrize("dest", FLAGS)
+def test_unset_flags_leave_the_settings_toml(dest):
+    args = create_parser().parse_args(["in", "out"])
+    assert getattr(args, dest) is None
+
+
+def test_marker_channel_is_one_index():
+    args = create_parser().parse_args(["--mc", "8", "in", "out"])
+    assert args.marker_channel_index == 8
+    assert args.rest == ["in", "out"]
+
+
+def test_marker_bits_are_comma_separated():
+    args = create_parser().parse_args(["--mb", "8,9,10", "in", "out"])
+    assert args.marker_bits == [8, 9, 10]
+    assert args.rest == ["in", "out"]
+
+
+def test_marker_bits_must_be_indexes():
+    with pytest.raises(SystemExit):
+        create_parser().parse_args(["--mb", "8,x", "in", "out"])
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from acq2bva.util.batch import prefetched, run_batch
+
+
+def double(item: int) -> int:
+    return item * 2
+
+
+def crash_on_one(item: int) -> int:
+    if item == 1:
+        # As when the worker is killed for running out of memory
+        os._exit(1)
+    return item * 2
+
+
+def fail_on_one(item: int) -> int:
+    if item == 1:
+        raise ValueError(item)
+    return item * 2
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_results_in_the_order_of_items(jobs):
+    finished = []
+    results = run_batch(
+        double, list(range(6)), jobs, on_result=lambda *r: finished.append(r)
+    )
+
+    assert results == [0, 2, 4, 6, 8, 10]
+    assert sorted(finished) == [(i, i * 2) for i in range(6)]
+
+
+def test_failing_item_is_returned_as_its_exception():
+    results = run_batch(fail_on_one, list(range(4)), jobs=2)
+
+    assert isinstance(results[1], ValueError)
+    assert [results[i] for i in (0, 2, 3)] == [0, 4, 6]
+
+
+@pytest.mark.parametrize("jobs", [2, 4])
+def test_crashed_worker_fails_only_its_item(jobs):
+    finished = {}
+    results = run_batch(
+        crash_on_one,
+        list(range(6)),
+        jobs,
+        on_result=lambda item, result: finished.setdefault(item, result),
+    )
+
+    assert isinstance(results[1], BrokenProcessPool)
+    assert [results[i] for i in (0, 2, 3, 4, 5)] == [0, 4, 6, 8, 10]
+    assert sorted(finished) == list(range(6))
+
+
+def test_prefetched_yields_in_order_with_exceptions():
+    results = list(prefetched(fail_on_one, list(range(4)), depth=2))
+
+    assert [item for item, _ in results] == [0, 1, 2, 3]
+    assert isinstance(results[1][1], ValueError)
+    assert [result for _, result in results if not isinstance(result, Exception)] == [
+        0,
+        4,
+        6,
+    ]
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import socketserver
+import threading
+
+import pytest
+
+from acq2bva.runners.acq2bva_daemon import (
+    JobHandler,
+    StreamWriter,
+    connect,
+    create_token,
+    forward_output,
+    install_worker_output,
+    read_token,
+    token_path,
+)
+from acq2bva.util.batch import run_batch
+
+
+def print_item(item: int) -> int:
+    print(f"Wrote file out/s{item}.dat")
+    return item
+
+
+def test_lines_are_sent_whole():
+    sent = []
+    stream = StreamWriter(sent.append, "stdout")
+    stream.write("Wrote file ")
+    assert sent == []
+    stream.write("out/s0.dat\n")
+    assert sent == [{"stream": "stdout", "text": "Wrote file out/s0.dat\n"}]
+
+
+@pytest.mark.parametrize("start_method", ["spawn", "forkserver"])
+def test_workers_send_through_the_daemon(tmp_path, start_method):
+    sent = []
+    context = multiprocessing.get_context(start_method)
+    queue = context.SimpleQueue()
+
+    results = run_batch(
+        print_item,
+        list(range(4)),
+        jobs=2,
+        mp_context=context,
+        initializer=install_worker_output,
+        initargs=(queue, str(tmp_path)),
+    )
+    assert results == list(range(4))
+
+    queue.put(None)
+    forward_output(queue, sent.append)
+    assert sorted(message["text"] for message in sent) == [
+        f"Wrote file out/s{item}.dat\n" for item in range(4)
+    ]
+
+
+def test_worker_lines_wait_for_their_end():
+    queue = multiprocessing.SimpleQueue()
+    stream = StreamWriter(None, "stdout", queue)
+    stream.write("Wrote file ")
+    stream.flush()
+    stream.write("out/s0.dat\nWrote")
+    queue.put(None)
+
+    sent = []
+    forward_output(queue, sent.append)
+    assert sent == [{"stream": "stdout", "text": "Wrote file out/s0.dat\n"}]
+
+
+def test_tcp_requests_need_the_token(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    token = create_token()
+    assert token_path().stat().st_mode & 0o777 == 0o600
+    assert read_token() == token
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), JobHandler)
+    server.token = token
+    server.job_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def request(message: dict) -> list[dict]:
+        with connect(server.server_address) as client:
+            stream = client.makefile("rwb")
+            stream.write((json.dumps(message) + "\n").encode())
+            stream.flush()
+            return [json.loads(line) for line in stream]
+
+    try:
+        refused = request({"argv": ["--help"], "cwd": str(tmp_path)})
+        assert refused[-1] == {"exit": 1}
+        assert "token" in refused[0]["text"]
+        assert request({"stop": True, "token": "0" * 64})[-1] == {"exit": 1}
+
+        assert request({"stop": True, "token": token}) == [{"exit": 0}]
+    finally:
+        server.server_close()
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from acq2bva.util.digital import combine_bit_channels
+from channels import make_channel
+
+
+def reference_codes(channels, threshold=2.5):
+    """
+    Combines digital channels with a loop over the samples
+    """
+    codes = np.zeros(len(channels[0].raw_data), dtype=np.uint64)
+    data = [channel.data for channel in channels]
+    for i in range(len(codes)):
+        code = 0
+        for bit, values in enumerate(data):
+            if values[i] > threshold:
+                code |= 1 << bit
+        codes[i] = code
+    return codes
+
+
+def bit_channels(n_bits: int, n_samples: int = 500) -> list:
+    rng = np.random.default_rng(n_bits)
+    codes = rng.integers(0, 1 << n_bits, n_samples, dtype=np.uint64)
+    return [
+        make_channel(((codes >> np.uint64(bit)) & np.uint64(1)) * 5.0)
+        for bit in range(n_bits)
+    ]
+
+
+@pytest.mark.parametrize("n_bits", [1, 8, 9, 16, 17])
+@pytest.mark.parametrize("block_size", [1, 7, 1 << 18])
+def test_same_codes_as_reference_loop(n_bits, block_size):
+    channels = bit_channels(n_bits)
+    combined = combine_bit_channels(channels, block_size=block_size).raw_data
+
+    assert combined.dtype.itemsize * 8 >= n_bits
+    assert np.array_equal(combined, reference_codes(channels))
+
+
+def test_msb_reverses_the_bits():
+    channels = bit_channels(3)
+    lsb = combine_bit_channels(channels).raw_data
+    msb = combine_bit_channels(channels, bit_order="msb").raw_data
+
+    assert np.array_equal(msb, reference_codes(channels[::-1]))
+    assert not np.array_equal(lsb, msb)
+
+
+def test_threshold_on_scaled_raw_samples():
+    channel = make_channel(np.array([0, 1, 2, 3], dtype="<i2"), scale=2)
+
+    codes = combine_bit_channels([channel], threshold=2.5).raw_data
+    assert codes.tolist() == [0, 0, 1, 1]
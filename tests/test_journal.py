@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from acq2bva.util.journal import JOURNAL_NAME, Journal, read_journal
+
+
+def test_read_journal_without_journal(tmp_path):
+    assert read_journal(tmp_path) is None
+
+
+def test_finished_journal_is_removed(tmp_path):
+    journal = Journal(tmp_path, "fingerprint", [Path("a.acq")])
+    journal.done(Path("a.acq"), {"size": 1})
+    journal.finish()
+
+    assert not (tmp_path / JOURNAL_NAME).exists()
+
+
+def test_failed_file_is_done_once_converted_again(tmp_path):
+    journal = Journal(tmp_path, "fingerprint", [Path("a.acq")])
+    journal.failed(Path("a.acq"), "error")
+    journal.done(Path("a.acq"), {"size": 1})
+
+    journaled = read_journal(tmp_path)
+    assert journaled["settings"] == "fingerprint"
+    assert journaled["done"] == {"a.acq": {"size": 1}}
+    assert journaled["failed"] == {}
+
+
+def test_resume_after_torn_line(tmp_path):
+    acq_files = [Path("a.acq"), Path("b.acq"), Path("c.acq")]
+    journal = Journal(tmp_path, "fingerprint", acq_files)
+    journal.done(Path("a.acq"), {"size": 1})
+    # Interrupted while writing the event of b.acq
+    journal.journal.write('{"event": "done", "acq_fi')
+    journal.journal.close()
+
+    assert set(read_journal(tmp_path)["done"]) == {"a.acq"}
+
+    journal = Journal(tmp_path, "fingerprint", acq_files, resume=True)
+    journal.done(Path("b.acq"), {"size": 2})
+    journal.journal.close()
+
+    # A second interruption keeps everything the resumed batch finished
+    journaled = read_journal(tmp_path)
+    assert journaled["settings"] == "fingerprint"
+    assert set(journaled["done"]) == {"a.acq", "b.acq"}
+
+
+def test_unreadable_line_is_skipped(tmp_path):
+    journal = Journal(tmp_path, "fingerprint", [Path("a.acq"), Path("b.acq")])
+    journal.journal.write("not json\n")
+    journal.done(Path("b.acq"), {"size": 2})
+    journal.journal.close()
+
+    assert set(read_journal(tmp_path)["done"]) == {"b.acq"}
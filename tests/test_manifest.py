@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import hashlib
+
+from acq2bva.util.manifest import (
+    file_entry,
+    hash_file,
+    hash_file_digests,
+    is_up_to_date,
+    save_manifest,
+    verify_folder,
+)
+
+
+def converted(tmp_path, digests=None, checksum="blake2b"):
+    acq_file = tmp_path / "s0.acq"
+    acq_file.write_bytes(b"acq" * 1000)
+    output_folder = tmp_path / "out"
+    output_folder.mkdir()
+    output = output_folder / "s0.dat"
+    output.write_bytes(b"dat")
+
+    if digests is not None:
+        digests = {"s0.dat": hashlib.new(checksum, b"dat").hexdigest()}
+    entry = file_entry(acq_file, "settings", [output], digests, checksum)
+    return acq_file, output_folder, entry
+
+
+def test_file_is_hashed_once_with_every_algorithm(tmp_path):
+    acq_file = tmp_path / "s0.acq"
+    acq_file.write_bytes(bytes(range(256)) * 10000)
+
+    digests = hash_file_digests(acq_file, ["blake2b", "sha256"])
+    assert digests == {
+        "blake2b": hash_file(acq_file),
+        "sha256": hashlib.sha256(acq_file.read_bytes()).hexdigest(),
+    }
+
+
+def test_entry_records_both_digests_of_the_file(tmp_path):
+    acq_file, _, entry = converted(tmp_path, {}, "sha256")
+
+    assert entry["blake2b"] == hash_file(acq_file)
+    assert entry["digests"]["s0.acq"] == hash_file(acq_file, "sha256")
+
+
+def test_entry_is_up_to_date_with_its_checksum(tmp_path):
+    acq_file, output_folder, entry = converted(tmp_path, {}, "sha256")
+
+    assert is_up_to_date(entry, acq_file, output_folder, "settings", "sha256")
+    assert not is_up_to_date(entry, acq_file, output_folder, "settings", "blake2b")
+    assert not is_up_to_date(entry, acq_file, output_folder, "other settings")
+
+
+def test_entry_without_digests_is_out_of_date(tmp_path):
+    acq_file, output_folder, entry = converted(tmp_path)
+
+    assert "digests" not in entry
+    assert is_up_to_date(entry, acq_file, output_folder, "settings")
+    assert not is_up_to_date(entry, acq_file, output_folder, "settings", "blake2b")
+
+
+def test_verify_reports_entries_without_digests(tmp_path):
+    acq_file, output_folder, entry = converted(tmp_path)
+    save_manifest(output_folder, {"version": 1, "files": {acq_file.name: entry}})
+
+    checks = verify_folder(output_folder, [acq_file])
+    assert len(checks) == 1
+    assert not checks[0]["ok"]
+    assert checks[0]["expected"] is None
+
+
+def test_verify_checks_outputs_and_files(tmp_path):
+    acq_file, output_folder, entry = converted(tmp_path, {})
+    save_manifest(output_folder, {"version": 1, "files": {acq_file.name: entry}})
+
+    checks = verify_folder(output_folder, [acq_file])
+    assert sorted(check["file"].name for check in checks) == ["s0.acq", "s0.dat"]
+    assert all(check["ok"] for check in checks)
+
+    (output_folder / "s0.dat").write_bytes(b"tad")
+    checks = verify_folder(output_folder, [acq_file])
+    assert [check["file"].name for check in checks if not check["ok"]] == ["s0.dat"]
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import sys
+
+import numpy as np
+import pytest
+
+from acq2bva.writers.acq2vmrk import (
+    MARKER_DTYPE,
+    acq2vmrk,
+    create_marker_list,
+    find_analog_triggers,
+    generate_text,
+)
+from channels import make_channel
+
+MARKER_MAP = {
+    range(1, 9): "Trial Start",
+    range(11, 19): "Trial End",
+    41: "Correct Response",
+}
+
+
+def reference_marker_list(marker_channel, marker_map, SMUDGE_LIMIT=2):
+    """
+    The original per-sample implementation of create_marker_list
+    """
+    def get_marker_description(marker, marker_map):
+        for marker_range, description in marker_map.items():
+            try:
+                if marker in marker_range:
+                    return description
+            except TypeError:
+                if marker == marker_range:
+                    return description
+        return ""
+
+    markers = []
+    marker = 0
+    position = 0
+
+    for pos, data in enumerate(marker_channel.data):
+        if marker != data:
+            if marker != 0:
+                count = pos - position
+                if count > SMUDGE_LIMIT:
+                    markers.append({
+                        "type": int(marker),
+                        "description": get_marker_description(marker, marker_map),
+                        "position": position,
+                        "points": count,
+                        "channel": 0,
+                    })
+            marker = data
+            position = pos
+
+    return markers
+
+
+def reference_generate_text(data_file, marker_list):
+    """
+    The original implementation of generate_text
+    """
+    return_string = "BrainVision Data Exchange Marker File Version 1.0"
+
+    return_string += "\n\n[Common Infos]"
+    return_string += f"\nDataFile={data_file}"
+
+    return_string += "\n\n[Marker Infos]"
+    for i, marker in enumerate(marker_list, start=1):
+        return_string += f"\nMk{i}="
+        return_string += f"{marker['type']},{marker['description']},"
+        return_string += f"{marker['position']},{marker['points']},{marker['channel']}"
+
+    return return_string
+
+
+def reference_triggers(data, threshold, hysteresis, min_width, refractory):
+    """
+    Finds trigger pulses with a loop over the samples
+    """
+    state = False
+    starts, ends = [], []
+    for i, value in enumerate(data.tolist()):
+        if not state and value > threshold:
+            state = True
+            starts.append(i)
+        elif state and value < threshold - hysteresis:
+            state = False
+            ends.append(i)
+    ends.append(len(data))
+
+    triggers = []
+    next_allowed = 0
+    for start, end in zip(starts, ends):
+        if end - start >= min_width and start >= next_allowed:
+            triggers.append(start)
+            next_allowed = start + refractory
+    return triggers
+
+
+def runs(*runs: tuple[int, int]) -> np.ndarray:
+    """
+    Marker data from (value, length) runs
+    """
+    return np.concatenate([np.full(length, value) for value, length in runs])
+
+
+MARKER_DATA = {
+    "empty": np.zeros(0),
+    "single sample": np.array([5]),
+    "no markers": np.zeros(100),
+    "first sample": runs((5, 4), (0, 10)),
+    "last sample": runs((0, 10), (5, 1)),
+    "last run": runs((0, 10), (5, 6)),
+    "at smudge limit": runs((0, 3), (5, 2), (0, 3), (6, 3), (0, 3)),
+    "back to back": runs((0, 2), (5, 3), (12, 4), (41, 5), (0, 1)),
+    "missing from map": runs((0, 2), (9, 3), (0, 2), (200, 4), (0, 2)),
+}
+
+
+@pytest.mark.parametrize("data", MARKER_DATA.values(), ids=MARKER_DATA.keys())
+@pytest.mark.parametrize("dtype", ["<i2", "<f8"])
+def test_same_markers_as_reference_loop(data, dtype):
+    channel = make_channel(data.astype(dtype))
+
+    assert create_marker_list(channel, MARKER_MAP) == reference_marker_list(
+        channel, MARKER_MAP
+    )
+
+
+@pytest.mark.parametrize("smudge_limit", [0, 2, 4])
+def test_same_markers_as_reference_loop_on_noise(smudge_limit):
+    rng = np.random.default_rng(0)
+    data = np.repeat(rng.choice([0, 0, 3, 12, 41, 77], 500), rng.integers(1, 7, 500))
+    channel = make_channel(data.astype("<i2"))
+
+    assert create_marker_list(
+        channel, MARKER_MAP, smudge_limit
+    ) == reference_marker_list(channel, MARKER_MAP, smudge_limit)
+
+
+def test_scaled_raw_codes():
+    channel = make_channel(runs((0, 2), (2, 5), (0, 2)).astype("<i2"), scale=3)
+
+    assert create_marker_list(channel, MARKER_MAP) == reference_marker_list(
+        channel, MARKER_MAP
+    )
+    assert create_marker_list(channel, MARKER_MAP)[0]["type"] == 6
+
+
+def test_new_segment_marker_uses_0_based_positions():
+    markers = np.zeros(1, dtype=MARKER_DTYPE)
+    markers[0] = (3, "S  3", 0, 2, 0)
+
+    lines = generate_text("rec.dat", markers, new_segment=True).splitlines()
+    assert lines[-2:] == ["Mk1=New Segment,,0,1,0", "Mk2=3,S  3,0,2,0"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 10_000])
+def test_same_vmrk_as_reference(tmp_path, monkeypatch, chunk_size):
+    # The module is shadowed by the acq2vmrk function in acq2bva.writers
+    vmrk = sys.modules["acq2bva.writers.acq2vmrk"]
+    monkeypatch.setattr(vmrk, "MARKER_CHUNK_SIZE", chunk_size)
+    rng = np.random.default_rng(0)
+    data = np.repeat(rng.choice([0, 0, 3, 12, 41, 77], 500), rng.integers(1, 7, 500))
+    channel = make_channel(data.astype("<i2"))
+
+    acq2vmrk(tmp_path / "rec.vmrk", "rec.dat", channel, MARKER_MAP)
+
+    expected = reference_generate_text(
+        "rec.dat", reference_marker_list(channel, MARKER_MAP)
+    )
+    assert (tmp_path / "rec.vmrk").read_text() == expected
+
+
+def test_hysteresis_ignores_noise_around_the_threshold():
+    data = np.array([0, 6, 4, 6, 4, 6, 0, 0, 6, 0], dtype=float)
+
+    starts, lengths = find_analog_triggers(data, 5)
+    assert starts.tolist() == [1, 3, 5, 8]
+    starts, lengths = find_analog_triggers(data, 5, hysteresis=2)
+    assert starts.tolist() == [1, 8]
+    assert lengths.tolist() == [5, 1]
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 1 << 20])
+@pytest.mark.parametrize(
+    "hysteresis, min_width, refractory", [(0, 1, 0), (30, 1, 0), (30, 3, 20)]
+)
+def test_same_triggers_as_reference_loop(block_size, hysteresis, min_width, refractory):
+    rng = np.random.default_rng(0)
+    data = rng.normal(0, 20, 2000)
+    data[np.repeat(rng.integers(0, 1990, 40), 5) + np.tile(np.arange(5), 40)] += 100
+
+    starts, _ = find_analog_triggers(
+        data, 50, hysteresis, min_width, refractory, block_size=block_size
+    )
+    assert starts.tolist() == reference_triggers(
+        data, 50, hysteresis, min_width, refractory
+    )
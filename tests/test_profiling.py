@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import tracemalloc
+
+import numpy as np
+
+from acq2bva.util.profiling import Profiler
+
+
+def test_peak_memory_is_measured_per_stage():
+    profiler = Profiler()
+    with profiler.stage("large"):
+        large = np.ones(1 << 22)
+        del large
+    with profiler.stage("small", 8000):
+        small = np.ones(1000)
+
+    report = profiler.report()
+    large, small = report["stages"]
+    assert large["peak_mb"] >= 32
+    # An earlier, larger stage does not count as the peak of a later one
+    assert small["peak_mb"] < 1
+    assert report["peak_mb"] == large["peak_mb"]
+    assert small["bytes"] == 8000
+    assert not tracemalloc.is_tracing()
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler(enabled=False)
+    with profiler.stage("large"):
+        np.ones(1000)
+    assert profiler.stages == []
+
+
+def test_report_separates_input_and_output_throughput():
+    profiler = Profiler()
+    for name, mb in [("decode", 1), ("markers", 1), ("raw", 4), ("vmrk", 1)]:
+        with profiler.stage(name, mb * 2**20):
+            pass
+    for stage in profiler.stages:
+        stage["wall_s"] = 1.0
+
+    report = profiler.report()
+    assert report["input_bytes"] == 2**20
+    assert report["input_mb_per_s"] == 0.25
+    assert report["output_bytes"] == 5 * 2**20
+    assert report["output_mb_per_s"] == 1.25
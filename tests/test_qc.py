@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+
+from acq2bva.util.qc import ChannelStats
+
+
+def reference_flatlines(data: np.ndarray, flatline_length: int) -> list[int]:
+    """
+    Lengths of the runs of identical samples of at least 'flatline_length'
+    """
+    flatlines = []
+    run = 1
+    for previous, sample in zip(data[:-1], data[1:]):
+        if sample == previous:
+            run += 1
+        else:
+            flatlines.append(run)
+            run = 1
+    flatlines.append(run)
+    return [run for run in flatlines if run >= flatline_length]
+
+
+def blockwise_report(data: np.ndarray, block_size: int, flatline_length: int) -> dict:
+    stats = ChannelStats(flatline_length)
+    for start in range(0, len(data), block_size):
+        stats.update(data[start : start + block_size])
+    return stats.report(samples_per_second=100)
+
+
+SIGNALS = {
+    "flatline across blocks": np.concatenate(
+        [np.arange(7.0), np.full(23, 3.0), np.arange(10.0)]
+    ),
+    "flat start and end": np.concatenate([np.zeros(9), np.arange(5.0), np.ones(9)]),
+    "constant": np.full(40, 2.0),
+    "clipped": np.clip(np.sin(np.arange(200) / 5) * 2, -1, 1),
+    "noise": np.random.default_rng(0).integers(0, 3, 300).astype(float),
+}
+
+
+@pytest.mark.parametrize("data", SIGNALS.values(), ids=SIGNALS.keys())
+@pytest.mark.parametrize("block_size", [1, 4, 7, 1000])
+def test_blocks_give_whole_channel_statistics(data, block_size):
+    flatline_length = 5
+    report = blockwise_report(data, block_size, flatline_length)
+    flatlines = reference_flatlines(data, flatline_length)
+
+    assert report["samples"] == len(data)
+    assert report["min"] == data.min()
+    assert report["max"] == data.max()
+    assert report["mean"] == pytest.approx(data.mean())
+    assert report["rms"] == pytest.approx(math.sqrt(np.mean(data**2)))
+    assert report["flatline_runs"] == len(flatlines)
+    assert report["flatline_samples"] == sum(flatlines)
+    assert report["longest_flatline_s"] == max(flatlines, default=0) / 100
+
+    if data.min() == data.max():
+        assert report["clipped_fraction"] == 0
+    else:
+        extremes = np.count_nonzero((data == data.min()) | (data == data.max()))
+        assert report["clipped_fraction"] == extremes / len(data)
+
+
+def test_flatline_split_into_one_sample_blocks():
+    data = np.concatenate([[1.0], np.full(10, 4.0), [2.0]])
+
+    report = blockwise_report(data, 1, 10)
+    assert report["flatline_runs"] == 1
+    assert report["flatline_samples"] == 10
+
+
+def test_nan_and_inf_are_counted_apart():
+    data = np.array([1.0, np.nan, np.inf, -np.inf, 3.0, np.nan])
+
+    report = blockwise_report(data, 2, 5)
+    assert report["nan"] == 2
+    assert report["inf"] == 2
+    assert (report["min"], report["max"], report["mean"]) == (1.0, 3.0, 2.0)
+
+
+def test_raw_samples_are_reported_scaled():
+    stats = ChannelStats(5, scale=-0.5)
+    stats.update(np.array([2, 4, 6], dtype="<i2"))
+
+    report = stats.report(samples_per_second=100)
+    assert (report["min"], report["max"], report["mean"]) == (-3.0, -1.0, -2.0)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from acq2bva.writers.acq2raw import BINARY_FORMATS, acq2raw, lossy_int16_channels
+from acq2bva.writers.acq2vhdr import ChannelInfos
+from channels import make_channel
+
+
+def reference_raw(output_file, channels):
+    """
+    The original in-memory implementation of acq2raw
+    """
+    byte_list = (
+        np.array([channel.data for channel in channels], dtype="<f4")
+        .flatten()
+        .tobytes()
+    )
+    with output_file.open("wb") as raw:
+        raw.write(byte_list)
+
+
+def make_channels(n_samples: int = 1000) -> list:
+    rng = np.random.default_rng(0)
+    return [
+        make_channel(rng.standard_normal(n_samples)),
+        make_channel(rng.integers(-2000, 2000, n_samples).astype("<i2"), scale=0.25),
+        make_channel(rng.integers(-2000, 2000, n_samples).astype("<i2")),
+    ]
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 1000, 1 << 18])
+def test_same_bytes_as_reference(tmp_path, block_size):
+    channels = make_channels()
+    reference_raw(tmp_path / "reference.dat", channels)
+    acq2raw(tmp_path / "streaming.dat", channels, block_size=block_size)
+
+    expected = (tmp_path / "reference.dat").read_bytes()
+    assert (tmp_path / "streaming.dat").read_bytes() == expected
+
+
+def test_int16_writes_raw_samples(tmp_path):
+    channels = make_channels()[1:]
+    acq2raw(tmp_path / "raw.dat", channels, binary_format="INT_16")
+
+    written = np.fromfile(tmp_path / "raw.dat", dtype="<i2").reshape(2, -1)
+    for samples, channel in zip(written, channels):
+        assert np.array_equal(samples, channel.raw_data)
+
+
+def test_int16_fallback_rule():
+    data = np.arange(100, dtype="<i2")
+    fast = make_channel(data)
+    slow = make_channel(data[:50], divider=2)
+    offset = make_channel(data)
+    offset.raw_offset = 1
+    floats = make_channel(data.astype("<f8"))
+
+    assert lossy_int16_channels([fast, slow], ["hold", "hold"]) == []
+    assert lossy_int16_channels([fast, slow], ["hold", "linear"]) == [slow]
+    # The fastest channel is never interpolated
+    assert lossy_int16_channels([fast, slow], ["linear", "hold"]) == []
+    assert lossy_int16_channels([fast, offset, floats], ["hold"] * 3) == [
+        offset,
+        floats,
+    ]
+
+
+def test_int16_refuses_lossy_channels(tmp_path):
+    channels = make_channels()
+    with pytest.raises(SystemExit):
+        acq2raw(tmp_path / "raw.dat", channels, binary_format="INT_16")
+
+
+def test_int16_resolution_is_the_raw_scale():
+    channels = make_channels()[1:]
+    infos = ChannelInfos(channels, scales=[2, 1], binary_format="INT_16")
+
+    assert infos.Ch1 == "CH,,0.5,mV"
+    assert infos.Ch2 == "CH,,1.0,mV"
+
+
+@pytest.mark.parametrize("binary_format", ["IEEE_FLOAT_32", "INT_16"])
+@pytest.mark.parametrize("block_size", [1, 7, 1 << 18])
+def test_multiplexed_is_vectorized_transposed(tmp_path, binary_format, block_size):
+    channels = make_channels()[1:]
+    for orientation in ("VECTORIZED", "MULTIPLEXED"):
+        acq2raw(
+            tmp_path / f"{orientation}.dat",
+            channels,
+            block_size=block_size,
+            binary_format=binary_format,
+            data_orientation=orientation,
+        )
+
+    dtype = BINARY_FORMATS[binary_format]
+    vectorized = np.fromfile(tmp_path / "VECTORIZED.dat", dtype=dtype)
+    multiplexed = np.fromfile(tmp_path / "MULTIPLEXED.dat", dtype=dtype)
+    assert np.array_equal(
+        multiplexed.reshape(-1, len(channels)), vectorized.reshape(len(channels), -1).T
+    )
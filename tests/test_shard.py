@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from acq2bva.util.manifest import (
+    MANIFEST_NAME,
+    TEMP_SUFFIX,
+    load_manifest,
+    remove_temp_files,
+    save_manifest,
+)
+from acq2bva.util.shard import find_shards, merge_shards, shard_files, shard_name
+
+
+def acq_files(tmp_path, n_files: int) -> list[Path]:
+    files = []
+    for i in range(n_files):
+        # Same names in different folders, of different sizes
+        acq_file = tmp_path / f"sub{i % 3}" / f"s{i // 3}.acq"
+        acq_file.parent.mkdir(exist_ok=True)
+        acq_file.write_bytes(bytes(100 * (i % 7 + 1)))
+        files.append(acq_file)
+    return files
+
+
+@pytest.mark.parametrize("balance", [False, True])
+@pytest.mark.parametrize("n_files, count", [(10, 3), (2, 4), (9, 1)])
+def test_shards_are_disjoint_and_cover_the_batch(tmp_path, n_files, count, balance):
+    files = acq_files(tmp_path, n_files)
+
+    shards = [shard_files(files, (i, count), balance) for i in range(1, count + 1)]
+    sharded = [acq_file for shard in shards for acq_file in shard]
+    assert sorted(sharded) == sorted(files)
+    assert len(sharded) == len(set(sharded))
+
+
+@pytest.mark.parametrize("balance", [False, True])
+def test_every_node_agrees_on_the_shards(tmp_path, balance):
+    files = acq_files(tmp_path, 10)
+
+    for i in range(1, 4):
+        shard = shard_files(files, (i, 3), balance)
+        # Another node may find the files in another order
+        assert sorted(shard_files(files[::-1], (i, 3), balance)) == sorted(shard)
+
+
+def test_shard_keeps_the_order_given(tmp_path):
+    files = acq_files(tmp_path, 10)
+
+    shard = shard_files(files, (1, 2))
+    assert shard == [acq_file for acq_file in files if acq_file in shard]
+
+
+def temp_files(output_folder: Path, *names: str) -> list[Path]:
+    paths = [output_folder / (name + TEMP_SUFFIX) for name in names]
+    for path in paths:
+        path.touch()
+    return paths
+
+
+def test_only_temp_files_of_the_shard_are_removed(tmp_path):
+    ours = temp_files(tmp_path, "s.dat", "s.vhdr", "s.vmrk", "s.qc.json")
+    theirs = temp_files(tmp_path, "s_2.dat", "s_002.dat", "s.x.dat", "t.dat")
+
+    assert remove_temp_files(tmp_path, ["s"]) == len(ours)
+    assert not any(path.exists() for path in ours)
+    assert all(path.exists() for path in theirs)
+
+
+def test_temp_files_of_segments_are_removed(tmp_path):
+    ours = temp_files(tmp_path, "s_001.dat", "s_002.qc.json", "s_1000.vhdr")
+    theirs = temp_files(tmp_path, "s_2.dat", "t_001.dat")
+
+    assert remove_temp_files(tmp_path, ["s"], segmented=True) == len(ours)
+    assert not any(path.exists() for path in ours)
+    assert all(path.exists() for path in theirs)
+
+
+def test_merge_combines_the_manifests_of_every_shard(tmp_path):
+    for i, names in enumerate([["a.acq", "c.acq"], ["b.acq"]], start=1):
+        manifest = {"version": 1, "files": {name: {"size": 1} for name in names}}
+        save_manifest(tmp_path, manifest, shard_name(MANIFEST_NAME, (i, 2)))
+
+    assert merge_shards(tmp_path) == {"shards": 2, "files": 3}
+    assert sorted(load_manifest(tmp_path)["files"]) == ["a.acq", "b.acq", "c.acq"]
+    assert not find_shards(tmp_path, MANIFEST_NAME)
+
+
+def test_merge_needs_every_shard(tmp_path):
+    save_manifest(tmp_path, {"version": 1, "files": {}}, shard_name(MANIFEST_NAME, (1, 2)))
+
+    with pytest.raises(SystemExit):
+        merge_shards(tmp_path)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from bioread.biopac import Channel
+
+from acq2bva.util.window import window_channel
+from acq2bva.writers.acq2raw import acq2raw
+from channels import make_channel
+
+
+def written_columns(tmp_path, channels: list[Channel], method: str) -> np.ndarray:
+    output_file = tmp_path / "window.dat"
+    acq2raw(output_file, channels, data_orientation="MULTIPLEXED", resample=method)
+    return np.fromfile(output_file, dtype="<f4").reshape(-1, len(channels))
+
+
+def test_window_starts_at_the_sample_covering_it():
+    slow = make_channel(np.arange(10, dtype="<i2"), divider=4)
+
+    windowed = window_channel(slow, 5, 20)
+    assert list(windowed.raw_data) == [1, 2, 3, 4]
+    assert windowed.window_offset == 1
+
+
+@pytest.mark.parametrize("start, end", [(5, 20), (0, 40), (7, 9), (8, 33)])
+def test_held_channel_stays_aligned_in_windows(tmp_path, start, end):
+    # Every slow sample covers 4 fast samples, the fast channel counts them
+    fast = make_channel(np.arange(40, dtype="<i2"))
+    slow = make_channel(np.arange(10, dtype="<i2"), divider=4)
+
+    channels = [window_channel(channel, start, end) for channel in (fast, slow)]
+    columns = written_columns(tmp_path, channels, "hold")
+
+    assert list(columns[:, 0]) == list(range(start, end))
+    assert list(columns[:, 1]) == [sample // 4 for sample in range(start, end)]
+
+
+def test_segments_of_a_window_stay_aligned(tmp_path):
+    fast = make_channel(np.arange(40, dtype="<i2"))
+    slow = make_channel(np.arange(10, dtype="<i2"), divider=4)
+    channels = [window_channel(channel, 5, 30) for channel in (fast, slow)]
+
+    segment = [window_channel(channel, 6, 12) for channel in channels]
+    columns = written_columns(tmp_path, segment, "hold")
+
+    assert list(columns[:, 0]) == list(range(11, 17))
+    assert list(columns[:, 1]) == [sample // 4 for sample in range(11, 17)]
+
+
+def test_interpolated_channel_stays_aligned(tmp_path):
+    fast = make_channel(np.arange(40, dtype="<i2"))
+    slow = make_channel(np.arange(0, 40, 4, dtype="<i2"), divider=4)
+
+    channels = [window_channel(channel, 5, 20) for channel in (fast, slow)]
+    columns = written_columns(tmp_path, channels, "linear")
+
+    # Past its last sample in the window, the channel holds it
+    assert list(columns[:12, 1]) == list(range(5, 17))
+    assert list(columns[12:, 1]) == [16, 16, 16]